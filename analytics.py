@@ -0,0 +1,128 @@
+# analytics.py
+# Purchase analytics by device and month, read from the purchase_summary
+# table that ContractModel keeps up to date.
+import glob
+import hashlib
+import os
+import tkinter as tk
+from tkinter import ttk
+
+from data import ContractModel
+
+CHARTS_DIR = os.path.join("contracts", "charts")
+
+# Grouping choices offered in the dashboard
+GROUPINGS = {
+    "Device type": ('device_type',),
+    "Device type + model": ('device_type', 'device_model'),
+    "Condition": ('condition',),
+    "Device type + condition": ('device_type', 'condition'),
+}
+
+
+def _chart_prefix(model, group_by):
+    db_key = hashlib.sha1(os.path.abspath(model.db_file).encode('utf-8')).hexdigest()[:10]
+    return os.path.join(CHARTS_DIR, f"purchases_{db_key}_{'-'.join(group_by)}_")
+
+
+def render_purchase_chart(model, group_by=('device_type',), top=8):
+    """Return the path of a PNG chart of purchases and average price per month.
+
+    Charts are cached on disk under the database's analytics version, so a
+    chart is only drawn again after contracts were added, changed or removed.
+    """
+    prefix = _chart_prefix(model, group_by)
+    path = f"{prefix}{model.get_analytics_version()}.png"
+    if os.path.exists(path):
+        return path
+
+    # matplotlib is only needed on a cache miss; importing it is most of the cost
+    from matplotlib.figure import Figure
+    from matplotlib.backends.backend_agg import FigureCanvasAgg
+
+    rows = model.get_purchase_summary(group_by)
+    months = sorted({row[0] for row in rows})
+    volume = {}
+    for row in rows:
+        volume[row[1:-2]] = volume.get(row[1:-2], 0) + row[-2]
+    shown = sorted(volume, key=volume.get, reverse=True)[:top]
+
+    # series label -> month -> [purchases, total price]
+    series = {}
+    for row in rows:
+        group = row[1:-2]
+        label = " / ".join(group) if group in shown else "Other"
+        counts = series.setdefault(label, {}).setdefault(row[0], [0, 0.0])
+        counts[0] += row[-2]
+        counts[1] += row[-2] * row[-1]
+
+    fig = Figure(figsize=(9, 6), dpi=80)
+    FigureCanvasAgg(fig)
+    ax_volume, ax_price = fig.subplots(2, 1, sharex=True)
+    for label, per_month in series.items():
+        ax_volume.plot(months, [per_month.get(m, [0, 0])[0] for m in months], marker='o', label=label)
+        ax_price.plot(months, [per_month[m][1] / per_month[m][0] if m in per_month else None for m in months],
+                      marker='o', label=label)
+    ax_volume.set_ylabel("Purchases")
+    ax_price.set_ylabel("Average price (EUR)")
+    ax_volume.legend(fontsize='small', loc='upper left')
+    ax_price.tick_params(axis='x', labelrotation=45)
+    fig.tight_layout()
+
+    os.makedirs(CHARTS_DIR, exist_ok=True)
+    for stale in glob.glob(f"{glob.escape(prefix)}*.png"):
+        os.remove(stale)
+    fig.savefig(path + ".tmp", format='png')
+    os.replace(path + ".tmp", path)
+    return path
+
+
+class AnalyticsApp:
+    def __init__(self, master, model=None):
+        self.master = master
+        self.model = model
+        self.chart_image = None
+
+        self.create_widgets()
+        self.master.after_idle(self.refresh)
+
+    def create_widgets(self):
+        controls = ttk.Frame(self.master)
+        controls.grid(row=0, column=0, padx=10, pady=10, sticky="w")
+        tk.Label(controls, text="Group by:").pack(side=tk.LEFT, padx=5)
+        self.grouping_var = tk.StringVar(value=next(iter(GROUPINGS)))
+        grouping_dropdown = ttk.Combobox(controls, textvariable=self.grouping_var,
+                                         values=list(GROUPINGS), state='readonly', width=25)
+        grouping_dropdown.pack(side=tk.LEFT, padx=5)
+        grouping_dropdown.bind("<<ComboboxSelected>>", lambda e: self.refresh())
+        ttk.Button(controls, text="Refresh", command=self.refresh).pack(side=tk.LEFT, padx=5)
+        self.status_label = tk.Label(controls, text="")
+        self.status_label.pack(side=tk.LEFT, padx=10)
+
+        self.summary_table = ttk.Treeview(self.master, columns=("Month", "Group", "Purchases", "Average price"),
+                                          show="headings", height=8)
+        for column in ("Month", "Group", "Purchases", "Average price"):
+            self.summary_table.heading(column, text=column)
+        self.summary_table.grid(row=1, column=0, padx=10, pady=5, sticky="ew")
+
+        self.chart_label = tk.Label(self.master)
+        self.chart_label.grid(row=2, column=0, padx=10, pady=5)
+
+    def refresh(self):
+        """Reload the summary rows and show the (cached) chart."""
+        try:
+            if self.model is None:
+                self.model = ContractModel()
+            group_by = GROUPINGS[self.grouping_var.get()]
+            rows = self.model.get_purchase_summary(group_by)
+            chart = render_purchase_chart(self.model, group_by)
+        except Exception as e:
+            self.status_label.config(text=f"Analytics unavailable: {e}")
+            return
+
+        self.summary_table.delete(*self.summary_table.get_children())
+        for row in reversed(rows):
+            self.summary_table.insert("", "end", values=(row[0], " / ".join(row[1:-2]), row[-2], f"{row[-1]:.2f} EUR"))
+        self.chart_image = tk.PhotoImage(file=chart)
+        self.chart_label.config(image=self.chart_image)
+        self.status_label.config(text=f"{sum(row[-2] for row in rows)} purchases")
@@ -0,0 +1,212 @@
+# backup.py
+# Online backups of the contracts database: copied with the SQLite backup API
+# in small page steps, verified, compressed and rotated.
+import gzip
+import hashlib
+import json
+import lzma
+import os
+import shutil
+import sqlite3
+import sys
+import threading
+import time
+from datetime import datetime
+
+from data import DB_FILE
+
+BACKUP_DIR = os.path.join(os.path.dirname(__file__), '..', 'data', 'backups')
+BACKUP_INTERVAL_MS = 6 * 60 * 60 * 1000
+
+COMPRESSORS = {
+    'xz': lzma.open,
+    'gz': gzip.open,
+}
+
+
+def _sha256_file(path, opener=open):
+    digest = hashlib.sha256()
+    with opener(path, 'rb') as f:
+        for chunk in iter(lambda: f.read(1024 * 1024), b''):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def check_database(path):
+    """Return the number of contracts in a database file, raising sqlite3.DatabaseError if it is damaged."""
+    conn = sqlite3.connect(path)
+    try:
+        result = conn.execute('PRAGMA integrity_check').fetchone()[0]
+        if result != 'ok':
+            raise sqlite3.DatabaseError(f"integrity check failed: {result}")
+        return conn.execute('SELECT COUNT(*) FROM contracts').fetchone()[0]
+    finally:
+        conn.close()
+
+
+class _BackupRestarted(Exception):
+    pass
+
+
+class BackupManager:
+    """Creates compressed, verified snapshots of a contracts database.
+
+    The copy is taken through sqlite3's backup API `pages_per_step` pages at a
+    time, sleeping between steps, so the source is only read-locked for one
+    short step at a time and writers keep going while a large database is
+    copied. A write from another connection makes SQLite restart the copy; after
+    `max_restarts` of those a database in WAL mode (as ContractModel opens it)
+    is copied in a single step, which reads one snapshot without blocking
+    writers. Any other database would be locked for the whole copy, so the run
+    is given up instead and the next scheduled backup tries again.
+    Only the newest `keep` snapshots are retained.
+    """
+    def __init__(self, db_file=DB_FILE, backup_dir=BACKUP_DIR, compression='xz', keep=14,
+                 pages_per_step=256, step_sleep=0.005, max_restarts=5):
+        if compression not in COMPRESSORS:
+            raise ValueError(f"Unknown compression {compression!r}, use one of {', '.join(COMPRESSORS)}.")
+        self.db_file = db_file
+        self.backup_dir = backup_dir
+        self.compression = compression
+        self.keep = keep
+        self.pages_per_step = pages_per_step
+        self.step_sleep = step_sleep
+        self.max_restarts = max_restarts
+
+    def snapshots(self):
+        """Paths of the existing snapshots, oldest first."""
+        if not os.path.isdir(self.backup_dir):
+            return []
+        names = [name for name in os.listdir(self.backup_dir)
+                 if name.startswith('contracts_') and name.endswith(tuple(f'.db.{ext}' for ext in COMPRESSORS))]
+        return [os.path.join(self.backup_dir, name) for name in sorted(names)]
+
+    def run_backup(self):
+        """Take one snapshot, verify it, rotate old ones and return a report dict."""
+        os.makedirs(self.backup_dir, exist_ok=True)
+        stamp = datetime.now().strftime('%Y%m%d_%H%M%S')
+        raw_path = os.path.join(self.backup_dir, f"contracts_{stamp}.db.partial")
+        final_path = os.path.join(self.backup_dir, f"contracts_{stamp}.db.{self.compression}")
+        started = time.perf_counter()
+
+        if not os.path.exists(self.db_file):
+            raise FileNotFoundError(f"Database {self.db_file} does not exist.")
+        try:
+            source = sqlite3.connect(self.db_file)
+            target = sqlite3.connect(raw_path)
+            try:
+                restarts = self._copy(source, target)
+            finally:
+                target.close()
+                source.close()
+            copied = time.perf_counter()
+
+            rows = check_database(raw_path)
+            raw_size = os.path.getsize(raw_path)
+            raw_hash = _sha256_file(raw_path)
+
+            opener = COMPRESSORS[self.compression]
+            with open(raw_path, 'rb') as src, opener(final_path + '.tmp', 'wb') as dst:
+                shutil.copyfileobj(src, dst, 1024 * 1024)
+            if _sha256_file(final_path + '.tmp', opener) != raw_hash:
+                raise IOError("compressed snapshot does not match the copied database")
+            os.replace(final_path + '.tmp', final_path)
+        except Exception:
+            for leftover in (final_path + '.tmp', final_path):
+                if os.path.exists(leftover):
+                    os.remove(leftover)
+            raise
+        finally:
+            if os.path.exists(raw_path):
+                os.remove(raw_path)
+
+        finished = time.perf_counter()
+        report = {
+            'snapshot': final_path,
+            'contracts': rows,
+            'database_bytes': raw_size,
+            'snapshot_bytes': os.path.getsize(final_path),
+            'sha256': raw_hash,
+            'restarts': restarts,
+            'copy_seconds': copied - started,
+            'total_seconds': finished - started,
+            'mb_per_sec': raw_size / (finished - started) / 1e6 if finished > started else 0.0,
+        }
+        with open(final_path + '.json', 'w', encoding='utf-8') as f:
+            json.dump(report, f, indent=2)
+        self.rotate()
+        print(f"Backup {final_path}: {rows} contracts, {raw_size / 1e6:.1f} MB -> "
+              f"{report['snapshot_bytes'] / 1e6:.1f} MB in {report['total_seconds']:.2f}s "
+              f"({report['mb_per_sec']:.1f} MB/s)")
+        return report
+
+    def _copy(self, source, target):
+        """Copy source into target in page steps and return how often the copy restarted."""
+        restarts = 0
+        last_remaining = [None]
+
+        def progress(status, remaining, total):
+            nonlocal restarts
+            if last_remaining[0] is not None and remaining > last_remaining[0]:
+                restarts += 1
+                if restarts > self.max_restarts:
+                    raise _BackupRestarted()
+            last_remaining[0] = remaining
+
+        try:
+            source.backup(target, pages=self.pages_per_step, progress=progress, sleep=self.step_sleep)
+        except _BackupRestarted:
+            if source.execute('PRAGMA journal_mode').fetchone()[0] != 'wal':
+                raise RuntimeError(f"copy restarted {restarts} times by writes, skipped until the next backup")
+            source.backup(target, pages=-1)
+        return restarts
+
+    def rotate(self):
+        """Delete all but the newest `keep` snapshots."""
+        snapshots = self.snapshots()
+        for path in snapshots[:max(len(snapshots) - self.keep, 0)]:
+            for stale in (path, path + '.json'):
+                if os.path.exists(stale):
+                    os.remove(stale)
+
+    def verify_snapshot(self, path):
+        """Decompress a snapshot to a temporary file and check it against its recorded hash."""
+        opener = COMPRESSORS[path.rsplit('.', 1)[-1]]
+        restored = path + '.verify'
+        try:
+            with opener(path, 'rb') as src, open(restored, 'wb') as dst:
+                shutil.copyfileobj(src, dst, 1024 * 1024)
+            rows = check_database(restored)
+            meta_path = path + '.json'
+            if os.path.exists(meta_path):
+                with open(meta_path, 'r', encoding='utf-8') as f:
+                    if json.load(f)['sha256'] != _sha256_file(restored):
+                        raise IOError(f"{path} does not match its recorded checksum")
+            return rows
+        finally:
+            if os.path.exists(restored):
+                os.remove(restored)
+
+
+def schedule_backups(widget, manager=None, interval_ms=BACKUP_INTERVAL_MS):
+    """Run a backup every interval_ms on a worker thread, driven by the Tk event loop of `widget`."""
+    manager = manager or BackupManager()
+
+    def worker():
+        try:
+            manager.run_backup()
+        except Exception as e:
+            print(f"Error backing up database: {e}")
+
+    def tick():
+        threading.Thread(target=worker, daemon=True).start()
+        widget.after(interval_ms, tick)
+
+    widget.after(interval_ms, tick)
+
+
+if __name__ == '__main__':
+    # python backup.py [database] [backup directory]
+    manager = BackupManager(*sys.argv[1:3])
+    report = manager.run_backup()
+    print(f"Verified snapshot: {manager.verify_snapshot(report['snapshot'])} contracts")
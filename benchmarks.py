@@ -0,0 +1,1098 @@
+# benchmarks.py
+# Timing and sanity checks for the document and database code paths.
+# Run all benchmarks with `python benchmarks.py` or a single one by name,
+# e.g. `python benchmarks.py contract_template`.
+import glob
+import itertools
+import json
+import os
+import random
+import re
+import sys
+import tempfile
+import time
+import tracemalloc
+
+SAMPLE_SELLER = {
+    'Vorname': 'Jonas', 'Nachname': 'Becker', 'Straße': 'Sonnenallee 12',
+    'PLZ / Ort': '12045 Berlin', 'Telefon': '0176 1234567', 'E-Mail': 'jonas.becker@example.de',
+    'Ausweis-Nr': 'L01X00T47',
+}
+SAMPLE_BUYER = {
+    'Vorname': 'Myers International GmbH - Contract', 'Nachname': '', 'Straße': 'Karl-Marx-str 62',
+    'PLZ / Ort': '12043 Berlin', 'Telefon': '123456789', 'E-Mail': 'handyzentrum62@gmail.com',
+    'Ausweis-Nr': '',
+}
+SAMPLE_DEVICE = {
+    'Hersteller': 'Apple', 'Modell': 'iPhone 13', 'Seriennummer': '356789104563217',
+    'Besonderheiten': '128 GB, Blau', 'Zustand': 'Gebraucht, sehr gut', 'Sonstiges/Zubehör': 'Ladekabel',
+}
+SAMPLE_PRICE = {'price': 349.0, 'price_in_words': 'DREIHUNDERTNEUNUNDVIERZIG', 'delivery_date': 'Berlin, 01.10.2024'}
+SAMPLE_TERMS = ("Der Verkäufer versichert, dass das Gerät sein Eigentum ist, frei von Rechten Dritter ist "
+                "und nicht als gestohlen gemeldet wurde. Die Ware wird wie besichtigt unter Ausschluss "
+                "jeglicher Gewährleistung verkauft.")
+
+_TEXT_RUN = re.compile(r'BT ([\d.-]+) ([\d.-]+) Td \((.*?)\) Tj ET')
+
+
+def _report(name, count, seconds, unit="docs"):
+    rate = count / seconds if seconds else float('inf')
+    print(f"{name:<32} {count:>8} {unit:<8} {seconds * 1000:10.1f} ms  {rate:12.1f} {unit}/s")
+
+
+def layout_lines(page):
+    """Group the text runs of a page stream by baseline: {y: (x positions, joined text)}."""
+    lines = {}
+    for x, y, text in _TEXT_RUN.findall(page):
+        lines.setdefault(y, []).append((float(x), text))
+    return {y: ({x for x, _ in runs}, "".join(text for _, text in sorted(runs)))
+            for y, runs in lines.items()}
+
+
+def compare_layouts(reference_pages, candidate_pages):
+    """Return a list of differences between two rendered documents, empty if they match.
+
+    Every line must carry the same text on the same baseline, and each text run
+    of the reference must start at a position the candidate also draws at.
+    """
+    problems = []
+    if len(reference_pages) != len(candidate_pages):
+        problems.append(f"page count {len(reference_pages)} != {len(candidate_pages)}")
+    for number in sorted(set(reference_pages) & set(candidate_pages)):
+        reference = layout_lines(reference_pages[number])
+        candidate = layout_lines(candidate_pages[number])
+        for y in sorted(set(reference) | set(candidate), key=float):
+            ref_x, ref_text = reference.get(y, (set(), ""))
+            cand_x, cand_text = candidate.get(y, (set(), ""))
+            if ref_text != cand_text:
+                problems.append(f"page {number} y={y}: {ref_text!r} != {cand_text!r}")
+            elif not ref_x <= cand_x:
+                problems.append(f"page {number} y={y}: runs start at {sorted(ref_x)} vs {sorted(cand_x)}")
+    return problems
+
+
+def bench_contract_template(count=300):
+    """Per-contract layout time with and without the pre-rendered template."""
+    from contract import build_contract_pdf, get_contract_template
+
+    args = (SAMPLE_SELLER, SAMPLE_BUYER, SAMPLE_DEVICE, SAMPLE_TERMS, SAMPLE_PRICE)
+    get_contract_template()  # built once per process, not part of the per-contract cost
+
+    for use_template in (False, True):
+        mode = "template" if use_template else "full layout"
+        start = time.perf_counter()
+        for i in range(count):
+            build_contract_pdf(f"Jonas_20241001_{i:03}", *args, use_template=use_template)
+        _report(f"contract {mode}", count, time.perf_counter() - start)
+        start = time.perf_counter()
+        for i in range(count):
+            build_contract_pdf(f"Jonas_20241001_{i:03}", *args, use_template=use_template).output(dest='S')
+        _report(f"contract {mode} + output", count, time.perf_counter() - start)
+
+    for terms in (SAMPLE_TERMS, SAMPLE_TERMS * 12):
+        reference = build_contract_pdf("Jonas_20241001_001", *args[:3], terms, SAMPLE_PRICE, use_template=False)
+        candidate = build_contract_pdf("Jonas_20241001_001", *args[:3], terms, SAMPLE_PRICE, use_template=True)
+        reference.close()
+        candidate.close()
+        problems = compare_layouts(reference.pages, candidate.pages)
+        print(f"layout check ({reference.page} page(s)): " + ("identical" if not problems else "DIFFERS"))
+        for problem in problems:
+            print("   ", problem)
+
+
+class _LegacyCsv:
+    """Stands in for a ContractLog so save_to_csv writes a single legacy contracts.csv."""
+    def __init__(self, path):
+        self.path = path
+
+    def append(self, write_record):
+        with open(self.path, mode='a', newline='', encoding='utf-8') as file:
+            write_record(file)
+
+
+def bench_legacy_import(sizes=(10000, 40000)):
+    """Legacy contracts.csv import throughput; peak memory should not grow with file size."""
+    from contract import save_to_csv
+    from data import ContractModel
+    from legacy_import import LegacyImporter
+
+    workdir = os.getcwd()
+    for size in sizes:
+        with tempfile.TemporaryDirectory() as tmp:
+            os.chdir(tmp)
+            try:
+                legacy_csv = _LegacyCsv('contracts.csv')
+                for i in range(size):
+                    save_to_csv(SAMPLE_SELLER, SAMPLE_BUYER, SAMPLE_DEVICE, SAMPLE_TERMS, SAMPLE_PRICE,
+                                f"Jonas_20241001_{i:03}", log=legacy_csv)
+                model = ContractModel(os.path.join(tmp, 'contracts.db'))
+                summary = LegacyImporter(model, 'contracts.csv').run()
+                model.close_connection()
+                # Second pass into a fresh database, traced for memory only
+                model = ContractModel(os.path.join(tmp, 'traced.db'))
+                tracemalloc.start()
+                LegacyImporter(model, 'contracts.csv').run()
+                peak = tracemalloc.get_traced_memory()[1]
+                tracemalloc.stop()
+                model.close_connection()
+            finally:
+                os.chdir(workdir)
+        _report(f"legacy import ({summary['bytes'] / 1e6:.1f} MB)", summary['imported'], summary['seconds'],
+                unit="records")
+        print(f"    peak traced memory {peak / 1024:.0f} KiB")
+
+
+def _contract_rows(count, seed=1):
+    """Plausible contracts table rows spread over five years."""
+    rng = random.Random(seed)
+    devices = [("Apple", "iPhone 12"), ("Apple", "iPhone 13"), ("Apple", "iPhone 14"), ("Samsung", "Galaxy S21"),
+               ("Samsung", "Galaxy A52"), ("Xiaomi", "Redmi Note 11"), ("Google", "Pixel 7")]
+    conditions = ["Neu", "Wie neu", "Gut", "Gebraucht", "Defekt"]
+    for i in range(count):
+        device_type, device_model = rng.choice(devices)
+        created_at = (f"{rng.randint(2020, 2024)}-{rng.randint(1, 12):02}-{rng.randint(1, 28):02}"
+                      f"T{rng.randint(9, 19):02}:00:00")
+        yield ("Jonas", "Becker", "Sonnenallee 12, 12045 Berlin", "0176 1234567", "jonas.becker@example.de",
+               "Myers International GmbH", "", "Karl-Marx-str 62, 12043 Berlin", "123456789",
+               "handyzentrum62@gmail.com", device_type, device_model, f"35{i:013}", rng.choice(conditions),
+               round(rng.uniform(40, 900), 2), SAMPLE_TERMS, created_at)
+
+
+def _insert_contract_rows(model, rows):
+    with model.conn:
+        model.insert_contract_rows(rows)
+
+
+def bench_analytics(count=200000):
+    """Summary-table analytics against aggregating the contracts table directly."""
+    import analytics
+    from data import ContractModel
+
+    with tempfile.TemporaryDirectory() as tmp:
+        model = ContractModel(os.path.join(tmp, 'contracts.db'))
+        start = time.perf_counter()
+        _insert_contract_rows(model, _contract_rows(count))
+        _report("insert with summary triggers", count, time.perf_counter() - start, unit="rows")
+
+        group_by = ('device_type', 'device_model', 'condition')
+        start = time.perf_counter()
+        raw = model.conn.execute('''
+            SELECT substr(created_at, 1, 7), device_type, device_model, condition, COUNT(*), AVG(price)
+            FROM contracts GROUP BY 1, 2, 3, 4 ORDER BY 1, 2, 3, 4
+        ''').fetchall()
+        _report("GROUP BY over contracts", 1, time.perf_counter() - start, unit="queries")
+        start = time.perf_counter()
+        summary = model.get_purchase_summary(group_by)
+        _report("purchase_summary query", 1, time.perf_counter() - start, unit="queries")
+        matches = len(raw) == len(summary) and all(
+            a[:5] == b[:5] and abs(a[5] - b[5]) < 1e-6 for a, b in zip(raw, summary))
+        print(f"    summary matches direct aggregation: {matches}")
+
+        analytics.CHARTS_DIR = os.path.join(tmp, 'charts')
+        for label in ("chart (cold)", "chart (cached)"):
+            start = time.perf_counter()
+            analytics.render_purchase_chart(model, ('device_type',))
+            _report(label, 1, time.perf_counter() - start, unit="charts")
+        model.close_connection()
+
+
+def bench_contract_records(count=1000000):
+    """Memory held by get_contracts() records against the plain 18-tuples."""
+    from data import ContractModel
+
+    with tempfile.TemporaryDirectory() as tmp:
+        model = ContractModel(os.path.join(tmp, 'contracts.db'))
+        _insert_contract_rows(model, _contract_rows(count))
+
+        for label, fetch in (("18-tuples (SELECT *)", model.get_contract_rows),
+                             ("Contract records", model.get_contracts)):
+            tracemalloc.start()
+            start = time.perf_counter()
+            rows = fetch()
+            seconds = time.perf_counter() - start
+            size = tracemalloc.get_traced_memory()[0]
+            tracemalloc.stop()
+            _report(label, len(rows), seconds, unit="rows")
+            print(f"    {size / 1e6:.1f} MB held, {size / len(rows):.0f} bytes/row")
+            del rows
+
+        contracts = model.get_contracts()
+        start = time.perf_counter()
+        total = sum(contract.price for contract in contracts)
+        _report("attribute access (price)", len(contracts), time.perf_counter() - start, unit="rows")
+        start = time.perf_counter()
+        terms = [contract.terms for contract in contracts[:10000]]
+        _report("lazy terms load", len(terms), time.perf_counter() - start, unit="rows")
+        del contracts
+        model.close_connection()
+
+
+def bench_normalized_schema(count=200000, customers=20000):
+    """Database size and scan speed of the flat contracts table against the normalized schema."""
+    import shutil
+    import sqlite3
+    from data import EAGER_COLUMNS, ContractModel
+    from export_pipeline import SqliteSink
+    from synthetic_data import SyntheticData
+
+    # The shop buys from and sells to a pool of returning customers
+    generator = SyntheticData(11)
+    shop = ("Myers International GmbH", "", "Karl-Marx-str 62, 12043 Berlin", "123456789", "handyzentrum62@gmail.com")
+    pool = [(party['Vorname'], party['Nachname'], f"{party['Straße']}, {party['PLZ / Ort']}", party['Telefon'],
+             party['E-Mail']) for party in (generator.party() for _ in range(customers))]
+    rows = []
+    for i in range(count):
+        row = generator.contract_row()
+        customer = generator.rng.choice(pool)
+        seller, buyer = (customer, shop) if generator.rng.random() < 0.8 else (shop, customer)
+        rows.append((i + 1,) + seller + buyer + row[10:])
+
+    def measure(path):
+        conn = sqlite3.connect(path)
+        conn.execute('VACUUM')
+        print(f"    {os.path.getsize(path) / 1e6:.1f} MB on disk")
+        for label, sql in (("SELECT *", 'SELECT * FROM contracts'),
+                           ("SELECT record columns", f"SELECT {', '.join(EAGER_COLUMNS)} FROM contracts"),
+                           ("one seller's contracts", "SELECT id, price FROM contracts WHERE seller_phone = ?")):
+            start = time.perf_counter()
+            found = conn.execute(sql, (pool[0][3],) if '?' in sql else ()).fetchall()
+            _report(f"  {label}", len(found), time.perf_counter() - start, unit="rows")
+        conn.close()
+        return found
+
+    with tempfile.TemporaryDirectory() as tmp:
+        flat_path = os.path.join(tmp, 'flat.db')
+        sink = SqliteSink(flat_path)
+        start = time.perf_counter()
+        sink.open()
+        sink.write(rows)
+        sink.close()
+        _report("insert (flat table)", count, time.perf_counter() - start, unit="rows")
+        print("flat contracts table")
+        flat_found = measure(flat_path)
+
+        migrated_path = os.path.join(tmp, 'migrated.db')
+        shutil.copy(flat_path, migrated_path)
+        start = time.perf_counter()
+        model = ContractModel(migrated_path)
+        _report("migration", count, time.perf_counter() - start, unit="rows")
+        same = (model.conn.execute('SELECT * FROM contracts ORDER BY id').fetchall() ==
+                sqlite3.connect(flat_path).execute('SELECT * FROM contracts ORDER BY id').fetchall())
+        parties, devices = (model.conn.execute(f'SELECT COUNT(*) FROM {table}').fetchone()[0]
+                            for table in ('parties', 'devices'))
+        model.close_connection()
+        print(f"normalized schema ({parties} parties, {devices} devices, rows unchanged: {same})")
+        found = measure(migrated_path)
+        print(f"    same seller lookup result: {sorted(found) == sorted(flat_found)}")
+
+        model = ContractModel(os.path.join(tmp, 'normalized.db'))
+        start = time.perf_counter()
+        model.add_contracts([row[1:] for row in rows])
+        _report("insert (normalized, add_contracts)", count, time.perf_counter() - start, unit="rows")
+        start = time.perf_counter()
+        contracts = model.get_contracts()
+        _report("get_contracts", len(contracts), time.perf_counter() - start, unit="rows")
+        model.close_connection()
+
+
+def bench_render_cache(count=200):
+    """Fresh contract renders against reprints served from the render cache."""
+    import datetime
+    import contract
+    from render_cache import RenderCache
+
+    workdir = os.getcwd()
+    with tempfile.TemporaryDirectory() as tmp:
+        os.chdir(tmp)
+        try:
+            os.makedirs(contract.CONTRACTS_DIR, exist_ok=True)
+            with open(contract.CONTRACT_NUMBER_FILE, 'w') as f:
+                f.write('{"last_number": 0}')
+            cache = RenderCache(os.path.join(tmp, 'cache'))
+            requests = [dict(SAMPLE_DEVICE, Seriennummer=f"35{i:013}") for i in range(count)]
+            issued_at = datetime.datetime(2024, 10, 1, 12, 0)
+            start = time.perf_counter()
+            codes = [contract.render_contract(SAMPLE_SELLER, SAMPLE_BUYER, device, SAMPLE_TERMS, SAMPLE_PRICE,
+                                              render_cache=cache, issued_at=issued_at)[1] for device in requests]
+            _report("contract render (new)", count, time.perf_counter() - start)
+            start = time.perf_counter()
+            for device, code in zip(requests, codes):
+                contract.render_contract(SAMPLE_SELLER, SAMPLE_BUYER, device, SAMPLE_TERMS, SAMPLE_PRICE,
+                                         render_cache=cache, contract_code=code, issued_at=issued_at)
+            _report("contract reprint (hit)", count, time.perf_counter() - start)
+            print(f"    {cache.stats()}")
+            again = contract.render_contract(SAMPLE_SELLER, SAMPLE_BUYER, requests[0], SAMPLE_TERMS, SAMPLE_PRICE,
+                                             render_cache=cache)
+            print(f"    same content issued again gets a new code: {again[1] != codes[0] and not again[2]}")
+
+            first, second = (contract.build_contract_pdf("Jonas_20241001_001", SAMPLE_SELLER, SAMPLE_BUYER,
+                                                         SAMPLE_DEVICE, SAMPLE_TERMS, SAMPLE_PRICE,
+                                                         issued_at=issued_at).output(dest='S') for _ in range(2))
+            print(f"    deterministic output: {first == second}")
+
+            small = RenderCache(os.path.join(tmp, 'small'), max_bytes=20 * len(first))
+            for device, code in zip(requests[:50], codes):
+                contract.render_contract(SAMPLE_SELLER, SAMPLE_BUYER, device, SAMPLE_TERMS, SAMPLE_PRICE,
+                                         render_cache=small, contract_code=code, issued_at=issued_at)
+            print(f"    bounded cache: {small.stats()}")
+        finally:
+            os.chdir(workdir)
+
+
+def bench_company_profiles(count=300):
+    """Receipts and contracts for several locations from one process, and reloading changed profiles."""
+    import company_profiles
+    import contract
+    import receipt
+
+    profile = company_profiles.DEFAULT_PROFILES["profiles"]["berlin-karl-marx-str"]
+    config = {"default": "neukoelln", "profiles": {
+        "neukoelln": profile,
+        "kreuzberg": dict(profile, street="Oranienstr. 10", zip="10999 Berlin"),
+        "potsdam": dict(profile, street="Brandenburger Str. 5", zip="14467 Potsdam", city="Potsdam"),
+    }}
+    items = [("Display iPhone 13", 1, 89.0, True), ("Akku", 2, 29.5, False), ("Schutzglas", 3, 9.99, True)]
+    tenants = list(config["profiles"])
+
+    with tempfile.TemporaryDirectory() as tmp:
+        config_file = os.path.join(tmp, "company_profiles.json")
+        with open(config_file, "w", encoding="utf-8") as f:
+            json.dump(config, f)
+        company_profiles.load_company_profiles(config_file)
+        try:
+            start = time.perf_counter()
+            for i in range(count):
+                pdf = receipt.ReceiptPDF(tenant=tenants[i % len(tenants)])
+                pdf.add_page()
+                pdf.body("Max Mustermann", items, receipt_number=f"RG20241001-{i:03}")
+                pdf.output(dest='S')
+            _report(f"receipt, {len(tenants)} locations", count, time.perf_counter() - start)
+
+            start = time.perf_counter()
+            for i in range(count):
+                contract.build_contract_pdf(f"Jonas_20241001_{i:03}", SAMPLE_SELLER, SAMPLE_BUYER, SAMPLE_DEVICE,
+                                            SAMPLE_TERMS, SAMPLE_PRICE, tenant=tenants[i % len(tenants)])
+            _report(f"contract, {len(tenants)} locations", count, time.perf_counter() - start)
+
+            for tenant in tenants:
+                pdf = receipt.ReceiptPDF(tenant=tenant)
+                pdf.add_page()
+                pdf.body("Max Mustermann", items, receipt_number="RG20241001-001")
+                print(f"    {tenant}: {config['profiles'][tenant]['street']!r} in header: "
+                      f"{config['profiles'][tenant]['street'] in pdf.pages[1]}")
+
+            # A location moves: receipts and contract templates pick up the new address after a reload
+            config["profiles"]["kreuzberg"]["street"] = "Skalitzer Str. 80"
+            with open(config_file, "w", encoding="utf-8") as f:
+                json.dump(config, f)
+            company_profiles.load_company_profiles(config_file)
+            document = contract.build_contract_pdf("Jonas_20241001_001", SAMPLE_SELLER, SAMPLE_BUYER, SAMPLE_DEVICE,
+                                                   SAMPLE_TERMS, SAMPLE_PRICE, tenant="kreuzberg")
+            document.close()
+            pages = "".join(document.pages.values())
+            print(f"    after reload, new street in contract: {'Skalitzer Str. 80' in pages}, "
+                  f"old street gone: {'Oranienstr. 10' not in pages}")
+        finally:
+            company_profiles.load_company_profiles()
+
+
+def bench_receipt_items(count=1000):
+    """Bulk line-item import and multi-page layout of a large invoice."""
+    import receipt
+
+    rng = random.Random(7)
+    lines = ["Beschreibung;Menge;Einzelpreis;USt"] + [
+        f"Ersatzteil {i:04};{rng.randint(1, 5)};{rng.uniform(1, 150):.2f}".replace(".", ",") + f";{rng.choice([0, 19])}"
+        for i in range(count)]
+    text = "\n".join(lines)
+
+    start = time.perf_counter()
+    items = receipt.parse_line_items(text)
+    _report("parse pasted line items", len(items), time.perf_counter() - start, unit="items")
+
+    start = time.perf_counter()
+    pdf = receipt.ReceiptPDF()
+    pdf.add_page()
+    pdf.body("Max Mustermann", items, receipt_number="RG20241001-001")
+    data = pdf.output(dest='S')
+    seconds = time.perf_counter() - start
+    _report(f"render invoice ({pdf.page} pages)", len(items), seconds, unit="items")
+    print(f"    {len(data) / 1024:.0f} KiB, table header on every page: "
+          f"{all('Beschreibung' in pdf.pages[n] for n in range(1, pdf.page + 1))}")
+
+
+def bench_e_invoice(count=5000, validate=200, pdf_count=300):
+    """Streaming CII e-invoices for a batch of receipts, against rendering their PDFs."""
+    import datetime
+    import io
+    import company_profiles
+    import receipt
+    from e_invoice import validate_e_invoice, write_e_invoice, write_e_invoices
+    from synthetic_data import SyntheticData
+
+    generator = SyntheticData(5)
+    issued_at = datetime.datetime(2024, 10, 1, 12)
+    receipts = [generator.receipt() + (f"RG20241001-{i:06}", issued_at) for i in range(count)]
+    items = sum(len(receipt_items) for _, receipt_items, _, _ in receipts)
+
+    try:
+        write_e_invoice(io.StringIO(), *receipts[0])
+        print("    profile without a VAT ID: e-invoice written")
+    except ValueError as e:
+        print(f"    profile without a VAT ID: refused ({e})")
+
+    # A location with a (sample) VAT ID, which an e-invoice needs
+    profile = company_profiles.DEFAULT_PROFILES["profiles"]["berlin-karl-marx-str"]
+    config = {"default": "neukoelln", "profiles": {"neukoelln": dict(profile, vat_id="DE123456789")}}
+    with tempfile.TemporaryDirectory() as tmp:
+        config_file = os.path.join(tmp, "company_profiles.json")
+        with open(config_file, "w", encoding="utf-8") as f:
+            json.dump(config, f)
+        company_profiles.load_company_profiles(config_file)
+        try:
+            invoice_dir = os.path.join(tmp, "invoices")
+            summary = write_e_invoices(iter(receipts), invoice_dir)
+            _report("e-invoice XML", count, summary['seconds'], unit="invoices")
+            print(f"    {items} line items, {summary['bytes'] / count / 1024:.1f} KiB per invoice")
+
+            try:
+                start = time.perf_counter()
+                errors = [(number, validate_e_invoice(os.path.join(invoice_dir, f"{number}.xml")))
+                          for _, _, number, _ in receipts[:validate]]
+                _report("XSD + EN 16931 schematron", validate, time.perf_counter() - start, unit="invoices")
+                failed = [(number, messages) for number, messages in errors if messages]
+                print(f"    valid against the bundled Factur-X EN 16931 rules: {not failed}" +
+                      (f", first error in {failed[0][0]}: {failed[0][1][0]}" if failed else ""))
+            except ImportError:
+                print("    schema validation skipped, lxml is not installed")
+
+            start = time.perf_counter()
+            totals_agree = True
+            for customer_name, receipt_items, number, _ in receipts[:pdf_count]:
+                pdf = receipt.ReceiptPDF(issued_at=issued_at)
+                pdf.add_page()
+                pdf.body(customer_name, receipt_items, receipt_number=number)
+                gross = write_e_invoice(io.StringIO(), customer_name, receipt_items, number, issued_at)
+                totals_agree = totals_agree and f"Gesamt: {gross / 100:.2f} EUR" in "".join(pdf.pages.values())
+                pdf.output(dest='S')
+            _report("receipt PDF", pdf_count, time.perf_counter() - start, unit="invoices")
+            print(f"    PDF totals equal the e-invoice grand totals: {totals_agree}")
+        finally:
+            company_profiles.load_company_profiles()
+
+
+def bench_thermal_receipt(count=300):
+    """ESC/POS raster receipts for 58 and 80 mm paper against rendering the receipt PDF."""
+    import datetime
+    import receipt
+    from synthetic_data import SyntheticData
+    from thermal_printer import ThermalReceipt, preview_image, print_receipt
+
+    generator = SyntheticData(5)
+    issued_at = datetime.datetime(2024, 10, 1, 12)
+    receipts = [generator.receipt() + (f"RG20241001-{i:03}",) for i in range(count)]
+
+    start = time.perf_counter()
+    pdf_bytes = 0
+    for customer_name, items, number in receipts:
+        pdf = receipt.ReceiptPDF(issued_at=issued_at)
+        pdf.add_page()
+        pdf.body(customer_name, items, receipt_number=number)
+        pdf_bytes += len(pdf.output(dest='S'))
+    seconds = time.perf_counter() - start
+    _report("receipt PDF", count, seconds, unit="receipts")
+    print(f"    {seconds / count * 1000:.2f} ms and {pdf_bytes / count / 1024:.1f} KiB per receipt")
+
+    with tempfile.TemporaryDirectory() as tmp:
+        for paper_mm in (58, 80):
+            printer = ThermalReceipt(paper_mm)
+            start = time.perf_counter()
+            printer.render(*receipts[0], issued_at)
+            first = time.perf_counter() - start
+            device = os.path.join(tmp, f"printer_{paper_mm}.prn")
+            start = time.perf_counter()
+            for customer_name, items, number in receipts:
+                print_receipt(printer.render(customer_name, items, number, issued_at), device)
+            seconds = time.perf_counter() - start
+            _report(f"ESC/POS {paper_mm} mm", count, seconds, unit="receipts")
+            size = os.path.getsize(device)
+            print(f"    {seconds / count * 1000:.2f} ms and {size / count / 1024:.1f} KiB per receipt, "
+                  f"first receipt {first * 1000:.1f} ms, {len(printer.glyphs)} glyphs cached")
+            with open(device, 'rb') as f:
+                image = preview_image(f.read())
+            print(f"    stand-in printer holds {image.height / 8:.0f} mm of {image.width}-dot paper")
+
+
+def bench_validation(count=1000000, error_rate=0.01):
+    """Bulk validation of contract CSV and JSONL imports, and single form submissions."""
+    import csv
+    from data import CONTRACT_COLUMNS
+    from synthetic_data import SyntheticData
+    from validation import CONTRACT_RECORDS, validate_contract_form, validate_file
+
+    generator = SyntheticData(9)
+    rng = random.Random(9)
+    columns = CONTRACT_COLUMNS[1:]
+    # Typical typos: a wrong IMEI digit, a broken e-mail address, a missing postcode, a price in words
+    corruptions = [('imei_number', lambda value: value[:-1] + str((int(value[-1]) + 1) % 10)),
+                   ('seller_email', lambda value: value.replace('@', ' at ')),
+                   ('buyer_address', lambda value: value.split(',')[0]),
+                   ('price', lambda value: "dreihundert")]
+    corrupted = 0
+    with tempfile.TemporaryDirectory() as tmp:
+        csv_path, jsonl_path = os.path.join(tmp, 'contracts.csv'), os.path.join(tmp, 'contracts.jsonl')
+        with open(csv_path, 'w', newline='', encoding='utf-8') as csv_file, \
+                open(jsonl_path, 'w', encoding='utf-8') as jsonl_file:
+            writer = csv.writer(csv_file)
+            writer.writerow(columns)
+            for _ in range(count):
+                record = dict(zip(columns, generator.contract_row()))
+                if rng.random() < error_rate:
+                    field, corrupt = rng.choice(corruptions)
+                    record[field] = corrupt(str(record[field]))
+                    corrupted += 1
+                writer.writerow(record.values())
+                jsonl_file.write(json.dumps(record, ensure_ascii=False) + "\n")
+
+        for label, path in (("CSV", csv_path), ("JSONL", jsonl_path)):
+            report = validate_file(path)
+            _report(f"validate {label}", report['records'], report['seconds'], unit="records")
+            print(f"    {report['invalid']} invalid of {corrupted} corrupted, by field: "
+                  + ", ".join(f"{field} {sum(messages.values())}" for field, messages in sorted(report['error_counts'].items())))
+        number, field, value, message = report['errors'][0]
+        print(f"    first error: record {number}, {field}={value!r}: {message}")
+
+        with open(csv_path, newline='', encoding='utf-8') as f:
+            records = list(itertools.islice(csv.DictReader(f), 100000))
+        start = time.perf_counter()
+        one_by_one = sum(1 for record in records if CONTRACT_RECORDS.validate(record))
+        _report("record by record", len(records), time.perf_counter() - start, unit="records")
+        start = time.perf_counter()
+        valid, _ = CONTRACT_RECORDS.validate_batch(records)
+        _report("column by column", len(records), time.perf_counter() - start, unit="records")
+        print(f"    same verdicts: {one_by_one == len(records) - valid.sum()}")
+
+    seller, buyer = generator.party(), generator.party()
+    device, price = generator.device()
+    start = time.perf_counter()
+    for _ in range(10000):
+        errors = validate_contract_form(seller, buyer, device, f"{price:.2f}".replace(".", ","))
+    _report("contract form", 10000, time.perf_counter() - start, unit="forms")
+    print(f"    errors for a valid form: {errors}")
+
+
+def bench_backup(count=200000):
+    """Online backups of a large database while another connection keeps inserting."""
+    import threading
+    from backup import BackupManager
+    from data import ContractModel
+
+    with tempfile.TemporaryDirectory() as tmp:
+        db_file = os.path.join(tmp, 'contracts.db')
+        model = ContractModel(db_file)
+        _insert_contract_rows(model, _contract_rows(count))
+        model.close_connection()
+
+        for compression in ('gz', 'xz'):
+            stop = threading.Event()
+            latencies = []
+
+            def writer():
+                writer_model = ContractModel(db_file)
+                rows = iter(_contract_rows(100000, seed=compression))
+                while not stop.is_set():
+                    start = time.perf_counter()
+                    _insert_contract_rows(writer_model, [next(rows)])
+                    latencies.append(time.perf_counter() - start)
+                    time.sleep(0.02)
+                writer_model.close_connection()
+
+            thread = threading.Thread(target=writer)
+            thread.start()
+            manager = BackupManager(db_file, os.path.join(tmp, 'backups'), compression=compression, keep=1)
+            report = manager.run_backup()
+            stop.set()
+            thread.join()
+            _report(f"backup ({compression})", 1, report['total_seconds'], unit="backups")
+            print(f"    copy {report['copy_seconds'] * 1000:.0f} ms, {report['restarts']} restarts, "
+                  f"{report['database_bytes'] / 1e6:.1f} MB -> {report['snapshot_bytes'] / 1e6:.1f} MB, "
+                  f"{report['mb_per_sec']:.1f} MB/s")
+            print(f"    concurrent writer: {len(latencies)} commits, "
+                  f"max {max(latencies) * 1000:.1f} ms per commit")
+            start = time.perf_counter()
+            rows = manager.verify_snapshot(report['snapshot'])
+            _report(f"verify ({compression})", 1, time.perf_counter() - start, unit="backups")
+            print(f"    snapshot holds {rows} contracts, {len(manager.snapshots())} snapshot(s) kept")
+
+
+def _replicated_state(model):
+    from replication import ROW_COLUMNS
+    return sorted(model.conn.execute(f'''
+        SELECT r.uid, r.version, r.origin, {', '.join('v.' + column for column in ROW_COLUMNS)}
+        FROM contract_records r JOIN contracts v ON v.id = r.id
+    ''').fetchall())
+
+
+def bench_replication(count=60000, rounds=50, terminals=3):
+    """Change-log replication between terminals: first sync, sync latency, bytes per change and conflicts."""
+    import statistics
+    from data import ContractModel
+    from replication import ChangeServer, Replicator
+
+    rows = list(_contract_rows(count + 2 * rounds + 10000, seed=46))
+    names = [f"kasse{i + 1}" for i in range(terminals)]
+    share = count // terminals
+    with tempfile.TemporaryDirectory() as tmp:
+        shared = os.path.join(tmp, 'sync')
+        models = {name: ContractModel(os.path.join(tmp, f"{name}.db")) for name in names}
+        # Each terminal sold its share before replicating; the second also holds
+        # a copy of some of the first's contracts, as a manual export would leave
+        for i, name in enumerate(names):
+            _insert_contract_rows(models[name], rows[i * share:(i + 1) * share])
+        copies = share // 10
+        _insert_contract_rows(models[names[1]], rows[:copies])
+
+        start = time.perf_counter()
+        replicators = {name: Replicator(models[name], name) for name in names}
+        _report("enable (uids for old rows)", terminals * share + copies, time.perf_counter() - start, unit="rows")
+
+        extra = iter(rows[count + 2 * rounds:])
+        plain = ContractModel(os.path.join(tmp, 'plain.db'))
+        for label, model in (("insert (no change log)", plain), ("insert (change log)", models[names[0]])):
+            batch = list(itertools.islice(extra, 5000))
+            start = time.perf_counter()
+            _insert_contract_rows(model, batch)
+            _report(label, len(batch), time.perf_counter() - start, unit="rows")
+        plain.close_connection()
+
+        start = time.perf_counter()
+        reports = [replicators[name].sync_folder(shared) for _ in range(2) for name in names]
+        seconds = time.perf_counter() - start
+        moved = sum(report['bytes'] for report in reports)
+        changes = sum(report['received'] for report in reports)
+        _report("first sync (shared folder)", changes, seconds, unit="changes")
+        states = [_replicated_state(models[name]) for name in names]
+        full_copy = os.path.getsize(os.path.join(tmp, f"{names[0]}.db"))
+        print(f"    {len(states[0])} contracts per terminal, identical: {all(s == states[0] for s in states)}, "
+              f"{copies} copies merged: {len(states[0]) == terminals * share + 5000}")
+        print(f"    {moved / 1e6:.2f} MB moved, {moved / changes:.0f} bytes/change "
+              f"(a full copy of one database is {full_copy / 1e6:.1f} MB)")
+
+        # One new and one edited contract per round, made on one terminal and
+        # fetched by all others, through the shared folder and through sockets
+        servers = {name: ChangeServer(models[name].db_file, name, ('127.0.0.1', 0)) for name in names}
+        addresses = {name: server.start() for name, server in servers.items()}
+        new_rows = iter(rows[count:count + 2 * rounds])
+        for transport in ('folder', 'socket'):
+            latencies, moved, changes = [], 0, 0
+            for round_number in range(rounds):
+                writer = names[round_number % terminals]
+                model = models[writer]
+                _insert_contract_rows(model, [next(new_rows)])
+                with model.conn:
+                    model.conn.execute('UPDATE contracts SET price = price + 1 WHERE id = ?',
+                                       (random.randint(1, share),))
+                start = time.perf_counter()
+                if transport == 'folder':
+                    reports = [replicators[writer].sync_folder(shared)]
+                    reports += [replicators[name].sync_folder(shared) for name in names if name != writer]
+                else:
+                    reports = [replicators[name].sync_socket(addresses[writer]) for name in names if name != writer]
+                latencies.append(time.perf_counter() - start)
+                moved += sum(report['bytes'] for report in reports)
+                changes += sum(report['received'] for report in reports)
+            print(f"incremental sync ({transport}, {terminals} terminals): "
+                  f"median {statistics.median(latencies) * 1000:.1f} ms, max {max(latencies) * 1000:.1f} ms, "
+                  f"{moved / changes:.0f} bytes/change")
+        for server in servers.values():
+            server.stop()
+
+        # Two terminals edit the same contract, a third deletes a contract the first edits
+        first, second, third = names[0], names[1], names[-1]
+        uid, deleted_uid = states[0][0][0], states[0][1][0]
+        for name, price in ((first, 111.0), (second, 222.0)):
+            with models[name].conn:
+                models[name].conn.execute('UPDATE contracts SET price = ? WHERE id = '
+                                          '(SELECT id FROM contract_records WHERE uid = ?)', (price, uid))
+        with models[third].conn:
+            models[third].conn.execute('DELETE FROM contracts WHERE id = '
+                                       '(SELECT id FROM contract_records WHERE uid = ?)', (deleted_uid,))
+        with models[first].conn:
+            models[first].conn.execute('UPDATE contracts SET price = 333.0 WHERE id = '
+                                       '(SELECT id FROM contract_records WHERE uid = ?)', (deleted_uid,))
+        for name in reversed(names + names):
+            replicators[name].sync_folder(shared)
+        states = [_replicated_state(models[name]) for name in names]
+        winners = {state[0]: state[1:3] for state in states[0] if state[0] in (uid, deleted_uid)}
+        # Terminals add up the same prices in a different order, so averages may differ in the last bits
+        summaries = [models[name].get_purchase_summary(('device_type',)) for name in names]
+        same_summaries = all(len(s) == len(summaries[0]) and all(
+            a[:-1] == b[:-1] and abs(a[-1] - b[-1]) < 1e-6 for a, b in zip(s, summaries[0])) for s in summaries)
+        print(f"    conflicts: edited contract kept {winners.get(uid)}, deleted/edited contract kept "
+              f"{winners.get(deleted_uid, 'deleted')}; identical: {all(s == states[0] for s in states)}, "
+              f"summaries identical: {same_summaries}")
+        for model in models.values():
+            model.close_connection()
+
+
+class _DatedLog:
+    """Stands in for a ContractLog so save_to_csv appends with a chosen timestamp."""
+    def __init__(self, log):
+        self.log = log
+        self.when = None
+
+    def append(self, write_record):
+        self.log.append(write_record, when=self.when)
+
+
+def bench_contract_log(months=24, per_month=2000):
+    """Reading one month from the segmented contract log against scanning a single CSV."""
+    import datetime
+    import shutil
+    import contract
+    from contract_log import ContractLog, open_segment
+    from legacy_import import iter_legacy_contracts, iter_logged_contracts
+
+    with tempfile.TemporaryDirectory() as tmp:
+        log = ContractLog(os.path.join(tmp, 'contract_log'), durability='group')
+        dated = _DatedLog(log)
+        start = time.perf_counter()
+        with log:
+            for month in range(months):
+                for i in range(per_month):
+                    dated.when = datetime.datetime(2023 + month // 12, month % 12 + 1, 1 + i % 28, 12)
+                    contract.save_to_csv(SAMPLE_SELLER, SAMPLE_BUYER, SAMPLE_DEVICE, SAMPLE_TERMS, SAMPLE_PRICE,
+                                         f"Becker_{dated.when:%Y%m%d}_{i:03}", log=dated)
+        _report("segmented log append", months * per_month, time.perf_counter() - start, unit="records")
+
+        # The same records in one uncompressed file, as save_to_csv used to write them
+        flat_path = os.path.join(tmp, 'contracts.csv')
+        with open(flat_path, 'wb') as out:
+            for path in log.segments():
+                with open_segment(path) as segment:
+                    shutil.copyfileobj(segment, out)
+        on_disk = sum(os.path.getsize(path) for path in log.segments())
+        print(f"    {len(log.segments())} segments, {on_disk / 1e6:.1f} MB on disk vs "
+              f"{os.path.getsize(flat_path) / 1e6:.1f} MB in a single file")
+
+        query = (datetime.datetime(2024, 3, 1), datetime.datetime(2024, 3, 31, 23, 59, 59))
+        start = time.perf_counter()
+        full = sum(1 for record, _ in iter_legacy_contracts(flat_path) if '_202403' in record['code'])
+        _report("one month, full scan", full, time.perf_counter() - start, unit="records")
+        start = time.perf_counter()
+        segmented = sum(1 for _ in iter_logged_contracts(log, *query))
+        _report("one month, via manifest", segmented, time.perf_counter() - start, unit="records")
+        print(f"    same records: {full == segmented}, segments opened: {len(log.segments(*query))}")
+
+        # A single legacy contracts.csv is split into segments the first time a log is used
+        migrated = ContractLog(os.path.join(tmp, 'migrated_log'), legacy_file=flat_path)
+        start = time.perf_counter()
+        migrated_months = migrated.months()
+        _report("legacy file migration", months * per_month, time.perf_counter() - start, unit="records")
+        print(f"    {len(migrated_months)} months, all records: "
+              f"{sum(1 for _ in iter_logged_contracts(migrated)) == months * per_month}, "
+              f"same month query: {sum(1 for _ in iter_logged_contracts(migrated, *query)) == segmented}")
+
+
+def _append_contracts(directory, durability, writer, count):
+    import contract
+    from contract_log import ContractLog
+
+    with ContractLog(directory, durability=durability) as log:
+        for i in range(count):
+            contract.save_to_csv(SAMPLE_SELLER, SAMPLE_BUYER, SAMPLE_DEVICE, SAMPLE_TERMS, SAMPLE_PRICE,
+                                 f"Becker_w{writer}_{i:06}", log=log)
+
+
+def _crash_after_appends(directory, count):
+    import contract
+    from contract_log import ContractLog
+
+    log = ContractLog(directory, durability='group', group_size=10 ** 6, group_interval=3600)
+    for i in range(count):
+        contract.save_to_csv(SAMPLE_SELLER, SAMPLE_BUYER, SAMPLE_DEVICE, SAMPLE_TERMS, SAMPLE_PRICE,
+                             f"Becker_crash_{i:06}", log=log)
+    os._exit(1)  # no commit(), no atexit handlers
+
+
+def bench_contract_log_durability(counts=None, writers=4, per_writer=5000):
+    """Contract log appends per durability level, concurrent writers sharing one log, and a crash."""
+    import datetime
+    import multiprocessing
+    from contract_log import ContractLog
+    from legacy_import import iter_logged_contracts
+
+    counts = counts or {'record': 2000, 'group': 20000, 'none': 20000}
+    for durability, count in counts.items():
+        with tempfile.TemporaryDirectory() as tmp:
+            start = time.perf_counter()
+            _append_contracts(tmp, durability, 0, count)
+            _report(f"append ({durability})", count, time.perf_counter() - start, unit="records")
+
+    with tempfile.TemporaryDirectory() as tmp:
+        processes = [multiprocessing.Process(target=_append_contracts, args=(tmp, 'group', writer, per_writer))
+                     for writer in range(writers)]
+        start = time.perf_counter()
+        for process in processes:
+            process.start()
+        for process in processes:
+            process.join()
+        _report(f"append ({writers} processes, group)", writers * per_writer, time.perf_counter() - start,
+                unit="records")
+        log = ContractLog(tmp)
+        codes = [record.get('code') for record in iter_logged_contracts(log)]
+        complete = sum(1 for record in iter_logged_contracts(log) if 'price' in record)
+        print(f"    {len(codes)} records read back, {len(set(codes))} distinct, {complete} complete, "
+              f"manifest counts {sum(entry['records'] for entry in log.manifest().values())}")
+
+    with tempfile.TemporaryDirectory() as tmp:
+        crash = multiprocessing.Process(target=_crash_after_appends, args=(tmp, 1000))
+        crash.start()
+        crash.join()
+        found = sum(1 for _ in iter_logged_contracts(ContractLog(tmp), datetime.datetime.now()))
+        print(f"    crash before commit(): {found} of 1000 records found from now on")
+
+
+def bench_synthetic_data(count=200000, soak_seconds=20):
+    """Synthetic contract generation into ContractModel and a short rendering soak test."""
+    import io
+    from data import ContractModel
+    from synthetic_data import SyntheticData, populate_contracts, soak_test
+    from validation import luhn_valid
+
+    with tempfile.TemporaryDirectory() as tmp:
+        model = ContractModel(os.path.join(tmp, 'contracts.db'))
+        start = time.perf_counter()
+        populate_contracts(model, count)
+        _report("synthetic contracts", count, time.perf_counter() - start, unit="rows")
+        imeis = [row[0] for row in model.conn.execute('SELECT imei_number FROM contracts LIMIT 10000')]
+        print(f"    Luhn-valid IMEIs: {sum(map(luhn_valid, imeis))}/{len(imeis)}, "
+              f"distinct models: {model.conn.execute('SELECT COUNT(DISTINCT device_model) FROM contracts').fetchone()[0]}")
+        model.close_connection()
+
+    generator = SyntheticData(2)
+    receipts = [generator.receipt() for _ in range(10000)]
+    lengths = sorted(len(items) for _, items in receipts)
+    print(f"    receipt items: median {lengths[len(lengths) // 2]}, max {lengths[-1]}")
+
+    log = io.StringIO()
+    samples = soak_test(soak_seconds, interval=soak_seconds / 10, out=log)
+    print("    " + log.getvalue().strip().replace("\n", "\n    "))
+    _report("soak test renders", int(sum(s[3] for s in samples) * soak_seconds / 10), soak_seconds)
+
+
+def bench_terms_layout(count=300, repeats=(1, 5, 60)):
+    """Contract terms laid out through the text layout cache against plain multi_cell."""
+    import datetime
+    import contract
+    from text_layout import TextLayoutCache
+
+    issued_at = datetime.datetime(2024, 10, 1, 12, 0)
+    for paragraphs in repeats:
+        terms = "\n".join([SAMPLE_TERMS] * paragraphs)
+        outputs = []
+        for label, cache in (("multi_cell", None), ("layout cache", TextLayoutCache())):
+            contract.ContractPDF.terms_layout_cache = cache
+            start = time.perf_counter()
+            for _ in range(count):
+                pdf = contract.ContractPDF(issued_at=issued_at)
+                pdf.add_page()
+                pdf.add_terms_text(terms)
+            _report(f"terms {len(terms)} chars, {label}", count, time.perf_counter() - start)
+            outputs.append(pdf.output(dest='S'))
+        print(f"    identical output: {outputs[0] == outputs[1]}, {pdf.page} page(s)")
+    contract.ContractPDF.terms_layout_cache = contract.TERMS_LAYOUT_CACHE
+
+
+def bench_export_pipeline(count=200000, pdf_count=50000):
+    """One-pass export to several sinks against one export call per format."""
+    import io
+    import contextlib
+    from data import ContractModel
+    from export_pipeline import CsvSink, PdfSink, SqliteSink, export_contracts
+
+    for rows, formats in ((count, (CsvSink, SqliteSink)), (pdf_count, (CsvSink, SqliteSink, PdfSink))):
+        with tempfile.TemporaryDirectory() as tmp:
+            model = ContractModel(os.path.join(tmp, 'contracts.db'))
+            _insert_contract_rows(model, _contract_rows(rows))
+
+            def sinks(run):
+                return [sink(os.path.join(tmp, f"{run}_{sink.name}")) for sink in formats]
+
+            with contextlib.redirect_stdout(io.StringIO()):
+                start = time.perf_counter()
+                for sink in sinks('separate'):
+                    export_contracts(model, [sink])
+                separate = time.perf_counter() - start
+                summary = export_contracts(model, sinks('combined'))
+            names = "+".join(sink.name for sink in formats)
+            _report(f"{names}, one call per format", rows, separate, unit="rows")
+            _report(f"{names}, single pass", rows, summary['seconds'], unit="rows")
+            print(f"    combined throughput {summary['combined_rows_per_sec']:.0f} rows/s; per sink: " +
+                  ", ".join(f"{name} {result['seconds']:.2f}s" for name, result in summary['sinks'].items()))
+            with open(os.path.join(tmp, 'separate_CSV'), 'rb') as a, open(os.path.join(tmp, 'combined_CSV'), 'rb') as b:
+                print(f"    identical CSV: {a.read() == b.read()}")
+            model.close_connection()
+
+
+def bench_columnar_export(count=200000):
+    """Typed columnar export against CSV: write time, size, and reading back into pandas."""
+    import io
+    import contextlib
+    import pandas as pd
+    from data import ContractModel
+    from export_pipeline import ColumnarSink, CsvSink, export_contracts, read_columnar
+
+    with tempfile.TemporaryDirectory() as tmp:
+        model = ContractModel(os.path.join(tmp, 'contracts.db'))
+        _insert_contract_rows(model, _contract_rows(count))
+        csv_path = os.path.join(tmp, 'contracts.csv')
+        columnar_path = os.path.join(tmp, 'contracts.parquet')
+
+        for sink in (CsvSink(csv_path), ColumnarSink(columnar_path)):
+            with contextlib.redirect_stdout(io.StringIO()):
+                summary = export_contracts(model, [sink])
+                # Memory is measured in a second run; tracing slows the export down
+                tracemalloc.start()
+                export_contracts(model, [sink])
+                peak = tracemalloc.get_traced_memory()[1]
+                tracemalloc.stop()
+            _report(f"write {sink.name}", count, summary['sinks'][sink.name]['seconds'], unit="rows")
+            print(f"    peak traced memory {peak / 1e6:.1f} MB")
+        try:
+            import pyarrow
+            print("    columnar format: Parquet")
+        except ImportError:
+            print("    columnar format: .npz chunks (pyarrow not installed)")
+        size = (sum(os.path.getsize(path) for path in glob.glob(os.path.join(columnar_path, '*')))
+                if os.path.isdir(columnar_path) else os.path.getsize(columnar_path))
+        print(f"    size: CSV {os.path.getsize(csv_path) / 1e6:.1f} MB, columnar {size / 1e6:.1f} MB")
+
+        start = time.perf_counter()
+        from_csv = pd.read_csv(csv_path, parse_dates=['created_at'])
+        _report("read CSV (all columns)", len(from_csv), time.perf_counter() - start, unit="rows")
+        start = time.perf_counter()
+        from_columnar = read_columnar(columnar_path)
+        _report("read columnar (all columns)", len(from_columnar), time.perf_counter() - start, unit="rows")
+        start = time.perf_counter()
+        prices = read_columnar(columnar_path, ['device_model', 'price', 'created_at'])
+        _report("read columnar (3 columns)", len(prices), time.perf_counter() - start, unit="rows")
+        print(f"    columnar dtypes: price {from_columnar['price'].dtype}, created_at {from_columnar['created_at'].dtype}; "
+              f"same prices: {bool((from_csv['price'] == from_columnar['price']).all())}")
+        model.close_connection()
+
+
+def bench_query_cache(count=100000, lookups=20000):
+    """get_contract_by_id / get_contracts with and without the read-through cache."""
+    import io
+    import contextlib
+    from data import ContractModel
+    from query_cache import QueryCache
+
+    with tempfile.TemporaryDirectory() as tmp:
+        db_file = os.path.join(tmp, 'contracts.db')
+        with contextlib.redirect_stdout(io.StringIO()):
+            model = ContractModel(db_file)
+            _insert_contract_rows(model, _contract_rows(count))
+            model.close_connection()
+        rng = random.Random(5)
+        # The GUI and reports keep coming back to a small set of recent contracts
+        ids = [count - int(rng.paretovariate(1.2)) % count for _ in range(lookups)]
+
+        for label, cache in (("uncached", None), ("cached", QueryCache(max_bytes=256 * 1024 * 1024))):
+            with contextlib.redirect_stdout(io.StringIO()):
+                model = ContractModel(db_file, cache=cache)
+                start = time.perf_counter()
+                for i, contract_id in enumerate(ids):
+                    model.get_contract_by_id(contract_id)
+                    if i % 1000 == 999:
+                        row = model.get_contract_by_id(ids[i])
+                        model.update_contract(row.id, *row.as_tuple()[1:15], row.price + 1, row.terms)
+                by_id = time.perf_counter() - start
+                start = time.perf_counter()
+                for _ in range(5):
+                    contracts = model.get_contracts()
+                listing = time.perf_counter() - start
+                row = model.get_contract_by_id(ids[-1])
+                model.update_contract(row.id, *row.as_tuple()[1:15], 1.0, row.terms)
+                fresh = model.get_contract_by_id(ids[-1]).price == 1.0 and \
+                    next(c for c in model.get_contracts() if c.id == row.id).price == 1.0
+                # Another connection updates the cached contract, then this model writes
+                other = ContractModel(db_file)
+                other.update_contract(row.id, *row.as_tuple()[1:15], 2.0, row.terms)
+                other.close_connection()
+                model.add_contract(*row.as_tuple()[1:15], 3.0, row.terms)
+                others = model.get_contract_by_id(row.id).price == 2.0
+            _report(f"get_contract_by_id ({label})", lookups, by_id, unit="lookups")
+            _report(f"get_contracts x5 ({label})", 5, listing, unit="queries")
+            if cache is not None:
+                print(f"    {cache.stats()}")
+                print(f"    sees its own updates: {fresh}")
+                print(f"    sees another connection's update after its own write: {others}")
+            model.close_connection()
+
+
+def bench_customer_directory(count=100000, keystrokes=5000):
+    """Type-ahead lookups in a directory of returning customers."""
+    from customer_directory import CustomerDirectory
+    from synthetic_data import SyntheticData
+
+    generator = SyntheticData(7)
+    parties = [generator.party() for _ in range(count)]
+    directory = CustomerDirectory()
+    start = time.perf_counter()
+    directory.add_many(parties)
+    _report("bulk build", len(directory), time.perf_counter() - start, unit="customers")
+
+    start = time.perf_counter()
+    for party in [generator.party() for _ in range(1000)]:
+        directory.add(party)
+    _report("incremental add", 1000, time.perf_counter() - start, unit="customers")
+
+    rng = random.Random(8)
+    typed = []
+    for _ in range(keystrokes // 10):
+        party = rng.choice(parties)
+        text = rng.choice([party['Nachname'], f"{party['Vorname']} {party['Nachname']}",
+                           party['Telefon'], party['Ausweis-Nr']])
+        typed.extend(text[:n] for n in range(1, min(len(text), 10) + 1))
+    timings = []
+    for prefix in typed:
+        start = time.perf_counter()
+        directory.suggest(prefix)
+        timings.append(time.perf_counter() - start)
+    timings.sort()
+    _report("suggest per keystroke", len(timings), sum(timings), unit="keys")
+    print(f"    median {timings[len(timings) // 2] * 1e6:.0f} us, p99 {timings[int(len(timings) * .99)] * 1e6:.0f} us, "
+          f"max {timings[-1] * 1000:.2f} ms")
+    found = directory.suggest(parties[0]['Telefon'])
+    print(f"    phone lookup finds the customer: {parties[0]['Nachname'] in [c['Nachname'] for c in found]}")
+
+
+BENCHMARKS = {
+    'contract_template': bench_contract_template,
+    'legacy_import': bench_legacy_import,
+    'analytics': bench_analytics,
+    'contract_records': bench_contract_records,
+    'normalized_schema': bench_normalized_schema,
+    'render_cache': bench_render_cache,
+    'company_profiles': bench_company_profiles,
+    'receipt_items': bench_receipt_items,
+    'e_invoice': bench_e_invoice,
+    'thermal_receipt': bench_thermal_receipt,
+    'validation': bench_validation,
+    'backup': bench_backup,
+    'replication': bench_replication,
+    'contract_log': bench_contract_log,
+    'contract_log_durability': bench_contract_log_durability,
+    'synthetic_data': bench_synthetic_data,
+    'terms_layout': bench_terms_layout,
+    'export_pipeline': bench_export_pipeline,
+    'columnar_export': bench_columnar_export,
+    'query_cache': bench_query_cache,
+    'customer_directory': bench_customer_directory,
+}
+
+if __name__ == "__main__":
+    for name in sys.argv[1:] or BENCHMARKS:
+        BENCHMARKS[name]()
@@ -0,0 +1,92 @@
+# company_profiles.py
+# Company data for each shop location, loaded from company_profiles.json and
+# resolved per document.
+import json
+import os
+
+COMPANY_PROFILES_FILE = "company_profiles.json"
+
+# Used when no config file exists, matching the original single-location build
+DEFAULT_PROFILES = {
+    "default": "berlin-karl-marx-str",
+    "profiles": {
+        "berlin-karl-marx-str": {
+            "name": "Myers International GmbH",
+            "contract_name": "Myers International GmbH - Contract",
+            "team": "Myers International",
+            "street": "Karl-Marx-str 62",
+            "zip": "12043 Berlin",
+            "city": "Berlin",
+            "website": "www.myers-international.com",
+            "telefon": "123456789",
+            "email": "handyzentrum62@gmail.com",
+        },
+    },
+}
+# Fields every profile needs. "vat_id" (the USt-IdNr.) is optional: receipts
+# print it when it is set, and e-invoices are only issued with it.
+PROFILE_FIELDS = ("name", "contract_name", "team", "street", "zip", "city", "website", "telefon", "email")
+
+_profiles = None
+# Caches of document parts built from the profiles, emptied when the profiles are reloaded
+_profile_caches = []
+
+
+def load_company_profiles(file_path=COMPANY_PROFILES_FILE):
+    """Read the profiles config, falling back to DEFAULT_PROFILES if the file does not exist.
+
+    Raises:
+    - ValueError: If the default profile is unknown or a profile lacks a field.
+    """
+    global _profiles
+    if os.path.exists(file_path):
+        with open(file_path, 'r', encoding='utf-8') as f:
+            config = json.load(f)
+    else:
+        config = DEFAULT_PROFILES
+
+    profiles = config.get("profiles", {})
+    default = config.get("default")
+    if default not in profiles:
+        raise ValueError(f"Default company profile {default!r} is not defined in {file_path}.")
+    for key, profile in profiles.items():
+        missing = [field for field in PROFILE_FIELDS if field not in profile]
+        if missing:
+            raise ValueError(f"Company profile {key!r} is missing {', '.join(missing)}.")
+
+    _profiles = {"default": default, "profiles": profiles}
+    for cache in _profile_caches:
+        cache.clear()
+    return _profiles
+
+
+def register_profile_cache(cache):
+    """Have load_company_profiles empty `cache` (a dict) whenever the profiles are reloaded; returns it."""
+    _profile_caches.append(cache)
+    return cache
+
+
+def get_company_profile(tenant=None):
+    """Return the profile dict for a location key, or the default location for None."""
+    if _profiles is None:
+        load_company_profiles()
+    key = tenant or _profiles["default"]
+    try:
+        return _profiles["profiles"][key]
+    except KeyError:
+        raise ValueError(f"Unknown company profile: {key!r}")
+
+
+def resolve_tenant(tenant=None):
+    """Return the profile key a document for `tenant` is rendered with."""
+    if _profiles is None:
+        load_company_profiles()
+    get_company_profile(tenant)
+    return tenant or _profiles["default"]
+
+
+def tenant_keys():
+    if _profiles is None:
+        load_company_profiles()
+    return list(_profiles["profiles"])
+
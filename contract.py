@@ -1,18 +1,27 @@
-from fpdf import FPDF
+from fpdf import FPDF, FPDF_VERSION
 import datetime
 import csv
 import os
 import json
+from render_cache import RenderCache, RENDER_CACHE_DIR, write_document
+from company_profiles import get_company_profile, register_profile_cache, resolve_tenant
+from contract_log import ContractLog, LEGACY_CSV_FILE
+from text_layout import TextLayoutCache
 
-# Company information
-COMPANY_INFO = {
-    'name': 'Myers International GmbH - Contract',
-    'street': 'Karl-Marx-str 62',
-    'zip': '12043 Berlin',
-    'website': 'www.myers-international.com',
-    'telefon': '123456789',
-    'email': 'handyzentrum62@gmail.com',
-}
+# Company block of a contract for a location (see company_profiles.json)
+def contract_company_info(tenant=None):
+    profile = get_company_profile(tenant)
+    return {
+        'name': profile['contract_name'],
+        'street': profile['street'],
+        'zip': profile['zip'],
+        'website': profile['website'],
+        'telefon': profile['telefon'],
+        'email': profile['email'],
+    }
+
+# Company information of the default location
+COMPANY_INFO = contract_company_info()
 
 # Directory to save contracts and to keep track of the last contract number
 CONTRACTS_DIR = "contracts"
@@ -24,9 +33,41 @@ if not os.path.exists(CONTRACT_NUMBER_FILE):
     with open(CONTRACT_NUMBER_FILE, 'w') as f:
         json.dump({"last_number": 0}, f)
 
+# Monthly contract log; the contracts.csv of earlier versions moves into it on first use
+CONTRACT_LOG = ContractLog(legacy_file=LEGACY_CSV_FILE)
+# Rendered contracts by code and content, so a reprint returns the original document
+CONTRACT_RENDER_CACHE = RenderCache(os.path.join(RENDER_CACHE_DIR, "contracts"))
+# Line breaks of the terms texts; most contracts use one of a few standard texts
+TERMS_LAYOUT_CACHE = TextLayoutCache()
+
+# Field labels in the order they appear on the contract
+PARTY_FIELDS = ["Vorname", "Nachname", "Straße", "PLZ / Ort", "Telefon", "E-Mail", "Ausweis-Nr"]
+DEVICE_FIELDS = ["Hersteller", "Modell", "Seriennummer", "Besonderheiten", "Zustand", "Sonstiges/Zubehör"]
+
 # Class to handle Contract PDF creation
 class ContractPDF(FPDF):
+    terms_layout_cache = TERMS_LAYOUT_CACHE
+
+    def __init__(self, template=None, issued_at=None, tenant=None):
+        super().__init__()
+        self.tenant = resolve_tenant(tenant)
+        self.company = contract_company_info(self.tenant)
+        self.city = get_company_profile(self.tenant)['city']
+        # Date printed on the contract and stored as the PDF creation date;
+        # fixing it makes the rendered bytes reproducible.
+        self.issued_at = issued_at or datetime.datetime.now()
+        # When built from a ContractTemplate the first page already carries the
+        # static layout, so only the variable values are drawn on top of it.
+        self.template = template
+        if template is not None:
+            self.fonts = {key: dict(font) for key, font in template.fonts.items()}
+
+    def on_template_page(self):
+        return self.template is not None and self.page == 1
+
     def header(self):
+        if self.on_template_page():
+            return
         self.set_font('Arial', 'B', 14)
         self.cell(0, 10, 'Kaufvertrag Über Ein Gebrauchtes Gerät', ln=True, align='C')
         self.set_font('Arial', 'I', 10)
@@ -35,18 +76,22 @@ class ContractPDF(FPDF):
 
     def company_info(self):
         self.set_font('Arial', '', 10)
-        self.cell(0, 5, COMPANY_INFO['name'], ln=True)
-        self.cell(0, 5, COMPANY_INFO['street'], ln=True)
-        self.cell(0, 5, COMPANY_INFO['zip'], ln=True)
-        self.cell(0, 5, COMPANY_INFO['telefon'], ln=True)
-        self.cell(0, 5, COMPANY_INFO['website'], ln=True)
-        self.cell(0, 5, COMPANY_INFO['email'], ln=True)
+        self.cell(0, 5, self.company['name'], ln=True)
+        self.cell(0, 5, self.company['street'], ln=True)
+        self.cell(0, 5, self.company['zip'], ln=True)
+        self.cell(0, 5, self.company['telefon'], ln=True)
+        self.cell(0, 5, self.company['website'], ln=True)
+        self.cell(0, 5, self.company['email'], ln=True)
         self.ln(10)
 
+    def field_cell(self, w, h, label, value, key, ln=0):
+        """Output a "label: value" cell. `key` names the value slot in a ContractTemplate."""
+        self.cell(w, h, f"{label}{value}", border=0, ln=ln, align='L')
+
     def add_contract_code(self, contract_code):
         """Display the contract code at the beginning of the document."""
         self.set_font('Arial', 'B', 12)
-        self.cell(0, 10, f"Vertragsnummer: {contract_code}", ln=True, align='L')
+        self.field_cell(0, 10, "Vertragsnummer: ", contract_code, 'contract_code', ln=1)
         self.ln(5)
 
     def add_section_title(self, title):
@@ -63,11 +108,11 @@ class ContractPDF(FPDF):
         self.ln(6)
 
         self.set_font('Arial', '', 10)
-        for field in ["Vorname", "Nachname", "Straße", "PLZ / Ort", "Telefon", "E-Mail", "Ausweis-Nr"]:
+        for field in PARTY_FIELDS:
             seller_value = seller_info.get(field, "")
             buyer_value = buyer_info.get(field, "")
-            self.cell(80, 6, f"{field}: {seller_value}", border=0, align='L')
-            self.cell(80, 6, f"{field}: {buyer_value}", border=0, align='L')
+            self.field_cell(80, 6, f"{field}: ", seller_value, ('seller', field))
+            self.field_cell(80, 6, f"{field}: ", buyer_value, ('buyer', field))
             self.ln(6)
         self.ln(5)
 
@@ -81,11 +126,11 @@ class ContractPDF(FPDF):
 
         self.set_font('Arial', '', 10)
         for field, value in device_info.items():
-            self.cell(80, 6, f"{field}: {value}", border=0, align='L')
+            self.field_cell(80, 6, f"{field}: ", value, ('device', field))
             if field == "Hersteller":
-                self.cell(80, 6, f"Kaufpreis in EUR: {price_info['price']:.2f} EUR", border=0, align='L')
+                self.field_cell(80, 6, "Kaufpreis in EUR: ", f"{price_info['price']:.2f} EUR", 'price')
             elif field == "Modell":
-                self.cell(80, 6, f"In Worten: {price_info['price_in_words']}", border=0, align='L')
+                self.field_cell(80, 6, "In Worten: ", price_info['price_in_words'], 'price_in_words')
             else:
                 self.cell(80, 6, "", border=0, align='L')
             self.ln(6)
@@ -94,22 +139,118 @@ class ContractPDF(FPDF):
     def add_terms_section(self, terms):
         """Add terms section below the main information sections."""
         self.add_section_title("Vereinbarungen")
+        self.add_terms_text(terms)
+
+    def add_terms_text(self, terms):
         self.set_font('Arial', '', 10)
-        self.multi_cell(0, 6, terms)
+        if self.terms_layout_cache is None:
+            self.multi_cell(0, 6, terms)
+        else:
+            self.terms_layout_cache.multi_cell(self, 0, 6, terms)
         self.ln(5)
 
     def footer(self):
         """Add footer with date and side-by-side signature lines."""
         self.set_y(-30)
         self.set_font('Arial', '', 10)
-        current_date = datetime.datetime.now().strftime("Datum: Berlin, %d.%m.%Y")
+        current_date = self.issued_at.strftime(f"Datum: {self.city}, %d.%m.%Y")
         self.cell(0, 5, current_date, ln=True)
+        if not self.on_template_page():
+            self.add_signature_lines()
 
-        # Signature lines for both seller and buyer, side-by-side
+    def add_signature_lines(self):
+        """Signature lines for both seller and buyer, side-by-side."""
         self.cell(90, 5, 'Unterschrift Verkäufer: _________________________', align='L')
         self.cell(90, 5, 'Unterschrift Käufer: _________________________', align='R')
         self.ln(10)
 
+    def _putinfo(self):
+        # FPDF would stamp the current time; use the issue date so output is deterministic
+        self._out('/Producer ' + self._textstring('PyFPDF ' + FPDF_VERSION + ' http://pyfpdf.googlecode.com/'))
+        self._out('/CreationDate ' + self._textstring('D:' + self.issued_at.strftime('%Y%m%d%H%M%S')))
+
+class _ContractTemplateBuilder(ContractPDF):
+    """Lays out only the static parts of a contract and records where each value goes."""
+    def __init__(self, tenant=None):
+        super().__init__(tenant=tenant)
+        self.slots = {}
+
+    def field_cell(self, w, h, label, value, key, ln=0):
+        x = self.x + self.c_margin + self.get_string_width(label)
+        baseline = self.y + .5 * h + .3 * self.font_size
+        self.slots[key] = (self.font_family, self.font_style, self.font_size_pt, x, baseline)
+        self.cell(w, h, label, border=0, ln=ln, align='L')
+
+class ContractTemplate:
+    """First contract page with the static layout pre-rendered.
+
+    Title, company block, section titles, field labels and signature lines are
+    laid out once; render() copies that page and only overlays the values.
+    """
+    def __init__(self, tenant=None):
+        self.tenant = resolve_tenant(tenant)
+        pdf = _ContractTemplateBuilder(self.tenant)
+        pdf.add_page()
+        pdf.company_info()
+        pdf.add_contract_code("")
+        empty_party = dict.fromkeys(PARTY_FIELDS, "")
+        pdf.add_seller_buyer_info(empty_party, empty_party)
+        pdf.add_device_price_info(dict.fromkeys(DEVICE_FIELDS, ""), {'price': 0, 'price_in_words': ""})
+        pdf.add_section_title("Vereinbarungen")
+        self.terms_y = pdf.get_y()
+        # Same position the footer leaves the signature lines at, below the date
+        pdf.in_footer = 1
+        pdf.set_y(-25)
+        pdf.set_font('Arial', '', 10)
+        pdf.add_signature_lines()
+        pdf.in_footer = 0
+
+        self.page = pdf.pages[pdf.page]
+        self.fonts = pdf.fonts
+        self.slots = pdf.slots
+
+    def fits(self, device_info):
+        """The template only covers the standard device fields in their usual order."""
+        return list(device_info) == DEVICE_FIELDS
+
+    def render(self, contract_code, seller_info, buyer_info, device_info, contract_terms, price_info,
+               issued_at=None):
+        pdf = ContractPDF(template=self, issued_at=issued_at, tenant=self.tenant)
+        pdf.add_page()
+        pdf.pages[pdf.page] = self.page
+
+        values = contract_field_values(contract_code, seller_info, buyer_info, device_info, price_info)
+        for key, (family, style, size, x, baseline) in self.slots.items():
+            value = str(values.get(key, ""))
+            if value:
+                pdf.set_font(family, style, size)
+                pdf.text(x, baseline, value)
+
+        pdf.set_y(self.terms_y)
+        pdf.add_terms_text(contract_terms)
+        return pdf
+
+_contract_templates = register_profile_cache({})
+
+def get_contract_template(tenant=None):
+    """Return the shared ContractTemplate of a location, building it on first use."""
+    tenant = resolve_tenant(tenant)
+    if tenant not in _contract_templates:
+        _contract_templates[tenant] = ContractTemplate(tenant)
+    return _contract_templates[tenant]
+
+def contract_field_values(contract_code, seller_info, buyer_info, device_info, price_info):
+    """Map each ContractTemplate slot to the text drawn in it."""
+    values = {'contract_code': contract_code}
+    for field in PARTY_FIELDS:
+        values[('seller', field)] = seller_info.get(field, "")
+        values[('buyer', field)] = buyer_info.get(field, "")
+    for field, value in device_info.items():
+        values[('device', field)] = value
+    values['price'] = f"{price_info['price']:.2f} EUR"
+    values['price_in_words'] = price_info['price_in_words']
+    return values
+
 # Generate a contract code with sequential numbering
 def generate_contract_code(customer_name):
     today = datetime.datetime.now().strftime('%Y%m%d')
@@ -131,27 +272,76 @@ def generate_contract_code(customer_name):
 
     return contract_code, pdf_path
 
-# Create and save Contract PDF
-def create_contract_pdf(seller_info, buyer_info, device_info, contract_terms, price_info):
-    customer_name = buyer_info.get("Vorname", "Kunde")
-    contract_code, pdf_path = generate_contract_code(customer_name)
-    
-    pdf = ContractPDF()
+# Lay out a contract, using the pre-rendered template when the fields allow it
+def build_contract_pdf(contract_code, seller_info, buyer_info, device_info, contract_terms, price_info,
+                       use_template=True, issued_at=None, tenant=None):
+    if use_template:
+        template = get_contract_template(tenant)
+        if template.fits(device_info):
+            return template.render(contract_code, seller_info, buyer_info, device_info, contract_terms, price_info,
+                                   issued_at=issued_at)
+
+    pdf = ContractPDF(issued_at=issued_at, tenant=tenant)
     pdf.add_page()
     pdf.company_info()
     pdf.add_contract_code(contract_code)  # Show contract code in PDF
     pdf.add_seller_buyer_info(seller_info, buyer_info)
     pdf.add_device_price_info(device_info, price_info)
     pdf.add_terms_section(contract_terms)
+    return pdf
+
+# Render a new contract, or reprint an issued one
+def render_contract(seller_info, buyer_info, device_info, contract_terms, price_info, use_template=True,
+                    render_cache=CONTRACT_RENDER_CACHE, tenant=None, contract_code=None, issued_at=None):
+    """
+    Returns (pdf_path, contract_code, reprinted). Without a contract_code a new
+    contract is issued under a new contract number, even if an earlier one
+    had the same content. To reprint an issued contract, pass its
+    contract_code and issued_at: the contract cached for it is written out
+    again unchanged, or rendered with that code and date if it is not in the
+    cache or the company profile changed since. Pass render_cache=None to
+    bypass the cache. `tenant` selects the company profile, None meaning the
+    default location.
+    """
+    tenant = resolve_tenant(tenant)
+    reprinted = contract_code is not None
+    if reprinted:
+        pdf_path = os.path.join(CONTRACTS_DIR, f"{contract_code}.pdf")
+    else:
+        contract_code, pdf_path = generate_contract_code(buyer_info.get("Vorname", "Kunde"))
+    issued_at = (issued_at or datetime.datetime.now()).replace(microsecond=0)
+    if render_cache is not None:
+        # The delivery date is not printed on the contract, so it is not part of the key
+        key = render_cache.key('contract', [tenant, get_company_profile(tenant), contract_code,
+                                            seller_info, buyer_info, device_info, contract_terms,
+                                            price_info['price'], price_info['price_in_words']])
+        cached = render_cache.get(key) if reprinted else None
+        if cached is not None:
+            data, meta = cached
+            write_document(meta['pdf_path'], data)
+            return meta['pdf_path'], meta['contract_code'], True
 
-    pdf.output(pdf_path)
+    pdf = build_contract_pdf(contract_code, seller_info, buyer_info, device_info, contract_terms, price_info,
+                             use_template=use_template, issued_at=issued_at, tenant=tenant)
+    data = pdf.output(dest='S').encode('latin1')
+    write_document(pdf_path, data)
+    if render_cache is not None:
+        render_cache.put(key, data, {'pdf_path': pdf_path, 'contract_code': contract_code,
+                                     'issued_at': issued_at.isoformat()})
+    return pdf_path, contract_code, reprinted
+
+# Create and save Contract PDF
+def create_contract_pdf(seller_info, buyer_info, device_info, contract_terms, price_info, use_template=True,
+                        render_cache=CONTRACT_RENDER_CACHE, tenant=None):
+    pdf_path, contract_code, _ = render_contract(seller_info, buyer_info, device_info, contract_terms, price_info,
+                                                 use_template=use_template, render_cache=render_cache,
+                                                 tenant=tenant)
     return pdf_path, contract_code
 
 # Save contract data to CSV
-def save_to_csv(seller_info, buyer_info, device_info, contract_terms, price_info, contract_code):
-    # Define the file and check if it exists
-    csv_file = 'contracts.csv'
-    with open(csv_file, mode='a', newline='', encoding='utf-8') as file:
+def save_to_csv(seller_info, buyer_info, device_info, contract_terms, price_info, contract_code, log=None):
+    # Append the contract to this month's segment of the contract log
+    def write_record(file):
         writer = csv.writer(file)
 
         # Add a clear header block for each contract entry
@@ -205,3 +395,5 @@ def save_to_csv(seller_info, buyer_info, device_info, contract_terms, price_info
             price_info.get('delivery_date', ''), contract_terms
         ])
         writer.writerow([])  # Blank line after each contract for readability
+
+    (log or CONTRACT_LOG).append(write_record)
@@ -0,0 +1,331 @@
+# contract_log.py
+# Append-only contract log split into monthly CSV segments. Segments of past
+# months are gzip-compressed, and manifest.json records each segment's date
+# range and record count so readers only open the segments they need. The
+# single contracts.csv written before the log existed is split into segments
+# the first time the log is used.
+import atexit
+import glob
+import gzip
+import io
+import json
+import os
+import re
+import shutil
+import time
+from contextlib import contextmanager
+from datetime import datetime
+
+try:
+    import fcntl
+except ImportError:  # Windows
+    fcntl = None
+    import msvcrt
+
+CONTRACT_LOG_DIR = "contract_log"
+LEGACY_CSV_FILE = "contracts.csv"
+MIGRATED_SUFFIX = ".migrated"
+MANIFEST_FILE = "manifest.json"
+LOCK_FILE = ".lock"
+
+# How hard append() pushes a record to disk before returning:
+#   'record' - fsync and update the manifest after every record
+#   'group'  - fsync and update the manifest once per group_size records or
+#              group_interval seconds, and on commit()/close()
+#   'none'   - like 'group', but leave flushing to the operating system
+DURABILITY_LEVELS = ('record', 'group', 'none')
+
+
+_SEGMENT_FILE = re.compile(r'(contracts_(\d{4}-\d{2})\.csv)(\.gz)?$')
+
+
+def segment_name(when):
+    return f"contracts_{when:%Y-%m}.csv"
+
+
+def _month_end(name):
+    # Day 31 of any month sorts after every timestamp of that month and before the next one
+    return f"{_SEGMENT_FILE.match(name).group(2)}-31T23:59:59"
+
+
+class ContractLog:
+    """Monthly segments of the contract CSV log and their manifest.
+
+    The manifest maps a segment's file name to its first and last record
+    timestamps, the number of records and whether it is compressed.
+
+    Writers from several processes (the GUI and a batch run, say) are
+    serialized by an advisory lock on a file in the log directory. Each record
+    is rendered into a buffer first and appended with a single write, so
+    blocks never interleave and a crash cannot leave part of a record behind
+    another one. The manifest is re-read under the lock and only this log's
+    own additions are merged into it.
+
+    A segment is entered in the manifest with its first record, and a log
+    commits what is pending when the process exits. After a crash the
+    manifest can still lag behind the segments: opening the log registers
+    segments missing from it, and segments() treats a month that has not
+    been compressed yet as open until its end. Record counts stay short by
+    the records of a 'group' or 'none' commit that never happened.
+
+    With a `legacy_file`, the first read or append moves the records of that
+    single-file CSV log into the segments of their months and renames the
+    file to <name>.migrated.
+    """
+    def __init__(self, directory=CONTRACT_LOG_DIR, durability='record', group_size=256, group_interval=1.0,
+                 legacy_file=None):
+        if durability not in DURABILITY_LEVELS:
+            raise ValueError(f"Unknown durability {durability!r}, use one of {', '.join(DURABILITY_LEVELS)}.")
+        self.directory = directory
+        self.manifest_path = os.path.join(directory, MANIFEST_FILE)
+        self.durability = durability
+        self.group_size = group_size
+        self.group_interval = group_interval
+        self._pending = {}  # segment name -> manifest additions not yet written
+        self._pending_records = 0
+        self._last_commit = time.monotonic()
+        self.legacy_file = legacy_file
+        if os.path.isdir(directory):
+            self._register_orphaned_segments()
+        atexit.register(self.commit)
+
+    def _register_orphaned_segments(self):
+        """Add segments on disk that the manifest does not list, left by a crash between write and manifest update."""
+        from legacy_import import iter_legacy_contracts
+        with self._locked():
+            manifest = self.manifest()
+            orphaned = {}
+            for path in glob.glob(os.path.join(self.directory, 'contracts_*.csv*')):
+                match = _SEGMENT_FILE.match(os.path.basename(path))
+                if match and match.group(1) not in manifest:
+                    orphaned[match.group(1)] = path
+            if not orphaned:
+                return
+            for name, path in orphaned.items():
+                records = sum(1 for _ in iter_legacy_contracts(path))
+                print(f"Contract log: registering segment {name} ({records} records) missing from the manifest")
+                manifest[name] = {'first': f"{_SEGMENT_FILE.match(name).group(2)}-01T00:00:00",
+                                  'last': _month_end(name), 'records': records,
+                                  'compressed': path.endswith(".gz")}
+            self._save_manifest(manifest)
+
+    def _migrate_legacy_file(self):
+        """Append the records of legacy_file to their months' segments, once, then rename it."""
+        if self.legacy_file is None or not os.path.exists(self.legacy_file):
+            return
+        from legacy_import import iter_legacy_contracts, legacy_record_date
+        with self._locked():
+            if not os.path.exists(self.legacy_file):
+                return  # another process migrated it meanwhile
+            manifest = self.manifest()
+            # Undated records go with the record before them; leading ones with the file's date
+            when = datetime.fromtimestamp(os.path.getmtime(self.legacy_file)).replace(microsecond=0)
+            added = {}
+            segment = name = None
+            start = 0
+            try:
+                with open(self.legacy_file, 'rb') as legacy:
+                    for record, end in iter_legacy_contracts(self.legacy_file):
+                        when = legacy_record_date(record) or when
+                        if segment_name(when) != name:
+                            if segment is not None:
+                                segment.close()
+                            name = segment_name(when)
+                            path = os.path.join(self.directory, name)
+                            if manifest.get(name, {}).get('compressed'):
+                                segment = gzip.open(path + ".gz", 'ab')  # gzip readers join appended members
+                            else:
+                                segment = open(path, 'ab')
+                        legacy.seek(start)
+                        segment.write(legacy.read(end - start))
+                        start = end
+                        stamp = when.isoformat(timespec='seconds')
+                        entry = added.setdefault(name, {'first': stamp, 'last': stamp, 'records': 0})
+                        entry['first'] = min(entry['first'], stamp)
+                        entry['last'] = max(entry['last'], stamp)
+                        entry['records'] += 1
+                    if segment is not None:
+                        # The blank row closing the last record
+                        legacy.seek(start)
+                        segment.write(legacy.read())
+            finally:
+                if segment is not None:
+                    segment.close()
+            for name, entry in added.items():
+                existing = manifest.setdefault(name, dict(entry, records=0, compressed=False))
+                existing['first'] = min(existing['first'], entry['first'])
+                existing['last'] = max(existing['last'], entry['last'])
+                existing['records'] += entry['records']
+            self._compress_closed_segments(manifest, datetime.now())
+            self._save_manifest(manifest)
+            os.replace(self.legacy_file, self.legacy_file + MIGRATED_SUFFIX)
+            print(f"Contract log: moved {sum(entry['records'] for entry in added.values())} contracts "
+                  f"from {self.legacy_file} into {len(added)} monthly segments")
+
+    @contextmanager
+    def _locked(self):
+        os.makedirs(self.directory, exist_ok=True)
+        fd = os.open(os.path.join(self.directory, LOCK_FILE), os.O_RDWR | os.O_CREAT, 0o644)
+        try:
+            if fcntl is not None:
+                fcntl.flock(fd, fcntl.LOCK_EX)
+            else:
+                while True:
+                    try:
+                        msvcrt.locking(fd, msvcrt.LK_LOCK, 1)
+                        break
+                    except OSError:
+                        pass  # LK_LOCK gives up after ten seconds; keep waiting
+            yield
+        finally:
+            if fcntl is not None:
+                fcntl.flock(fd, fcntl.LOCK_UN)
+            else:
+                os.lseek(fd, 0, os.SEEK_SET)
+                msvcrt.locking(fd, msvcrt.LK_UNLCK, 1)
+            os.close(fd)
+
+    def manifest(self):
+        """Segment file name -> {'first', 'last', 'records', 'compressed'}, as currently on disk."""
+        try:
+            with open(self.manifest_path, 'r', encoding='utf-8') as f:
+                return json.load(f)
+        except FileNotFoundError:
+            return {}
+
+    def _save_manifest(self, manifest):
+        tmp_path = self.manifest_path + ".tmp"
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump(manifest, f, indent=2, sort_keys=True)
+        os.replace(tmp_path, self.manifest_path)
+
+    def path(self, name, manifest=None):
+        """Path of a segment on disk, with .gz once it has been compressed."""
+        entry = (manifest if manifest is not None else self.manifest()).get(name, {})
+        return os.path.join(self.directory, name + (".gz" if entry.get('compressed') else ""))
+
+    def current_segment(self, when=None):
+        """Path of the (uncompressed) segment that records made at `when` are appended to."""
+        return os.path.join(self.directory, segment_name(when or datetime.now()))
+
+    def append(self, write_record, when=None):
+        """Append one record to its month's segment; write_record(file) writes its CSV rows."""
+        self._migrate_legacy_file()
+        when = when or datetime.now()
+        name = segment_name(when)
+        buffer = io.StringIO(newline='')
+        write_record(buffer)
+        block = buffer.getvalue().encode('utf-8')
+
+        with self._locked():
+            manifest = self.manifest()
+            if manifest.get(name, {}).get('compressed'):
+                raise ValueError(f"Segment {name} is already closed and compressed.")
+            fd = os.open(os.path.join(self.directory, name), os.O_WRONLY | os.O_APPEND | os.O_CREAT, 0o644)
+            try:
+                written = os.write(fd, block)
+                while written < len(block):
+                    written += os.write(fd, block[written:])
+                if self.durability == 'record':
+                    os.fsync(fd)
+            finally:
+                os.close(fd)
+
+            stamp = when.isoformat(timespec='seconds')
+            pending = self._pending.setdefault(name, {'first': stamp, 'last': stamp, 'records': 0})
+            pending['first'] = min(pending['first'], stamp)
+            pending['last'] = max(pending['last'], stamp)
+            pending['records'] += 1
+            self._pending_records += 1
+
+            # A new segment goes into the manifest right away, so a crash cannot hide it from readers
+            if (self.durability == 'record' or name not in manifest or self._pending_records >= self.group_size
+                    or time.monotonic() - self._last_commit >= self.group_interval):
+                self._commit_locked(manifest, when)
+
+    def commit(self):
+        """Write out everything appended so far: fsync the segments (unless durability is 'none') and update the manifest."""
+        if not self._pending:
+            return
+        with self._locked():
+            self._commit_locked(self.manifest(), datetime.now())
+
+    def close(self):
+        self.commit()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+    def _commit_locked(self, manifest, now):
+        if self.durability == 'group':
+            for name in self._pending:
+                fd = os.open(os.path.join(self.directory, name), os.O_RDONLY)
+                try:
+                    os.fsync(fd)
+                finally:
+                    os.close(fd)
+        for name, pending in self._pending.items():
+            entry = manifest.setdefault(name, dict(pending, records=0, compressed=False))
+            entry['first'] = min(entry['first'], pending['first'])
+            entry['last'] = max(entry['last'], pending['last'])
+            entry['records'] += pending['records']
+        self._pending = {}
+        self._pending_records = 0
+        self._last_commit = time.monotonic()
+        self._compress_closed_segments(manifest, now)
+        self._save_manifest(manifest)
+
+    def compress_closed_segments(self, now=None):
+        """Gzip every segment of a month before the one `now` falls in."""
+        with self._locked():
+            manifest = self.manifest()
+            self._compress_closed_segments(manifest, now or datetime.now())
+            self._save_manifest(manifest)
+
+    def _compress_closed_segments(self, manifest, now):
+        current = segment_name(now)
+        for name, entry in manifest.items():
+            if entry['compressed'] or name >= current or name in self._pending:
+                continue
+            raw_path = os.path.join(self.directory, name)
+            with open(raw_path, 'rb') as src, gzip.open(raw_path + ".gz.tmp", 'wb') as dst:
+                shutil.copyfileobj(src, dst, 1024 * 1024)
+            os.replace(raw_path + ".gz.tmp", raw_path + ".gz")
+            entry['compressed'] = True
+            os.remove(raw_path)
+
+    def segments(self, start=None, end=None):
+        """Paths of the segments holding records between start and end (datetimes, both optional), oldest first."""
+        self._migrate_legacy_file()
+        start = start.isoformat(timespec='seconds') if start else None
+        end = end.isoformat(timespec='seconds') if end else None
+        manifest = self.manifest()
+        # An uncompressed segment may hold records not yet committed to the manifest
+        return [self.path(name, manifest) for name, entry in sorted(manifest.items())
+                if (start is None or (entry['last'] if entry['compressed'] else _month_end(name)) >= start)
+                and (end is None or entry['first'] <= end)]
+
+
+    def months(self):
+        """Months ('YYYY-MM') the log has a segment for, newest first."""
+        self._migrate_legacy_file()
+        return sorted((_SEGMENT_FILE.match(name).group(2) for name in self.manifest()), reverse=True)
+
+    def export(self, file_path, months=None):
+        """Write the records of some months ('YYYY-MM', all if None) to one plain CSV file and return its path."""
+        self._migrate_legacy_file()
+        manifest = self.manifest()
+        with open(file_path, 'wb') as out:
+            for name in sorted(manifest):
+                if months is None or _SEGMENT_FILE.match(name).group(2) in months:
+                    with open_segment(self.path(name, manifest)) as segment:
+                        shutil.copyfileobj(segment, out, 1024 * 1024)
+        return file_path
+
+
+def open_segment(path):
+    """Open a segment for binary reading, decompressing it if needed."""
+    return gzip.open(path, 'rb') if path.endswith(".gz") else open(path, 'rb')
@@ -134,7 +134,7 @@ class ContractManagerController:
         Retrieve all contracts from the model.
 
         Returns:
-        - list: List of contract dictionaries.
+        - list: List of Contract records (indexable by column name).
         """
         try:
             return self.model.get_contracts()
@@ -0,0 +1,138 @@
+# customer_directory.py
+# Returning customers from stored contracts, with a sorted prefix index over
+# name, phone and ID number for type-ahead in the contract form.
+import bisect
+import re
+import unicodedata
+
+# Customers are seller_info / buyer_info dicts of the contract form
+from contract import PARTY_FIELDS
+
+_SPACES = re.compile(r'\s+')
+
+
+def normalize(text):
+    """Search form of a text: case- and accent-insensitive, single spaces."""
+    text = unicodedata.normalize('NFKD', text.casefold())
+    text = "".join(char for char in text if not unicodedata.combining(char))
+    return _SPACES.sub(' ', text).strip()
+
+
+def _digits(text):
+    return "".join(char for char in text if char.isdigit())
+
+
+class CustomerDirectory:
+    """Distinct customers with an incrementally maintained prefix index.
+
+    The index is one sorted list of (search key, customer number) pairs, where
+    a customer is reachable by "first last", "last first", the digits of the
+    phone number and the ID number. A lookup is a binary search plus a scan
+    over the matching range, so it does not grow with the number of customers.
+    A customer seen again (same name and phone, or same ID number) is updated
+    in place with the newest details.
+    """
+    def __init__(self):
+        self.customers = []
+        self._index = []
+        self._identities = {}
+
+    def __len__(self):
+        return len(self.customers)
+
+    @staticmethod
+    def _search_keys(customer):
+        first, last = normalize(customer.get('Vorname', '')), normalize(customer.get('Nachname', ''))
+        keys = {f"{first} {last}".strip(), f"{last} {first}".strip(),
+                _digits(customer.get('Telefon', '')), normalize(customer.get('Ausweis-Nr', ''))}
+        keys.discard('')
+        return keys
+
+    @staticmethod
+    def _identity_keys(customer):
+        name = (normalize(customer.get('Vorname', '')), normalize(customer.get('Nachname', '')))
+        keys = []
+        if customer.get('Ausweis-Nr', '').strip():
+            keys.append(('id', normalize(customer['Ausweis-Nr'])))
+        if any(name):
+            keys.append(('name', name, _digits(customer.get('Telefon', ''))))
+        return keys
+
+    def add(self, customer, index=True):
+        """Add or update a customer given as a PARTY_FIELDS dict; returns its number or None if unnamed."""
+        customer = {field: str(customer.get(field, '') or '').strip() for field in PARTY_FIELDS}
+        identities = self._identity_keys(customer)
+        if not any(key[0] == 'name' for key in identities):
+            return None
+        number = next((self._identities[key] for key in identities if key in self._identities), None)
+        if number is None:
+            number = len(self.customers)
+            self.customers.append(customer)
+            old_keys = set()
+        else:
+            old_keys = self._search_keys(self.customers[number])
+            # Keep details the new record leaves empty
+            merged = dict(self.customers[number])
+            merged.update({field: value for field, value in customer.items() if value})
+            self.customers[number] = customer = merged
+        for key in identities:
+            self._identities[key] = number
+        if not index:
+            return number
+
+        new_keys = self._search_keys(customer)
+        for key in old_keys - new_keys:
+            position = bisect.bisect_left(self._index, (key, number))
+            if position < len(self._index) and self._index[position] == (key, number):
+                del self._index[position]
+        for key in new_keys - old_keys:
+            bisect.insort(self._index, (key, number))
+        return number
+
+    def add_many(self, customers):
+        """Bulk load: add everything, then sort the index once."""
+        for customer in customers:
+            self.add(customer, index=False)
+        self._index = sorted({(key, number) for number, customer in enumerate(self.customers)
+                              for key in self._search_keys(customer)})
+
+    def merge(self, other):
+        """Add every customer of `other`, as newer records than the ones already here."""
+        for customer in other.customers:
+            self.add(customer)
+
+    def suggest(self, prefix, limit=8):
+        """Customers whose name (either order), phone digits or ID number start with prefix."""
+        query = normalize(prefix)
+        if not query:
+            return []
+        queries = [query]
+        if not re.search(r'[^\d\s/+()-]', query) and _digits(query) not in ('', query):
+            queries.append(_digits(query))  # a phone number typed with spaces or dashes
+        found = []
+        for query in queries:
+            position = bisect.bisect_left(self._index, (query,))
+            while position < len(self._index) and len(found) < limit:
+                key, number = self._index[position]
+                if not key.startswith(query):
+                    break
+                if number not in found:
+                    found.append(number)
+                position += 1
+        return [self.customers[number] for number in found]
+
+
+def customers_from_contract_log(log=None):
+    """Yield seller and buyer dicts of every contract in the contract log, oldest first."""
+    from legacy_import import iter_logged_contracts
+    for record in iter_logged_contracts(log):
+        for role in ('seller', 'buyer'):
+            if role in record:
+                yield dict(zip(PARTY_FIELDS, record[role]))
+
+
+def load_customer_directory(log=None):
+    """Build the directory from every contract in the contract log."""
+    directory = CustomerDirectory()
+    directory.add_many(customers_from_contract_log(log))
+    return directory
@@ -1,23 +1,254 @@
 import sqlite3
+import contextlib
+import functools
+import itertools
 import os
-import pandas as pd
-import matplotlib.pyplot as plt
-import matplotlib.backends.backend_pdf
+import time
 from datetime import datetime
 
 DB_FILE = os.path.join(os.path.dirname(__file__), '..', 'data', 'contracts.db')
 
+# Columns the purchase analytics can be grouped by
+ANALYTICS_DIMENSIONS = ('device_type', 'device_model', 'condition')
+
+# Columns of the contracts table, in table order
+CONTRACT_COLUMNS = (
+    'id', 'seller_first_name', 'seller_last_name', 'seller_address',
+    'seller_phone', 'seller_email', 'buyer_first_name', 'buyer_last_name',
+    'buyer_address', 'buyer_phone', 'buyer_email', 'device_type',
+    'device_model', 'imei_number', 'condition', 'price', 'terms', 'created_at'
+)
+# Large text columns a Contract reads only when they are accessed
+LAZY_COLUMNS = ('seller_address', 'buyer_address', 'terms')
+EAGER_COLUMNS = tuple(column for column in CONTRACT_COLUMNS if column not in LAZY_COLUMNS)
+
+# Normalized storage behind the contracts view: every distinct party (name,
+# address, phone, email) and device model is stored once
+CONTRACT_TABLES_SQL = '''
+    CREATE TABLE IF NOT EXISTS parties (
+        id INTEGER PRIMARY KEY,
+        first_name TEXT NOT NULL,
+        last_name TEXT NOT NULL,
+        address TEXT NOT NULL,
+        phone TEXT NOT NULL,
+        email TEXT NOT NULL,
+        UNIQUE (first_name, last_name, address, phone, email)
+    );
+
+    CREATE TABLE IF NOT EXISTS devices (
+        id INTEGER PRIMARY KEY,
+        device_type TEXT NOT NULL,
+        device_model TEXT NOT NULL,
+        UNIQUE (device_type, device_model)
+    );
+
+    CREATE TABLE IF NOT EXISTS contract_records (
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        seller_id INTEGER NOT NULL REFERENCES parties (id),
+        buyer_id INTEGER NOT NULL REFERENCES parties (id),
+        device_id INTEGER NOT NULL REFERENCES devices (id),
+        imei_number TEXT NOT NULL,
+        condition TEXT NOT NULL,
+        price REAL NOT NULL,
+        terms TEXT,
+        created_at TEXT NOT NULL
+    );
+    CREATE INDEX IF NOT EXISTS idx_contract_records_seller ON contract_records (seller_id);
+    CREATE INDEX IF NOT EXISTS idx_contract_records_buyer ON contract_records (buyer_id);
+'''
+
+# The contracts table as it was before normalizing, with triggers that turn
+# writes of flat rows into writes of the normalized tables
+CONTRACTS_VIEW_SQL = '''
+    CREATE VIEW IF NOT EXISTS contracts AS
+        SELECT c.id,
+               s.first_name AS seller_first_name, s.last_name AS seller_last_name, s.address AS seller_address,
+               s.phone AS seller_phone, s.email AS seller_email,
+               b.first_name AS buyer_first_name, b.last_name AS buyer_last_name, b.address AS buyer_address,
+               b.phone AS buyer_phone, b.email AS buyer_email,
+               d.device_type, d.device_model,
+               c.imei_number, c.condition, c.price, c.terms, c.created_at
+        FROM contract_records c
+        JOIN parties s ON s.id = c.seller_id
+        JOIN parties b ON b.id = c.buyer_id
+        JOIN devices d ON d.id = c.device_id;
+
+    CREATE TRIGGER IF NOT EXISTS contracts_insert INSTEAD OF INSERT ON contracts
+    BEGIN
+        INSERT INTO parties (first_name, last_name, address, phone, email)
+        VALUES (NEW.seller_first_name, NEW.seller_last_name, NEW.seller_address, NEW.seller_phone, NEW.seller_email),
+               (NEW.buyer_first_name, NEW.buyer_last_name, NEW.buyer_address, NEW.buyer_phone, NEW.buyer_email)
+        ON CONFLICT DO NOTHING;
+        INSERT INTO devices (device_type, device_model) VALUES (NEW.device_type, NEW.device_model)
+        ON CONFLICT DO NOTHING;
+        INSERT INTO contract_records (
+            id, seller_id, buyer_id, device_id, imei_number, condition, price, terms, created_at
+        )
+        VALUES (
+            NEW.id,
+            (SELECT id FROM parties WHERE (first_name, last_name, address, phone, email) =
+                (NEW.seller_first_name, NEW.seller_last_name, NEW.seller_address, NEW.seller_phone, NEW.seller_email)),
+            (SELECT id FROM parties WHERE (first_name, last_name, address, phone, email) =
+                (NEW.buyer_first_name, NEW.buyer_last_name, NEW.buyer_address, NEW.buyer_phone, NEW.buyer_email)),
+            (SELECT id FROM devices WHERE (device_type, device_model) = (NEW.device_type, NEW.device_model)),
+            NEW.imei_number, NEW.condition, NEW.price, NEW.terms, NEW.created_at
+        );
+    END;
+
+    CREATE TRIGGER IF NOT EXISTS contracts_update INSTEAD OF UPDATE ON contracts
+    BEGIN
+        INSERT INTO parties (first_name, last_name, address, phone, email)
+        VALUES (NEW.seller_first_name, NEW.seller_last_name, NEW.seller_address, NEW.seller_phone, NEW.seller_email),
+               (NEW.buyer_first_name, NEW.buyer_last_name, NEW.buyer_address, NEW.buyer_phone, NEW.buyer_email)
+        ON CONFLICT DO NOTHING;
+        INSERT INTO devices (device_type, device_model) VALUES (NEW.device_type, NEW.device_model)
+        ON CONFLICT DO NOTHING;
+        UPDATE contract_records
+        SET seller_id = (SELECT id FROM parties WHERE (first_name, last_name, address, phone, email) =
+                (NEW.seller_first_name, NEW.seller_last_name, NEW.seller_address, NEW.seller_phone, NEW.seller_email)),
+            buyer_id = (SELECT id FROM parties WHERE (first_name, last_name, address, phone, email) =
+                (NEW.buyer_first_name, NEW.buyer_last_name, NEW.buyer_address, NEW.buyer_phone, NEW.buyer_email)),
+            device_id = (SELECT id FROM devices WHERE (device_type, device_model) = (NEW.device_type, NEW.device_model)),
+            imei_number = NEW.imei_number, condition = NEW.condition, price = NEW.price,
+            terms = NEW.terms, created_at = NEW.created_at
+        WHERE id = OLD.id;
+    END;
+
+    CREATE TRIGGER IF NOT EXISTS contracts_delete INSTEAD OF DELETE ON contracts
+    BEGIN
+        DELETE FROM contract_records WHERE id = OLD.id;
+    END;
+'''
+
+# Flat rows written by add_contract(s), moved into the normalized tables with
+# one INSERT ... SELECT per table instead of the view's per-row trigger
+CONTRACTS_STAGING_SQL = '''
+    CREATE TEMP TABLE IF NOT EXISTS contracts_staging (
+        seller_first_name, seller_last_name, seller_address, seller_phone, seller_email,
+        buyer_first_name, buyer_last_name, buyer_address, buyer_phone, buyer_email,
+        device_type, device_model, imei_number, condition, price, terms, created_at
+    )
+'''
+
+_NOT_LOADED = object()
+
+# Seconds the query cache trusts itself before checking for contract changes made by other connections
+CACHE_CHECK_INTERVAL = 0.5
+
+
+class Contract:
+    """A row of the contracts table with named attribute access.
+
+    Instances are built by ContractModel.get_contracts and get_contract_by_id
+    from rows of EAGER_COLUMNS, or by Contract.from_row. The addresses and terms are not part of the
+    row; they are read from the database the first time any of them is
+    accessed, so the connection must still be open at that point.
+    Indexing by position or column name works like the former tuples and dicts.
+    """
+    __slots__ = EAGER_COLUMNS + ('_conn', '_seller_address', '_buyer_address', '_terms')
+
+    def __init__(self, conn, id, seller_first_name, seller_last_name, seller_phone, seller_email,
+                 buyer_first_name, buyer_last_name, buyer_phone, buyer_email, device_type,
+                 device_model, imei_number, condition, price, created_at):
+        self._conn = conn
+        self.id = id
+        self.seller_first_name = seller_first_name
+        self.seller_last_name = seller_last_name
+        self.seller_phone = seller_phone
+        self.seller_email = seller_email
+        self.buyer_first_name = buyer_first_name
+        self.buyer_last_name = buyer_last_name
+        self.buyer_phone = buyer_phone
+        self.buyer_email = buyer_email
+        self.device_type = device_type
+        self.device_model = device_model
+        self.imei_number = imei_number
+        self.condition = condition
+        self.price = price
+        self.created_at = created_at
+        self._seller_address = self._buyer_address = self._terms = _NOT_LOADED
+
+    @classmethod
+    def from_row(cls, cursor, row):
+        """sqlite3 row factory for SELECTs of EAGER_COLUMNS."""
+        return cls(cursor.connection, *row)
+
+    def _load_large_columns(self):
+        row = self._conn.execute(
+            'SELECT seller_address, buyer_address, terms FROM contracts WHERE id=?', (self.id,)).fetchone()
+        self._seller_address, self._buyer_address, self._terms = row if row else (None, None, None)
+
+    @property
+    def seller_address(self):
+        if self._seller_address is _NOT_LOADED:
+            self._load_large_columns()
+        return self._seller_address
+
+    @property
+    def buyer_address(self):
+        if self._buyer_address is _NOT_LOADED:
+            self._load_large_columns()
+        return self._buyer_address
+
+    @property
+    def terms(self):
+        if self._terms is _NOT_LOADED:
+            self._load_large_columns()
+        return self._terms
+
+    def as_tuple(self):
+        """All columns in table order, as get_contracts used to return them."""
+        return tuple(getattr(self, column) for column in CONTRACT_COLUMNS)
+
+    def as_dict(self):
+        return {column: getattr(self, column) for column in CONTRACT_COLUMNS}
+
+    def __getitem__(self, key):
+        if isinstance(key, str):
+            if key not in CONTRACT_COLUMNS:
+                raise KeyError(key)
+            return getattr(self, key)
+        # Positions map to column names, so only indexing a lazy column loads it
+        if isinstance(key, slice):
+            return tuple(getattr(self, column) for column in CONTRACT_COLUMNS[key])
+        return getattr(self, CONTRACT_COLUMNS[key])
+
+    def __iter__(self):
+        return iter(self.as_tuple())
+
+    def __len__(self):
+        return len(CONTRACT_COLUMNS)
+
+    def __repr__(self):
+        return f"Contract(id={self.id!r}, seller={self.seller_last_name!r}, buyer={self.buyer_last_name!r}, " \
+               f"device={f'{self.device_type} {self.device_model}'!r}, price={self.price!r})"
+
+
 class ContractModel:
-    def __init__(self):
-        """Initialize the ContractModel and create the database connection."""
-        self.conn = self.create_connection(DB_FILE)
+    def __init__(self, db_file=DB_FILE, cache=None, cache_check_interval=CACHE_CHECK_INTERVAL):
+        """Initialize the ContractModel and create the database connection.
+
+        `cache` is an optional query_cache.QueryCache that get_contract_by_id,
+        get_contracts and get_purchase_summary read through. Changes committed
+        by other connections become visible to cached reads after at most
+        `cache_check_interval` seconds.
+        """
+        self.db_file = db_file
+        self.conn = self.create_connection(db_file)
         self.cursor = self.conn.cursor()
         self.create_tables_if_not_exist()
+        self.cache = cache
+        self.cache_check_interval = cache_check_interval
+        self._cache_version = None
+        self._cache_changes = None
+        self._cache_checked = 0.0
 
     def create_connection(self, db_file):
         """Create a database connection to the SQLite database."""
         try:
             conn = sqlite3.connect(db_file)
+            # In WAL mode readers, such as a backup being copied, never block writers
+            conn.execute('PRAGMA journal_mode=WAL')
             print(f"Connected to database: {db_file}")
             return conn
         except sqlite3.Error as e:
@@ -25,62 +256,360 @@ class ContractModel:
             return None
 
     def create_tables_if_not_exist(self):
-        """Create the contracts table if it does not exist."""
-        sql_create_contracts_table = """ 
-            CREATE TABLE IF NOT EXISTS contracts (
-                id INTEGER PRIMARY KEY AUTOINCREMENT,
-                seller_first_name TEXT NOT NULL,
-                seller_last_name TEXT NOT NULL,
-                seller_address TEXT NOT NULL,
-                seller_phone TEXT NOT NULL,
-                seller_email TEXT NOT NULL,
-                buyer_first_name TEXT NOT NULL,
-                buyer_last_name TEXT NOT NULL,
-                buyer_address TEXT NOT NULL,
-                buyer_phone TEXT NOT NULL,
-                buyer_email TEXT NOT NULL,
-                device_type TEXT NOT NULL,
-                device_model TEXT NOT NULL,
-                imei_number TEXT NOT NULL,
-                condition TEXT NOT NULL,
-                price REAL NOT NULL,
-                terms TEXT,
-                created_at TEXT NOT NULL
-            )
+        """Create the contracts schema if it does not exist.
+
+        Parties and device models are stored once in their own tables and
+        contract_records refers to them by ID. The contracts view joins them
+        back into the original flat rows, and its INSTEAD OF triggers accept
+        inserts, updates and deletes in that shape, so reads and writes of
+        `contracts` keep working. A database that still has the flat contracts
+        table is migrated.
         """
         try:
-            self.cursor.execute(sql_create_contracts_table)
+            self.cursor.executescript(CONTRACT_TABLES_SQL)
+            self.cursor.execute("SELECT type FROM sqlite_master WHERE name='contracts'")
+            existing = self.cursor.fetchone()
+            if existing and existing[0] == 'table':
+                self.migrate_flat_contracts()
+            else:
+                self.cursor.executescript(CONTRACTS_VIEW_SQL)
             self.conn.commit()
             print("Contracts table created successfully.")
         except sqlite3.Error as e:
             print(f"Error creating tables: {e}")
+        self.create_analytics_tables()
+
+    def migrate_flat_contracts(self):
+        """Move the rows of a flat contracts table into the normalized tables and replace it by the view.
+
+        Contract IDs and the AUTOINCREMENT counter are kept. The migration is a
+        single transaction and the file is vacuumed afterwards to give the
+        space of the flat table back, and analyzed so the query planner knows
+        that looking up a party first is cheaper than scanning the contracts.
+        """
+        started = time.perf_counter()
+        try:
+            self.cursor.executescript('''
+                BEGIN;
+                INSERT OR IGNORE INTO parties (first_name, last_name, address, phone, email)
+                    SELECT seller_first_name, seller_last_name, seller_address, seller_phone, seller_email
+                    FROM contracts
+                    UNION ALL
+                    SELECT buyer_first_name, buyer_last_name, buyer_address, buyer_phone, buyer_email
+                    FROM contracts;
+                INSERT OR IGNORE INTO devices (device_type, device_model)
+                    SELECT device_type, device_model FROM contracts;
+                INSERT INTO contract_records (
+                    id, seller_id, buyer_id, device_id, imei_number, condition, price, terms, created_at
+                )
+                    SELECT c.id, s.id, b.id, d.id, c.imei_number, c.condition, c.price, c.terms, c.created_at
+                    FROM contracts c
+                    JOIN parties s ON (s.first_name, s.last_name, s.address, s.phone, s.email) =
+                        (c.seller_first_name, c.seller_last_name, c.seller_address, c.seller_phone, c.seller_email)
+                    JOIN parties b ON (b.first_name, b.last_name, b.address, b.phone, b.email) =
+                        (c.buyer_first_name, c.buyer_last_name, c.buyer_address, c.buyer_phone, c.buyer_email)
+                    JOIN devices d ON (d.device_type, d.device_model) = (c.device_type, c.device_model)
+                    ORDER BY c.id;
+                DELETE FROM sqlite_sequence WHERE name = 'contract_records';
+                INSERT INTO sqlite_sequence (name, seq)
+                    SELECT 'contract_records', seq FROM sqlite_sequence WHERE name = 'contracts';
+                DROP TABLE contracts;
+            ''' + CONTRACTS_VIEW_SQL + '''
+                COMMIT;
+            ''')
+        except sqlite3.Error:
+            self.conn.rollback()
+            raise
+        self.cursor.execute('VACUUM')
+        self.cursor.execute('ANALYZE')
+        self.cursor.execute('SELECT COUNT(*) FROM contract_records')
+        print(f"Migrated {self.cursor.fetchone()[0]} contracts to the normalized schema "
+              f"in {time.perf_counter() - started:.2f}s.")
+
+    def create_analytics_tables(self):
+        """Create the purchase summary table and the triggers that keep it current.
+
+        purchase_summary holds one row per month, device type, model and
+        condition. Triggers on contracts adjust it row by row, so reading the
+        analytics never scans the contracts. analytics_state.version is
+        bumped on every change and lets callers cache derived results.
+        """
+        try:
+            self.cursor.execute(
+                "SELECT 1 FROM sqlite_master WHERE type='table' AND name='purchase_summary'")
+            needs_backfill = self.cursor.fetchone() is None
+
+            self.cursor.executescript('''
+                CREATE INDEX IF NOT EXISTS idx_contract_records_device_period
+                    ON contract_records (device_id, condition, created_at, price);
+                CREATE INDEX IF NOT EXISTS idx_contract_records_period
+                    ON contract_records (created_at, price);
+
+                CREATE TABLE IF NOT EXISTS purchase_summary (
+                    month TEXT NOT NULL,
+                    device_type TEXT NOT NULL,
+                    device_model TEXT NOT NULL,
+                    condition TEXT NOT NULL,
+                    purchases INTEGER NOT NULL,
+                    total_price REAL NOT NULL,
+                    PRIMARY KEY (month, device_type, device_model, condition)
+                ) WITHOUT ROWID;
+
+                CREATE TABLE IF NOT EXISTS analytics_state (
+                    id INTEGER PRIMARY KEY CHECK (id = 1),
+                    version INTEGER NOT NULL
+                );
+                INSERT OR IGNORE INTO analytics_state (id, version) VALUES (1, 0);
+
+                CREATE TRIGGER IF NOT EXISTS contract_records_summary_insert AFTER INSERT ON contract_records
+                BEGIN
+                    INSERT INTO purchase_summary (month, device_type, device_model, condition, purchases, total_price)
+                    SELECT substr(NEW.created_at, 1, 7), device_type, device_model, NEW.condition, 1, NEW.price
+                    FROM devices WHERE id = NEW.device_id
+                    ON CONFLICT (month, device_type, device_model, condition) DO UPDATE
+                    SET purchases = purchases + 1, total_price = total_price + excluded.total_price;
+                    UPDATE analytics_state SET version = version + 1;
+                END;
+
+                CREATE TRIGGER IF NOT EXISTS contract_records_summary_delete AFTER DELETE ON contract_records
+                BEGIN
+                    UPDATE purchase_summary
+                    SET purchases = purchases - 1, total_price = total_price - OLD.price
+                    WHERE month = substr(OLD.created_at, 1, 7) AND condition = OLD.condition
+                      AND (device_type, device_model) = (SELECT device_type, device_model FROM devices WHERE id = OLD.device_id);
+                    DELETE FROM purchase_summary
+                    WHERE month = substr(OLD.created_at, 1, 7) AND condition = OLD.condition AND purchases <= 0
+                      AND (device_type, device_model) = (SELECT device_type, device_model FROM devices WHERE id = OLD.device_id);
+                    UPDATE analytics_state SET version = version + 1;
+                END;
+
+                CREATE TRIGGER IF NOT EXISTS contract_records_summary_update
+                AFTER UPDATE OF device_id, condition, price, created_at ON contract_records
+                BEGIN
+                    UPDATE purchase_summary
+                    SET purchases = purchases - 1, total_price = total_price - OLD.price
+                    WHERE month = substr(OLD.created_at, 1, 7) AND condition = OLD.condition
+                      AND (device_type, device_model) = (SELECT device_type, device_model FROM devices WHERE id = OLD.device_id);
+                    DELETE FROM purchase_summary
+                    WHERE month = substr(OLD.created_at, 1, 7) AND condition = OLD.condition AND purchases <= 0
+                      AND (device_type, device_model) = (SELECT device_type, device_model FROM devices WHERE id = OLD.device_id);
+                    INSERT INTO purchase_summary (month, device_type, device_model, condition, purchases, total_price)
+                    SELECT substr(NEW.created_at, 1, 7), device_type, device_model, NEW.condition, 1, NEW.price
+                    FROM devices WHERE id = NEW.device_id
+                    ON CONFLICT (month, device_type, device_model, condition) DO UPDATE
+                    SET purchases = purchases + 1, total_price = total_price + excluded.total_price;
+                    UPDATE analytics_state SET version = version + 1;
+                END;
+            ''')
+
+            if needs_backfill:
+                # Existing contracts, aggregated once through the covering index
+                self.cursor.execute('''
+                    INSERT INTO purchase_summary (month, device_type, device_model, condition, purchases, total_price)
+                    SELECT substr(created_at, 1, 7), device_type, device_model, condition, COUNT(*), SUM(price)
+                    FROM contracts
+                    GROUP BY 1, 2, 3, 4
+                ''')
+            self.conn.commit()
+        except sqlite3.Error as e:
+            print(f"Error creating analytics tables: {e}")
 
     def add_contract(self, seller_first_name, seller_last_name, seller_address, seller_phone,
                      seller_email, buyer_first_name, buyer_last_name, buyer_address,
                      buyer_phone, buyer_email, device_type, device_model, imei_number,
                      condition, price, terms):
-        """Insert a new contract into the contracts table."""
+        """Insert a new contract into the contracts table and return its ID (None on error)."""
         created_at = datetime.now().isoformat()
         try:
-            self.cursor.execute('''
-                INSERT INTO contracts (
+            with self._writing():
+                _, contract_id = self.insert_contract_rows([(
                     seller_first_name, seller_last_name, seller_address, seller_phone,
                     seller_email, buyer_first_name, buyer_last_name, buyer_address,
                     buyer_phone, buyer_email, device_type, device_model,
-                    imei_number, condition, price, terms, created_at
-                )
-                VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
-            ''', (seller_first_name, seller_last_name, seller_address, seller_phone,
-                  seller_email, buyer_first_name, buyer_last_name, buyer_address,
-                  buyer_phone, buyer_email, device_type, device_model,
-                  imei_number, condition, price, terms, created_at))
-            self.conn.commit()
+                    imei_number, condition, price, terms, created_at)])
             print("Contract added successfully.")
+            return contract_id
         except sqlite3.Error as e:
             print(f"Error adding contract: {e}")
+            return None
+
+    def add_contracts(self, rows):
+        """Insert many contracts in one transaction.
+
+        Each row holds the add_contract values followed by created_at. Returns
+        the number of rows inserted (0 if the batch was rolled back).
+        """
+        try:
+            with self._writing():
+                count, _ = self.insert_contract_rows(rows)
+            return count
+        except sqlite3.Error as e:
+            print(f"Error adding contracts: {e}")
+            return 0
+
+    def insert_contract_rows(self, rows):
+        """Write flat contract rows (add_contracts order) straight into the normalized tables.
+
+        The rows are staged in a temporary table and moved with one
+        INSERT ... SELECT per table, like migrate_flat_contracts, rather than
+        through the contracts view, whose INSTEAD OF trigger runs three
+        inserts and four lookups per row and leaves rowcount and lastrowid at
+        0. Runs in the caller's transaction and does not commit.
+
+        A single row skips the staging table and is written by the same
+        statements as the trigger.
+
+        Returns:
+        - tuple: (rows inserted, ID of the last one), IDs being consecutive.
+        """
+        rows = list(rows)
+        if len(rows) == 1:
+            row = tuple(rows[0])
+            seller, buyer, device, record = row[0:5], row[5:10], row[10:12], row[12:]
+            self.conn.execute('''
+                INSERT INTO parties (first_name, last_name, address, phone, email)
+                VALUES (?, ?, ?, ?, ?), (?, ?, ?, ?, ?)
+                ON CONFLICT DO NOTHING
+            ''', seller + buyer)
+            self.conn.execute('''
+                INSERT INTO devices (device_type, device_model) VALUES (?, ?)
+                ON CONFLICT DO NOTHING
+            ''', device)
+            cursor = self.conn.execute('''
+                INSERT INTO contract_records (
+                    seller_id, buyer_id, device_id, imei_number, condition, price, terms, created_at
+                )
+                VALUES (
+                    (SELECT id FROM parties WHERE (first_name, last_name, address, phone, email) = (?, ?, ?, ?, ?)),
+                    (SELECT id FROM parties WHERE (first_name, last_name, address, phone, email) = (?, ?, ?, ?, ?)),
+                    (SELECT id FROM devices WHERE (device_type, device_model) = (?, ?)),
+                    ?, ?, ?, ?, ?
+                )
+            ''', seller + buyer + device + record)
+            return 1, cursor.lastrowid
+        self.conn.execute(CONTRACTS_STAGING_SQL)
+        self.conn.execute('DELETE FROM temp.contracts_staging')
+        self.conn.executemany(f"INSERT INTO temp.contracts_staging VALUES ({', '.join('?' * 17)})", rows)
+        self.conn.execute('''
+            INSERT INTO parties (first_name, last_name, address, phone, email)
+                SELECT seller_first_name, seller_last_name, seller_address, seller_phone, seller_email
+                FROM temp.contracts_staging
+                UNION ALL
+                SELECT buyer_first_name, buyer_last_name, buyer_address, buyer_phone, buyer_email
+                FROM temp.contracts_staging
+                WHERE true
+            ON CONFLICT DO NOTHING
+        ''')
+        self.conn.execute('''
+            INSERT INTO devices (device_type, device_model)
+                SELECT device_type, device_model FROM temp.contracts_staging WHERE true
+            ON CONFLICT DO NOTHING
+        ''')
+        cursor = self.conn.execute('''
+            INSERT INTO contract_records (
+                seller_id, buyer_id, device_id, imei_number, condition, price, terms, created_at
+            )
+                SELECT s.id, b.id, d.id, c.imei_number, c.condition, c.price, c.terms, c.created_at
+                FROM temp.contracts_staging c
+                JOIN parties s ON (s.first_name, s.last_name, s.address, s.phone, s.email) =
+                    (c.seller_first_name, c.seller_last_name, c.seller_address, c.seller_phone, c.seller_email)
+                JOIN parties b ON (b.first_name, b.last_name, b.address, b.phone, b.email) =
+                    (c.buyer_first_name, c.buyer_last_name, c.buyer_address, c.buyer_phone, c.buyer_email)
+                JOIN devices d ON (d.device_type, d.device_model) = (c.device_type, c.device_model)
+                ORDER BY c.rowid
+        ''')
+        count, last_id = cursor.rowcount, cursor.lastrowid
+        self.conn.execute('DELETE FROM temp.contracts_staging')
+        return count, last_id
+
+    def contract_cursor(self):
+        """Return a cursor that yields Contract records."""
+        cursor = self.conn.cursor()
+        cursor.row_factory = Contract.from_row
+        return cursor
+
+    def _cached(self, key, load):
+        """Return load() through the cache, if there is one.
+
+        Writes through this model drop exactly the entries they affect. Any
+        other change to the contracts table shows up as a new analytics
+        version and clears the whole cache. The version is only read when
+        this connection changed rows since the last check (SQL run directly
+        on self.conn, replication), or cache_check_interval has passed (other
+        connections); a hit otherwise costs no query.
+        """
+        if self.cache is None:
+            return load()
+        if (self.conn.total_changes != self._cache_changes
+                or time.monotonic() - self._cache_checked >= self.cache_check_interval):
+            version = self.get_analytics_version()
+            if version != self._cache_version:
+                self.cache.clear()
+            self._mark_cache_current(version)
+        hit, value = self.cache.get(key)
+        if not hit:
+            value = load()
+            self.cache.put(key, value)
+        return value
+
+    def _mark_cache_current(self, version):
+        self._cache_version = version
+        self._cache_changes = self.conn.total_changes
+        self._cache_checked = time.monotonic()
+
+    @contextlib.contextmanager
+    def _writing(self, contract_id=None):
+        """Transaction for a write through this model that keeps the cache in step with it.
+
+        The write lock is taken before the analytics version is read, so
+        between the reads before and after the write the version only moves
+        by this write's own bumps.
+        """
+        if self.cache is None:
+            with self.conn:
+                yield
+            return
+        with self.conn:
+            if not self.conn.in_transaction:
+                self.conn.execute('BEGIN IMMEDIATE')
+            before = self.get_analytics_version()
+            yield
+            after = self.get_analytics_version()
+        self._invalidate(contract_id, before, after)
+
+    def _invalidate(self, contract_id, before, after):
+        """Drop the cache entries a write through this model made stale.
+
+        `before` and `after` are the analytics versions around the write; if
+        another connection changed the contracts since the last check, the
+        whole cache is dropped.
+        """
+        if before != self._cache_version:
+            self.cache.clear()
+        else:
+            if contract_id is None:
+                # New rows: forget ids that were looked up and not found
+                self.cache.discard_where(lambda key, value: key[0] == 'contract' and value is None)
+            else:
+                self.cache.discard(('contract', contract_id))
+            self.cache.discard_where(lambda key, value: key[0] == 'query')
+        self._mark_cache_current(after)
 
     def get_contracts(self):
-        """Fetch all contracts from the database."""
+        """Fetch all contracts from the database as Contract records."""
+        # The cache holds the eager columns as plain rows and every call gets
+        # its own records, so lazy columns a caller loads never grow the cache
+        def load():
+            return self.conn.execute(f"SELECT {', '.join(EAGER_COLUMNS)} FROM contracts").fetchall()
+        try:
+            return list(itertools.starmap(functools.partial(Contract, self.conn),
+                                          self._cached(('query', 'get_contracts'), load)))
+        except sqlite3.Error as e:
+            print(f"Error fetching contracts: {e}")
+            return []
+
+    def get_contract_rows(self):
+        """Fetch all contracts as plain tuples with every column, for bulk exports."""
         try:
             self.cursor.execute('SELECT * FROM contracts')
             return self.cursor.fetchall()
@@ -90,31 +619,76 @@ class ContractModel:
 
     def get_contract_by_id(self, contract_id):
         """Fetch a contract by its ID."""
+        def load():
+            return self.conn.execute(f"SELECT {', '.join(EAGER_COLUMNS)} FROM contracts WHERE id=?",
+                                     (contract_id,)).fetchone()
         try:
-            self.cursor.execute('SELECT * FROM contracts WHERE id=?', (contract_id,))
-            return self.cursor.fetchone()
+            row = self._cached(('contract', contract_id), load)
+            return Contract(self.conn, *row) if row else None
         except sqlite3.Error as e:
             print(f"Error fetching contract by ID: {e}")
             return None
 
+    def get_purchase_summary(self, group_by=('device_type',), start_month=None, end_month=None):
+        """Purchase volume and average price per month, grouped by device columns.
+
+        Args:
+        - group_by (tuple): Any of 'device_type', 'device_model', 'condition'.
+        - start_month, end_month (str): Optional inclusive bounds in format '%Y-%m'.
+
+        Returns:
+        - list: Rows of (month, *group values, purchases, average price), ordered by month.
+        """
+        columns = [column for column in group_by if column in ANALYTICS_DIMENSIONS]
+        if len(columns) != len(group_by):
+            raise ValueError(f"Can only group by {', '.join(ANALYTICS_DIMENSIONS)}.")
+        select = ", ".join(["month"] + columns)
+        sql = f"SELECT {select}, SUM(purchases), SUM(total_price) / SUM(purchases) FROM purchase_summary"
+        conditions, params = [], []
+        if start_month:
+            conditions.append("month >= ?")
+            params.append(start_month)
+        if end_month:
+            conditions.append("month <= ?")
+            params.append(end_month)
+        if conditions:
+            sql += " WHERE " + " AND ".join(conditions)
+        sql += f" GROUP BY {select} ORDER BY {select}"
+        try:
+            return list(self._cached(('query', 'get_purchase_summary', sql, tuple(params)),
+                                     lambda: self.conn.execute(sql, params).fetchall()))
+        except sqlite3.Error as e:
+            print(f"Error fetching purchase summary: {e}")
+            return []
+
+    def get_analytics_version(self):
+        """Return a counter that changes whenever the contracts table changes."""
+        try:
+            self.cursor.execute('SELECT version FROM analytics_state WHERE id = 1')
+            row = self.cursor.fetchone()
+            return row[0] if row else 0
+        except sqlite3.Error as e:
+            print(f"Error fetching analytics version: {e}")
+            return 0
+
     def update_contract(self, contract_id, seller_first_name, seller_last_name, seller_address,
                         seller_phone, seller_email, buyer_first_name, buyer_last_name,
                         buyer_address, buyer_phone, buyer_email, device_type, device_model,
                         imei_number, condition, price, terms):
         """Update a contract's details."""
         try:
-            self.cursor.execute('''
-                UPDATE contracts 
-                SET seller_first_name=?, seller_last_name=?, seller_address=?, seller_phone=?,
-                    seller_email=?, buyer_first_name=?, buyer_last_name=?, buyer_address=?,
-                    buyer_phone=?, buyer_email=?, device_type=?, device_model=?,
-                    imei_number=?, condition=?, price=?, terms=?
-                WHERE id=?
-            ''', (seller_first_name, seller_last_name, seller_address, seller_phone,
-                  seller_email, buyer_first_name, buyer_last_name, buyer_address,
-                  buyer_phone, buyer_email, device_type, device_model,
-                  imei_number, condition, price, terms, contract_id))
-            self.conn.commit()
+            with self._writing(contract_id):
+                self.cursor.execute('''
+                    UPDATE contracts 
+                    SET seller_first_name=?, seller_last_name=?, seller_address=?, seller_phone=?,
+                        seller_email=?, buyer_first_name=?, buyer_last_name=?, buyer_address=?,
+                        buyer_phone=?, buyer_email=?, device_type=?, device_model=?,
+                        imei_number=?, condition=?, price=?, terms=?
+                    WHERE id=?
+                ''', (seller_first_name, seller_last_name, seller_address, seller_phone,
+                      seller_email, buyer_first_name, buyer_last_name, buyer_address,
+                      buyer_phone, buyer_email, device_type, device_model,
+                      imei_number, condition, price, terms, contract_id))
             print("Contract updated successfully.")
         except sqlite3.Error as e:
             print(f"Error updating contract: {e}")
@@ -122,96 +696,59 @@ class ContractModel:
     def remove_contract(self, contract_id):
         """Remove a contract from the database."""
         try:
-            self.cursor.execute('DELETE FROM contracts WHERE id=?', (contract_id,))
-            self.conn.commit()
+            with self._writing(contract_id):
+                self.cursor.execute('DELETE FROM contracts WHERE id=?', (contract_id,))
             print("Contract removed successfully.")
         except sqlite3.Error as e:
             print(f"Error removing contract: {e}")
 
+    def export(self, csv_path=None, pdf_path=None, sqlite_path=None, columnar_path=None):
+        """Export contracts to any combination of CSV, PDF, SQLite and columnar files in a single read of the table.
+
+        Returns the export_pipeline summary, or None if no target was given.
+        """
+        from export_pipeline import ColumnarSink, CsvSink, PdfSink, SqliteSink, export_contracts
+        sinks = []
+        if csv_path:
+            sinks.append(CsvSink(csv_path))
+        if pdf_path:
+            sinks.append(PdfSink(pdf_path))
+        if sqlite_path:
+            sinks.append(SqliteSink(sqlite_path))
+        if columnar_path:
+            sinks.append(ColumnarSink(columnar_path))
+        if not sinks:
+            return None
+        try:
+            summary = export_contracts(self, sinks)
+        except sqlite3.Error as e:
+            print(f"Error reading contracts for export: {e}")
+            return None
+        for sink in sinks:
+            if summary['sinks'][sink.name]['error'] is None:
+                print(f"Data exported to {sink.file_path} successfully.")
+        return summary
+
     def export_to_csv(self, file_path):
         """Export contracts to a CSV file."""
-        try:
-            contracts = self.get_contracts()
-            df = pd.DataFrame(contracts, columns=[
-                'id', 'seller_first_name', 'seller_last_name', 'seller_address',
-                'seller_phone', 'seller_email', 'buyer_first_name', 'buyer_last_name',
-                'buyer_address', 'buyer_phone', 'buyer_email', 'device_type',
-                'device_model', 'imei_number', 'condition', 'price', 'terms', 'created_at'
-            ])
-            df.to_csv(file_path, index=False)
-            print(f"Data exported to {file_path} successfully.")
-        except Exception as e:
-            print(f"Error exporting to CSV: {e}")
+        return self.export(csv_path=file_path)
 
     def export_to_pdf(self, file_path):
         """Export contracts to a PDF file."""
-        try:
-            contracts = self.get_contracts()
-            df = pd.DataFrame(contracts, columns=[
-                'id', 'seller_first_name', 'seller_last_name', 'seller_address',
-                'seller_phone', 'seller_email', 'buyer_first_name', 'buyer_last_name',
-                'buyer_address', 'buyer_phone', 'buyer_email', 'device_type',
-                'device_model', 'imei_number', 'condition', 'price', 'terms', 'created_at'
-            ])
-
-            fig, ax = plt.subplots(figsize=(10, 8))
-            ax.axis('off')
-            table = ax.table(cellText=df.values, colLabels=df.columns, cellLoc='center', loc='center')
-
-            pdf = matplotlib.backends.backend_pdf.PdfPages(file_path)
-            pdf.savefig(fig, bbox_inches='tight')
-            pdf.close()
-            print(f"Data exported to {file_path} successfully.")
-        except Exception as e:
-            print(f"Error exporting to PDF: {e}")
+        return self.export(pdf_path=file_path)
 
     def export_to_sqlite(self, file_path):
         """Export contracts to another SQLite database."""
-        try:
-            with sqlite3.connect(file_path) as conn_export:
-                cursor_export = conn_export.cursor()
-                cursor_export.execute('''
-                    CREATE TABLE IF NOT EXISTS contracts (
-                        id INTEGER PRIMARY KEY AUTOINCREMENT,
-                        seller_first_name TEXT NOT NULL,
-                        seller_last_name TEXT NOT NULL,
-                        seller_address TEXT NOT NULL,
-                        seller_phone TEXT NOT NULL,
-                        seller_email TEXT NOT NULL,
-                        buyer_first_name TEXT NOT NULL,
-                        buyer_last_name TEXT NOT NULL,
-                        buyer_address TEXT NOT NULL,
-                        buyer_phone TEXT NOT NULL,
-                        buyer_email TEXT NOT NULL,
-                        device_type TEXT NOT NULL,
-                        device_model TEXT NOT NULL,
-                        imei_number TEXT NOT NULL,
-                        condition TEXT NOT NULL,
-                        price REAL NOT NULL,
-                        terms TEXT,
-                        created_at TEXT NOT NULL
-                    )
-                ''')
+        return self.export(sqlite_path=file_path)
 
-                contracts = self.get_contracts()
-                cursor_export.executemany('''
-                    INSERT INTO contracts (
-                        seller_first_name, seller_last_name, seller_address, seller_phone,
-                        seller_email, buyer_first_name, buyer_last_name, buyer_address,
-                        buyer_phone, buyer_email, device_type, device_model,
-                        imei_number, condition, price, terms, created_at
-                    )
-                    VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
-                ''', [(c[1], c[2], c[3], c[4], c[5], c[6], c[7], c[8], c[9], c[10],
-                        c[11], c[12], c[13], c[14], c[15], c[16], c[17]) for c in contracts])
-                conn_export.commit()
-                print(f"Data exported to {file_path} successfully.")
-        except sqlite3.Error as e:
-            print(f"Error exporting to SQLite: {e}")
+    def export_to_columnar(self, file_path):
+        """Export contracts with typed columns: a Parquet file if pyarrow is installed, else a directory of .npz chunks."""
+        return self.export(columnar_path=file_path)
 
     def close_connection(self):
         """Close the database connection."""
         try:
+            self.conn.execute('PRAGMA optimize')  # refresh planner statistics as the tables grow
             self.conn.close()
             print("Database connection closed.")
         except sqlite3.Error as e:
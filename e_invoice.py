@@ -0,0 +1,279 @@
+# e_invoice.py
+# Structured e-invoices for receipts in the UN/CEFACT Cross Industry Invoice
+# syntax (ZUGFeRD/Factur-X, XRechnung CII), EN 16931 core fields only. The XML
+# is written from prepared string templates straight to the output stream,
+# one line item at a time, so large batches never build a document tree.
+# Writing needs nothing beyond the standard library; validate_e_invoice needs
+# the optional packages lxml (schema) and saxonche (EN 16931 business rules),
+# installed with pip install lxml saxonche.
+import os
+import time
+from xml.sax.saxutils import escape
+
+from company_profiles import get_company_profile, resolve_tenant
+
+# Factur-X 1.09 EN 16931 profile as published by FNFE-MPE and FeRD: the CII D16B
+# schemas restricted to EN 16931, and the EN 16931 schematron compiled to XSLT 2.0
+SCHEMA_DIR = os.path.join(os.path.dirname(__file__), 'schemas', 'facturx-en16931')
+SCHEMA_FILE = os.path.join(SCHEMA_DIR, 'Factur-X_EN16931.xsd')
+SCHEMATRON_FILE = os.path.join(SCHEMA_DIR, 'FACTUR-X_EN16931.xslt')
+
+_RAM_NAMESPACE = 'urn:un:unece:uncefact:data:standard:ReusableAggregateBusinessInformationEntity:100'
+
+# Control characters are not allowed in XML 1.0 and are dropped from text
+_CONTROL_CHARACTERS = dict.fromkeys(code for code in range(32) if code not in (9, 10, 13))
+
+MARGIN_SCHEME_NOTE = ('Hinweis: Bei Angabe "0%" unterliegt der Artikel als Gebrauchtwarenkauf '
+                      'der Differenzbesteuerung nach §25a UStG.')
+
+# Templates are formatted with already escaped values; str.format is bound
+# once here so writing a document does no template parsing
+_DOCUMENT_START = '''<?xml version="1.0" encoding="UTF-8"?>
+<rsm:CrossIndustryInvoice xmlns:rsm="urn:un:unece:uncefact:data:standard:CrossIndustryInvoice:100" \
+xmlns:ram="urn:un:unece:uncefact:data:standard:ReusableAggregateBusinessInformationEntity:100" \
+xmlns:udt="urn:un:unece:uncefact:data:standard:UnqualifiedDataType:100">
+ <rsm:ExchangedDocumentContext>
+  <ram:GuidelineSpecifiedDocumentContextParameter><ram:ID>urn:cen.eu:en16931:2017</ram:ID></ram:GuidelineSpecifiedDocumentContextParameter>
+ </rsm:ExchangedDocumentContext>
+ <rsm:ExchangedDocument>
+  <ram:ID>{number}</ram:ID>
+  <ram:TypeCode>380</ram:TypeCode>
+  <ram:IssueDateTime><udt:DateTimeString format="102">{date}</udt:DateTimeString></ram:IssueDateTime>
+  <ram:IncludedNote><ram:Content>{note}</ram:Content></ram:IncludedNote>
+ </rsm:ExchangedDocument>
+ <rsm:SupplyChainTradeTransaction>
+'''.format
+
+_LINE_ITEM = '''  <ram:IncludedSupplyChainTradeLineItem>
+   <ram:AssociatedDocumentLineDocument><ram:LineID>{line}</ram:LineID></ram:AssociatedDocumentLineDocument>
+   <ram:SpecifiedTradeProduct><ram:Name>{name}</ram:Name></ram:SpecifiedTradeProduct>
+   <ram:SpecifiedLineTradeAgreement><ram:NetPriceProductTradePrice><ram:ChargeAmount>{price}</ram:ChargeAmount></ram:NetPriceProductTradePrice></ram:SpecifiedLineTradeAgreement>
+   <ram:SpecifiedLineTradeDelivery><ram:BilledQuantity unitCode="H87">{quantity}</ram:BilledQuantity></ram:SpecifiedLineTradeDelivery>
+   <ram:SpecifiedLineTradeSettlement>
+    {tax}
+    <ram:SpecifiedTradeSettlementLineMonetarySummation><ram:LineTotalAmount>{total}</ram:LineTotalAmount></ram:SpecifiedTradeSettlementLineMonetarySummation>
+   </ram:SpecifiedLineTradeSettlement>
+  </ram:IncludedSupplyChainTradeLineItem>
+'''.format
+
+# Line level VAT per rate: 19% standard rate, 0% margin scheme for used goods (§25a UStG)
+_LINE_TAX = {
+    19: '<ram:ApplicableTradeTax><ram:TypeCode>VAT</ram:TypeCode><ram:CategoryCode>S</ram:CategoryCode>'
+        '<ram:RateApplicablePercent>19</ram:RateApplicablePercent></ram:ApplicableTradeTax>',
+    0: '<ram:ApplicableTradeTax><ram:TypeCode>VAT</ram:TypeCode><ram:CategoryCode>E</ram:CategoryCode>'
+       '<ram:RateApplicablePercent>0</ram:RateApplicablePercent></ram:ApplicableTradeTax>',
+}
+
+_HEADER_TAX = {
+    19: '''   <ram:ApplicableTradeTax><ram:CalculatedAmount>{tax}</ram:CalculatedAmount><ram:TypeCode>VAT</ram:TypeCode>\
+<ram:BasisAmount>{basis}</ram:BasisAmount><ram:CategoryCode>S</ram:CategoryCode>\
+<ram:RateApplicablePercent>19</ram:RateApplicablePercent></ram:ApplicableTradeTax>
+'''.format,
+    0: '''   <ram:ApplicableTradeTax><ram:CalculatedAmount>{tax}</ram:CalculatedAmount><ram:TypeCode>VAT</ram:TypeCode>\
+<ram:ExemptionReason>Gebrauchtgegenstände/Sonderregelung (§25a UStG)</ram:ExemptionReason>\
+<ram:BasisAmount>{basis}</ram:BasisAmount><ram:CategoryCode>E</ram:CategoryCode>\
+<ram:ExemptionReasonCode>VATEX-EU-F</ram:ExemptionReasonCode>\
+<ram:RateApplicablePercent>0</ram:RateApplicablePercent></ram:ApplicableTradeTax>
+'''.format,
+}
+
+_SELLER_PARTY = '''<ram:SellerTradeParty><ram:Name>{name}</ram:Name>\
+<ram:PostalTradeAddress><ram:PostcodeCode>{postcode}</ram:PostcodeCode><ram:LineOne>{street}</ram:LineOne>\
+<ram:CityName>{city}</ram:CityName><ram:CountryID>DE</ram:CountryID></ram:PostalTradeAddress>\
+<ram:URIUniversalCommunication><ram:URIID schemeID="EM">{email}</ram:URIID></ram:URIUniversalCommunication>\
+<ram:SpecifiedTaxRegistration><ram:ID schemeID="VA">{vat_id}</ram:ID></ram:SpecifiedTaxRegistration>\
+</ram:SellerTradeParty>'''.format
+
+_AGREEMENT_AND_DELIVERY = '''  <ram:ApplicableHeaderTradeAgreement>
+   {seller}
+   <ram:BuyerTradeParty><ram:Name>{buyer}</ram:Name><ram:PostalTradeAddress><ram:CountryID>DE</ram:CountryID></ram:PostalTradeAddress></ram:BuyerTradeParty>
+  </ram:ApplicableHeaderTradeAgreement>
+  <ram:ApplicableHeaderTradeDelivery>
+   <ram:ActualDeliverySupplyChainEvent><ram:OccurrenceDateTime><udt:DateTimeString format="102">{date}</udt:DateTimeString></ram:OccurrenceDateTime></ram:ActualDeliverySupplyChainEvent>
+  </ram:ApplicableHeaderTradeDelivery>
+  <ram:ApplicableHeaderTradeSettlement>
+   <ram:InvoiceCurrencyCode>EUR</ram:InvoiceCurrencyCode>
+'''.format
+
+_DOCUMENT_END = '''   <ram:SpecifiedTradeSettlementHeaderMonetarySummation>
+    <ram:LineTotalAmount>{net}</ram:LineTotalAmount>
+    <ram:TaxBasisTotalAmount>{net}</ram:TaxBasisTotalAmount>
+    <ram:TaxTotalAmount currencyID="EUR">{tax}</ram:TaxTotalAmount>
+    <ram:GrandTotalAmount>{gross}</ram:GrandTotalAmount>
+    <ram:DuePayableAmount>{gross}</ram:DuePayableAmount>
+   </ram:SpecifiedTradeSettlementHeaderMonetarySummation>
+  </ram:ApplicableHeaderTradeSettlement>
+ </rsm:SupplyChainTradeTransaction>
+</rsm:CrossIndustryInvoice>
+'''.format
+
+_seller_parties = {}
+_schema = None
+_schematron = None
+
+
+def _text(value):
+    return escape(str(value).translate(_CONTROL_CHARACTERS))
+
+
+def _amount(cents):
+    """Cents as an EN 16931 amount with two decimals."""
+    sign = "-" if cents < 0 else ""
+    cents = abs(cents)
+    return f"{sign}{cents // 100}.{cents % 100:02}"
+
+
+def line_amounts(quantity, unit_price, tax_included):
+    """(unit price, net amount, VAT rate, VAT) of a receipt line, amounts in cents.
+
+    The unit price is rounded to cents first, so the line amounts are what
+    the receipt shows.
+    """
+    price = round(unit_price * 100)
+    net = price * quantity
+    rate = 19 if tax_included else 0
+    return price, net, rate, (net * rate + 50) // 100
+
+
+def vat_breakdown(basis):
+    """{rate: (net, VAT)} for net cents per VAT rate, with the VAT rounded once on each rate's sum.
+
+    This is the VAT the e-invoice declares, and the printed receipts total
+    with it as well, so both show the same amounts.
+    """
+    return {rate: (basis[rate], (basis[rate] * rate + 50) // 100) for rate in sorted(basis)}
+
+
+def seller_vat_id(tenant=None):
+    """VAT ID of a location; raises ValueError if its profile has none, as an e-invoice must name it."""
+    tenant = resolve_tenant(tenant)
+    vat_id = get_company_profile(tenant).get('vat_id')
+    if not vat_id:
+        raise ValueError(f"Company profile {tenant!r} has no vat_id, which an e-invoice needs.")
+    return vat_id
+
+
+def _seller_party(profile):
+    """The seller block of a company profile, escaped and formatted once per profile."""
+    key = tuple(profile.values())
+    block = _seller_parties.get(key)
+    if block is None:
+        postcode = profile['zip'].split(' ', 1)[0]
+        block = _seller_parties[key] = _SELLER_PARTY(
+            name=_text(profile['name']), postcode=_text(postcode), street=_text(profile['street']),
+            city=_text(profile['city']), email=_text(profile['email']), vat_id=_text(profile['vat_id']))
+    return block
+
+
+def write_e_invoice(stream, customer_name, items, receipt_number, issued_at, tenant=None):
+    """Write a receipt as a CII e-invoice to a text stream, one line item at a time.
+
+    Items are the (description, quantity, unit_price, tax_included) tuples of
+    ReceiptPDF.body, with net unit prices and 19% VAT added for taxed items.
+    Amounts are computed in cents by line_amounts and vat_breakdown, like the
+    printed receipts. Returns the grand total in cents. Raises ValueError
+    before writing anything if the location has no VAT ID.
+    """
+    seller_vat_id(tenant)
+    profile = get_company_profile(resolve_tenant(tenant))
+    date = issued_at.strftime('%Y%m%d')
+    write = stream.write
+    write(_DOCUMENT_START(number=_text(receipt_number), date=date, note=_text(MARGIN_SCHEME_NOTE)))
+
+    basis = {}
+    for line, (description, quantity, unit_price, tax_included) in enumerate(items, 1):
+        price, net, rate, _ = line_amounts(quantity, unit_price, tax_included)
+        basis[rate] = basis.get(rate, 0) + net
+        write(_LINE_ITEM(line=line, name=_text(description), price=_amount(price), quantity=quantity,
+                         tax=_LINE_TAX[rate], total=_amount(net)))
+
+    write(_AGREEMENT_AND_DELIVERY(seller=_seller_party(profile), buyer=_text(customer_name), date=date))
+    total_net = total_tax = 0
+    for rate, (net, tax) in vat_breakdown(basis).items():
+        total_net += net
+        total_tax += tax
+        write(_HEADER_TAX[rate](tax=_amount(tax), basis=_amount(net)))
+    write(_DOCUMENT_END(net=_amount(total_net), tax=_amount(total_tax), gross=_amount(total_net + total_tax)))
+    return total_net + total_tax
+
+
+def create_e_invoice(file_name, customer_name, items, receipt_number, issued_at, tenant=None):
+    """Write the e-invoice of a receipt to file_name and return the file name."""
+    seller_vat_id(tenant)
+    with open(file_name, 'w', encoding='utf-8', newline='\n') as f:
+        write_e_invoice(f, customer_name, items, receipt_number, issued_at, tenant)
+    return file_name
+
+
+def write_e_invoices(receipts, directory, tenant=None):
+    """Stream a batch of receipts to e-invoice files, one <receipt number>.xml per receipt.
+
+    `receipts` is an iterable of (customer_name, items, receipt_number,
+    issued_at) and is consumed lazily. Returns a summary dict with the number
+    of invoices, bytes written, seconds and invoices/s.
+    """
+    seller_vat_id(tenant)
+    os.makedirs(directory, exist_ok=True)
+    started = time.perf_counter()
+    count = size = 0
+    for customer_name, items, receipt_number, issued_at in receipts:
+        file_name = os.path.join(directory, f"{receipt_number}.xml")
+        with open(file_name, 'w', encoding='utf-8', newline='\n', buffering=64 * 1024) as f:
+            write_e_invoice(f, customer_name, items, receipt_number, issued_at, tenant)
+            size += f.tell()
+        count += 1
+    seconds = time.perf_counter() - started
+    summary = {
+        'invoices': count,
+        'bytes': size,
+        'seconds': seconds,
+        'invoices_per_sec': count / seconds if seconds else 0.0,
+    }
+    print(f"Wrote {count} e-invoices ({size / 1e6:.1f} MB) in {seconds:.2f}s, "
+          f"{summary['invoices_per_sec']:.0f} invoices/s")
+    return summary
+
+
+def validate_e_invoice(source, schematron=True):
+    """Validate an e-invoice file (or file object) against the bundled Factur-X EN 16931 schema.
+
+    Needs lxml. With schematron=True the EN 16931 business rules are checked
+    as well; their stylesheet is XSLT 2.0, which lxml cannot run, so this
+    needs saxonche and is skipped with a printed notice without it. An
+    invoice whose seller has no VAT ID is rejected in any case. Returns a
+    list of error messages, empty if the invoice is valid.
+    """
+    from lxml import etree
+    global _schema, _schematron
+    if _schema is None:
+        _schema = etree.XMLSchema(etree.parse(SCHEMA_FILE))
+    try:
+        document = etree.parse(source)
+    except etree.XMLSyntaxError as e:
+        return [str(e)]
+    if not _schema.validate(document):
+        return [f"line {error.line}: {error.message}" for error in _schema.error_log]
+    if not document.xpath('//ram:SellerTradeParty/ram:SpecifiedTaxRegistration/ram:ID[@schemeID="VA"][normalize-space()]',
+                          namespaces={'ram': _RAM_NAMESPACE}):
+        return ["BT-31: the seller has no VAT ID"]
+    if not schematron:
+        return []
+
+    if _schematron is None:
+        try:
+            from saxonche import PySaxonProcessor
+        except ImportError:
+            print("EN 16931 schematron skipped, saxonche is not installed")
+            _schematron = False
+            return []
+        processor = PySaxonProcessor(license=False)
+        _schematron = (processor,
+                       processor.new_xslt30_processor().compile_stylesheet(stylesheet_file=SCHEMATRON_FILE))
+    if _schematron is False:
+        return []
+    processor, stylesheet = _schematron
+    report = etree.fromstring(stylesheet.transform_to_string(
+        xdm_node=processor.parse_xml(xml_text=etree.tostring(document, encoding='unicode'))).encode('utf-8'))
+    svrl = {'svrl': 'http://purl.oclc.org/dsdl/svrl'}
+    return [f"{failed.get('id')}: {' '.join(failed.findtext('svrl:text', '', svrl).split())}"
+            for failed in report.iterfind('.//svrl:failed-assert', svrl) if failed.get('flag') != 'warning']
@@ -0,0 +1,380 @@
+# export_pipeline.py
+# Exports the contracts table to several formats in one pass: rows are read
+# once in batches and handed to every sink, each sink writing on its own thread.
+# A sink finishes its file with close() only after every row has arrived;
+# when writing or reading fails it discards its output with abort().
+import csv
+import glob
+import os
+import queue
+import shutil
+import sqlite3
+import threading
+import time
+
+import numpy as np
+from fpdf import FPDF
+
+from data import CONTRACT_COLUMNS
+
+
+def _partial_path(file_path):
+    """Where a sink writes until the export has succeeded and the file moves to file_path."""
+    return file_path + '.part'
+
+
+def _remove(path):
+    """Delete a file or directory, if it exists."""
+    if os.path.isdir(path):
+        shutil.rmtree(path)
+    elif os.path.exists(path):
+        os.remove(path)
+
+
+def _move_into_place(partial, file_path):
+    if os.path.isdir(partial) and os.path.isdir(file_path):
+        # os.replace cannot replace a directory that is not empty
+        stale = file_path + '.old'
+        _remove(stale)
+        os.rename(file_path, stale)
+        os.rename(partial, file_path)
+        shutil.rmtree(stale)
+    else:
+        os.replace(partial, file_path)
+
+
+class CsvSink:
+    """Contracts as a CSV file with a header row."""
+    name = "CSV"
+
+    def __init__(self, file_path):
+        self.file_path = file_path
+        self.file = None
+
+    def open(self):
+        self.file = open(_partial_path(self.file_path), 'w', newline='', encoding='utf-8')
+        self.writer = csv.writer(self.file)
+        self.writer.writerow(CONTRACT_COLUMNS)
+
+    def write(self, rows):
+        self.writer.writerows(rows)
+
+    def close(self):
+        self.file.close()
+        _move_into_place(_partial_path(self.file_path), self.file_path)
+
+    def abort(self):
+        if self.file is not None:
+            self.file.close()
+        _remove(_partial_path(self.file_path))
+
+
+class SqliteSink:
+    """Contracts copied into the contracts table of another SQLite database, in one transaction."""
+    name = "SQLite"
+
+    def __init__(self, file_path):
+        self.file_path = file_path
+        self.conn = None
+
+    def open(self):
+        # Connections may only be used on the thread that created them
+        self.conn = sqlite3.connect(self.file_path)
+        self.conn.execute('''
+            CREATE TABLE IF NOT EXISTS contracts (
+                id INTEGER PRIMARY KEY AUTOINCREMENT,
+                seller_first_name TEXT NOT NULL,
+                seller_last_name TEXT NOT NULL,
+                seller_address TEXT NOT NULL,
+                seller_phone TEXT NOT NULL,
+                seller_email TEXT NOT NULL,
+                buyer_first_name TEXT NOT NULL,
+                buyer_last_name TEXT NOT NULL,
+                buyer_address TEXT NOT NULL,
+                buyer_phone TEXT NOT NULL,
+                buyer_email TEXT NOT NULL,
+                device_type TEXT NOT NULL,
+                device_model TEXT NOT NULL,
+                imei_number TEXT NOT NULL,
+                condition TEXT NOT NULL,
+                price REAL NOT NULL,
+                terms TEXT,
+                created_at TEXT NOT NULL
+            )
+        ''')
+
+    def write(self, rows):
+        self.conn.executemany('''
+            INSERT INTO contracts (
+                seller_first_name, seller_last_name, seller_address, seller_phone,
+                seller_email, buyer_first_name, buyer_last_name, buyer_address,
+                buyer_phone, buyer_email, device_type, device_model,
+                imei_number, condition, price, terms, created_at
+            )
+            VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+        ''', [row[1:] for row in rows])
+
+    def close(self):
+        self.conn.commit()
+        self.conn.close()
+        self.conn = None
+
+    def abort(self):
+        if self.conn is not None:
+            self.conn.rollback()
+            self.conn.close()
+            self.conn = None
+
+
+# Relative column widths of the PDF table, in CONTRACT_COLUMNS order
+PDF_COLUMN_WIDTHS = (3, 6, 7, 14, 7, 11, 6, 7, 14, 7, 11, 6, 7, 9, 6, 5, 14, 10)
+
+
+class _ContractTablePDF(FPDF):
+    """Landscape table of contract rows with the column header repeated on every page."""
+    def __init__(self):
+        super().__init__(orientation='L')
+        self.set_auto_page_break(True, margin=10)
+        usable = self.w - 20
+        self.widths = [usable * width / sum(PDF_COLUMN_WIDTHS) for width in PDF_COLUMN_WIDTHS]
+        self.set_font('Arial', '', 5)
+        # Rough character budget per column so cells are not measured one by one
+        self.max_chars = [int(width / self.get_string_width('n')) for width in self.widths]
+
+    def header(self):
+        self.set_font('Arial', 'B', 5)
+        for width, column in zip(self.widths, CONTRACT_COLUMNS):
+            self.cell(width, 4, column, border=1)
+        self.ln(4)
+        self.set_font('Arial', '', 5)
+
+    def row(self, values):
+        for width, max_chars, value in zip(self.widths, self.max_chars, values):
+            text = "" if value is None else str(value).replace("\n", " ")
+            if len(text) > max_chars:
+                text = text[:max_chars - 2] + ".."
+            self.cell(width, 3.5, text.encode('latin-1', 'replace').decode('latin-1'), border=1)
+        self.ln(3.5)
+
+
+class PdfSink:
+    """Contracts as a table over landscape PDF pages, long values shortened to fit."""
+    name = "PDF"
+
+    def __init__(self, file_path):
+        self.file_path = file_path
+
+    def open(self):
+        self.pdf = _ContractTablePDF()
+        self.pdf.add_page()
+
+    def write(self, rows):
+        for row in rows:
+            self.pdf.row(row)
+
+    def close(self):
+        self.pdf.output(_partial_path(self.file_path), 'F')
+        _move_into_place(_partial_path(self.file_path), self.file_path)
+
+    def abort(self):
+        _remove(_partial_path(self.file_path))
+
+
+# Column types of the columnar export; everything else is text
+NUMERIC_COLUMNS = {'id': np.int64, 'price': np.float64}
+DATETIME_COLUMNS = ('created_at',)
+
+
+def _typed_columns(rows):
+    """Turn a batch of table rows into {column: typed numpy array}."""
+    columns = {}
+    for name, values in zip(CONTRACT_COLUMNS, list(zip(*rows)) or [()] * len(CONTRACT_COLUMNS)):
+        if name in NUMERIC_COLUMNS:
+            columns[name] = np.array(values, dtype=NUMERIC_COLUMNS[name])
+        elif name in DATETIME_COLUMNS:
+            columns[name] = np.array(values, dtype='datetime64[us]')
+        else:
+            # Object arrays, so one long terms text does not widen every cell to its length
+            columns[name] = np.array(["" if value is None else value for value in values], dtype=object)
+    return columns
+
+
+def _encode_text(values):
+    """Dictionary-encode text as codes into its distinct values, stored as a UTF-8 buffer plus offsets."""
+    distinct, codes = np.unique(values, return_inverse=True)
+    encoded = [value.encode('utf-8') for value in distinct]
+    offsets = np.zeros(len(encoded) + 1, dtype=np.int64)
+    np.cumsum([len(value) for value in encoded], out=offsets[1:])
+    return codes, np.frombuffer(b"".join(encoded), dtype=np.uint8), offsets
+
+
+def _decode_text(codes, data, offsets):
+    buffer = data.tobytes()
+    distinct = np.empty(len(offsets) - 1, dtype=object)
+    distinct[:] = [buffer[start:end].decode('utf-8') for start, end in zip(offsets[:-1].tolist(), offsets[1:].tolist())]
+    return distinct[codes]
+
+
+class ColumnarSink:
+    """Typed columnar export written `chunk_rows` rows at a time.
+
+    With pyarrow installed this is one Parquet file with a row group per
+    chunk. Without it, file_path is a directory of part-NNNNN.npz files, one
+    per chunk, holding .npy arrays per column, with text columns dictionary
+    encoded as codes plus the distinct values in one UTF-8 buffer with
+    offsets. read_columnar loads either format.
+    """
+    name = "Columnar"
+
+    def __init__(self, file_path, chunk_rows=20000):
+        self.file_path = file_path
+        self.chunk_rows = chunk_rows
+        self.writer = None
+
+    def open(self):
+        try:
+            import pyarrow
+            import pyarrow.parquet
+        except ImportError:
+            pyarrow = None
+        self.pyarrow = pyarrow
+        self.writer = None
+        self.parts = 0
+        self.pending = []
+        _remove(_partial_path(self.file_path))
+        if pyarrow is None:
+            os.makedirs(_partial_path(self.file_path))
+
+    def write(self, rows):
+        self.pending.extend(rows)
+        if len(self.pending) >= self.chunk_rows:
+            self._flush()
+
+    def _flush(self, force=False):
+        if not self.pending and not force:
+            return
+        columns = _typed_columns(self.pending)
+        self.pending = []
+        if self.pyarrow is not None:
+            table = self.pyarrow.table(columns)
+            if self.writer is None:
+                self.writer = self.pyarrow.parquet.ParquetWriter(_partial_path(self.file_path), table.schema)
+            self.writer.write_table(table)
+        else:
+            arrays = {}
+            for name, values in columns.items():
+                if values.dtype.kind == 'O':
+                    arrays[f"{name}.codes"], arrays[f"{name}.data"], arrays[f"{name}.offsets"] = _encode_text(values)
+                else:
+                    arrays[name] = values
+            np.savez(os.path.join(_partial_path(self.file_path), f"part-{self.parts:05}.npz"), **arrays)
+        self.parts += 1
+
+    def close(self):
+        # An empty table still gets one (empty, typed) chunk
+        self._flush(force=self.parts == 0)
+        if self.writer is not None:
+            self.writer.close()
+            self.writer = None
+        _move_into_place(_partial_path(self.file_path), self.file_path)
+
+    def abort(self):
+        if self.writer is not None:
+            self.writer.close()
+            self.writer = None
+        _remove(_partial_path(self.file_path))
+
+
+def read_columnar(file_path, columns=None):
+    """Load a ColumnarSink export into a pandas DataFrame, optionally only some columns."""
+    import pandas as pd
+    if os.path.isdir(file_path):
+        frames = []
+        for part in sorted(glob.glob(os.path.join(file_path, 'part-*.npz'))):
+            with np.load(part, allow_pickle=False) as arrays:
+                frames.append(pd.DataFrame({
+                    name: arrays[name] if name in arrays.files else
+                    _decode_text(arrays[f"{name}.codes"], arrays[f"{name}.data"], arrays[f"{name}.offsets"])
+                    for name in (columns or CONTRACT_COLUMNS)}))
+        return pd.concat(frames, ignore_index=True) if frames else pd.DataFrame(columns=columns or CONTRACT_COLUMNS)
+    return pd.read_parquet(file_path, columns=list(columns) if columns else None)
+
+
+# Sent to the sinks instead of the end-of-data None when reading the contracts failed
+_ABORT = object()
+
+
+def _drain(sink, batches, result):
+    started = time.perf_counter()
+    rows = ()
+    try:
+        try:
+            sink.open()
+            while True:
+                rows = batches.get()
+                if rows is None:
+                    break
+                if rows is _ABORT:
+                    raise RuntimeError("export aborted, reading the contracts failed")
+                sink.write(rows)
+            sink.close()
+        except BaseException:
+            sink.abort()
+            raise
+    except Exception as e:
+        result['error'] = e
+        # Keep consuming so the reader never blocks on this sink's full queue
+        while rows is not None and rows is not _ABORT:
+            rows = batches.get()
+    result['seconds'] = time.perf_counter() - started
+
+
+def export_contracts(model, sinks, batch_size=2000, queue_size=8):
+    """Read the contracts table once and write it to every sink concurrently.
+
+    Returns a summary dict with the row count, total seconds, rows/s of the
+    whole export, the combined rows/s over all sinks, and per sink its
+    seconds and error (None if it succeeded). A sink that fails leaves its
+    target untouched; if reading the contracts fails, every sink discards
+    its output and the error is raised.
+    """
+    channels = [queue.Queue(maxsize=queue_size) for _ in sinks]
+    results = [{'error': None} for _ in sinks]
+    threads = [threading.Thread(target=_drain, args=(sink, channel, result))
+               for sink, channel, result in zip(sinks, channels, results)]
+    started = time.perf_counter()
+    for thread in threads:
+        thread.start()
+
+    count = 0
+    end = _ABORT
+    try:
+        cursor = model.conn.execute('SELECT * FROM contracts ORDER BY id')
+        while True:
+            rows = cursor.fetchmany(batch_size)
+            if not rows:
+                break
+            count += len(rows)
+            for channel in channels:
+                channel.put(rows)
+        end = None
+    finally:
+        for channel in channels:
+            channel.put(end)
+        for thread in threads:
+            thread.join()
+
+    seconds = time.perf_counter() - started
+    summary = {
+        'rows': count,
+        'seconds': seconds,
+        'rows_per_sec': count / seconds if seconds else 0.0,
+        'combined_rows_per_sec': count * len(sinks) / seconds if seconds else 0.0,
+        'sinks': {sink.name: result for sink, result in zip(sinks, results)},
+    }
+    print(f"Exported {count} contracts to {', '.join(sink.name for sink in sinks)} in {seconds:.2f}s "
+          f"({summary['rows_per_sec']:.0f} rows/s, {summary['combined_rows_per_sec']:.0f} rows/s combined)")
+    for sink, result in zip(sinks, results):
+        if result['error'] is not None:
+            print(f"Error exporting to {sink.name}: {result['error']}")
+    return summary
@@ -1,13 +1,20 @@
 # gui.py
 from tkinter import ttk, messagebox
 import tkinter as tk
-from contract import create_contract_pdf, save_to_csv, COMPANY_INFO
+from contract import render_contract, save_to_csv, COMPANY_INFO, CONTRACT_LOG, PARTY_FIELDS
+from company_profiles import get_company_profile
+from customer_directory import CustomerDirectory, load_customer_directory
+from validation import parse_number, validate_contract_form
 import os
 import datetime
+import threading
 import subprocess
 import platform
 from num2words import num2words
 
+# Export choice for the whole contract log
+ALL_MONTHS = "All months"
+
 class ContractApp:
     def __init__(self, master):
         self.master = master
@@ -33,8 +40,27 @@ class ContractApp:
         self.canvas.pack(side=tk.LEFT, fill=tk.BOTH, expand=True)
         self.canvas.bind_all("<MouseWheel>", self._on_mousewheel)
 
+        # Returning customers for the seller/buyer type-ahead, loaded from the
+        # contract log in the background so the window opens right away
+        self.customers = CustomerDirectory()
+        self.customers_lock = threading.Lock()
+        threading.Thread(target=self.load_customers, daemon=True).start()
+
+        # Documents, code and date of the last contract created, for "Reprint Last Contract"
+        self.last_contract = None
+
         self.create_widgets()
 
+    def load_customers(self):
+        try:
+            loaded = load_customer_directory(CONTRACT_LOG)
+            with self.customers_lock:
+                # Keep customers saved while the log was loading; they are newer than the log
+                loaded.merge(self.customers)
+                self.customers = loaded
+        except Exception as e:
+            print(f"Error loading customer directory: {e}")
+
     def _on_mousewheel(self, event):
         """Scroll with mouse wheel."""
         self.canvas.yview_scroll(int(-1*(event.delta/120)), "units")
@@ -74,11 +100,30 @@ class ContractApp:
         btn_export_csv = ttk.Button(self.scrollable_frame, text="Export to CSV and Open", command=self.export_csv)
         btn_export_csv.grid(row=6, column=1, padx=10, pady=10)
 
+        # Month of the contract log to export; the list is read from the log when it opens
+        self.export_month_var = tk.StringVar(value=datetime.datetime.now().strftime('%Y-%m'))
+        export_month_dropdown = ttk.Combobox(self.scrollable_frame, textvariable=self.export_month_var, state='readonly',
+                                             postcommand=lambda: export_month_dropdown.configure(
+                                                 values=[ALL_MONTHS] + CONTRACT_LOG.months()))
+        export_month_dropdown.grid(row=7, column=1, padx=10, pady=10)
+
+        # Button to print the last contract again under its original code and date
+        btn_reprint_contract = ttk.Button(self.scrollable_frame, text="Reprint Last Contract", command=self.reprint_contract)
+        btn_reprint_contract.grid(row=7, column=0, padx=10, pady=10)
+
 
 
     def export_csv(self):
-        """Export the contracts to CSV and open the file."""
-        csv_file = 'contracts.csv'
+        """Write the selected month of the contract CSV log, or all of it, to one CSV file and open it."""
+        month = self.export_month_var.get()
+        logged = CONTRACT_LOG.months()
+        if not logged or (month != ALL_MONTHS and month not in logged):
+            messagebox.showwarning("Warning", f"No contracts logged for {month}.")
+            return
+        if month == ALL_MONTHS:
+            csv_file = CONTRACT_LOG.export("contracts_export_all.csv")
+        else:
+            csv_file = CONTRACT_LOG.export(f"contracts_export_{month}.csv", [month])
         if os.path.exists(csv_file):
             if platform.system() == "Windows":
                 os.startfile(csv_file)
@@ -158,6 +203,10 @@ class ContractApp:
         self.entry_seller_phone = self.create_field(seller_frame, fields[4], 4)
         self.entry_seller_email = self.create_field(seller_frame, fields[5], 5)
         self.entry_seller_id = self.create_field(seller_frame, fields[6], 6)
+        self.attach_customer_suggestions(seller_frame, [
+            self.entry_seller_first_name, self.entry_seller_last_name, self.entry_seller_street,
+            self.entry_seller_plz, self.entry_seller_phone, self.entry_seller_email, self.entry_seller_id
+        ])
 
     def create_buyer_section(self, parent):
         """Create the Buyer Information section."""
@@ -172,6 +221,45 @@ class ContractApp:
         self.entry_buyer_phone = self.create_field(buyer_frame, fields[4], 4)
         self.entry_buyer_email = self.create_field(buyer_frame, fields[5], 5)
         self.entry_buyer_id = self.create_field(buyer_frame, fields[6], 6)
+        self.attach_customer_suggestions(buyer_frame, [
+            self.entry_buyer_first_name, self.entry_buyer_last_name, self.entry_buyer_street,
+            self.entry_buyer_plz, self.entry_buyer_phone, self.entry_buyer_email, self.entry_buyer_id
+        ])
+
+    def attach_customer_suggestions(self, frame, entries):
+        """Suggest known customers while typing a name, phone or ID number; a click fills the whole block."""
+        suggestion_list = tk.Listbox(frame, height=5, width=45)
+        suggestion_list.grid(row=7, column=0, columnspan=2, padx=5, pady=5)
+        suggestion_list.grid_remove()
+        suggestion_list.matches = []
+
+        def update(event):
+            if event.keysym in ("Escape", "Tab"):
+                suggestion_list.grid_remove()
+                return
+            suggestion_list.matches = self.customers.suggest(event.widget.get())
+            suggestion_list.delete(0, tk.END)
+            for customer in suggestion_list.matches:
+                suggestion_list.insert(tk.END, f"{customer['Vorname']} {customer['Nachname']}, "
+                                               f"{customer['PLZ / Ort']}, {customer['Telefon']}")
+            if suggestion_list.matches:
+                suggestion_list.grid()
+            else:
+                suggestion_list.grid_remove()
+
+        def select(event):
+            selection = suggestion_list.curselection()
+            if not selection:
+                return
+            customer = suggestion_list.matches[selection[0]]
+            for entry, field in zip(entries, PARTY_FIELDS):
+                self.fill_info(entry, customer[field])
+            suggestion_list.grid_remove()
+
+        # First name, last name, phone and ID number are searchable
+        for entry in (entries[0], entries[1], entries[4], entries[6]):
+            entry.bind("<KeyRelease>", update)
+        suggestion_list.bind("<<ListboxSelect>>", select)
 
     def create_device_price_section(self):
         """Create side-by-side sections for Device and Price information."""
@@ -250,9 +338,14 @@ class ContractApp:
 
         contract_terms = self.text_terms.get("1.0", tk.END).strip()
 
-        price = float(self.entry_price.get())
+        errors = validate_contract_form(seller_info, buyer_info, device_info, self.entry_price.get())
+        if errors:
+            messagebox.showerror("Invalid input", "\n".join(f"{field}: {message}" for field, message in errors.items()))
+            return
+
+        price = parse_number(self.entry_price.get())
         price_in_words = num2words(price, lang='de').upper()
-        delivery_date = datetime.datetime.now().strftime("Berlin, %d.%m.%Y")
+        delivery_date = datetime.datetime.now().strftime(f"{get_company_profile()['city']}, %d.%m.%Y")
 
         price_info = {
             'price': price,
@@ -261,15 +354,32 @@ class ContractApp:
         }
 
         # Generate the contract PDF and retrieve the contract code and file path
-        pdf_file_name, contract_code = create_contract_pdf(seller_info, buyer_info, device_info, contract_terms, price_info)
+        issued_at = datetime.datetime.now().replace(microsecond=0)
+        documents = (seller_info, buyer_info, device_info, contract_terms, price_info)
+        pdf_file_name, contract_code, _ = render_contract(*documents, issued_at=issued_at)
+        self.last_contract = {'documents': documents, 'contract_code': contract_code, 'issued_at': issued_at}
 
         # Save contract details to CSV with contract_code
         save_to_csv(seller_info, buyer_info, device_info, contract_terms, price_info, contract_code)
+        with self.customers_lock:
+            self.customers.add(seller_info)
+            self.customers.add(buyer_info)
 
         # Show success message
         messagebox.showinfo("Success", f"Contract created successfully!\nSaved as: {pdf_file_name}")
         self.open_pdf(pdf_file_name)
 
+    def reprint_contract(self):
+        """Print the last contract created again, with its original code and date."""
+        if self.last_contract is None:
+            messagebox.showwarning("Warning", "No contract has been created yet.")
+            return
+        pdf_file_name, contract_code, _ = render_contract(*self.last_contract['documents'],
+                                                          contract_code=self.last_contract['contract_code'],
+                                                          issued_at=self.last_contract['issued_at'])
+        messagebox.showinfo("Success", f"Reprinting contract {contract_code}.\nFile: {pdf_file_name}")
+        self.open_pdf(pdf_file_name)
+
     def open_pdf(self, pdf_file):
         """Open the generated PDF file with the default viewer."""
         if platform.system() == "Windows":
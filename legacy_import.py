@@ -0,0 +1,240 @@
+# legacy_import.py
+# Streams the multi-block CSV written by contract.save_to_csv (the old single
+# contracts.csv or the segments of the contract log) into the contracts table
+# of a ContractModel database.
+import csv
+import os
+import re
+import sys
+import time
+from datetime import datetime
+
+from contract_log import ContractLog, CONTRACT_LOG_DIR, LEGACY_CSV_FILE, open_segment
+from data import ContractModel
+
+# Block titles as written by save_to_csv, mapped to the record key they fill
+SECTIONS = {
+    "Seller Information": 'seller',
+    "Buyer Information": 'buyer',
+    "Device Information": 'device',
+    "Price and Terms": 'price',
+}
+PARTY_COLUMNS = ["First Name", "Last Name", "Street + House No", "PLZ / Ort", "Phone", "Email", "ID No"]
+DEVICE_COLUMNS = ["Manufacturer", "Model", "Serial Number", "Features", "Condition", "Accessories"]
+PRICE_COLUMNS = ["Price (EUR)", "Price (Words)", "Delivery Date", "Contract Terms"]
+
+_CODE_DATE = re.compile(r'_(\d{8})_\d+$')
+
+
+def _tracked_lines(stream, position):
+    """Yield decoded lines while keeping position[0] at the byte offset after the last one."""
+    for raw in iter(stream.readline, b''):
+        position[0] += len(raw)
+        yield raw.decode('utf-8')
+
+
+def iter_legacy_contracts(file_path=LEGACY_CSV_FILE, offset=0):
+    """Parse contract blocks one at a time without loading the whole file.
+
+    Yields (record, end_offset) where record maps 'code', 'seller', 'buyer',
+    'device' and 'price' to their rows, and end_offset is the byte position
+    right after the record, i.e. where a later run can resume. Incomplete
+    blocks are yielded with the missing sections absent so they fail validation.
+    """
+    position = [offset]
+    with open_segment(file_path) as stream:
+        stream.seek(offset)
+        reader = csv.reader(_tracked_lines(stream, position))
+        record = None
+        section = None
+        expect_header = False
+        row_start = offset
+        for row in reader:
+            previous_end, row_start = row_start, position[0]
+            if not row:
+                continue
+            title = row[0]
+            if title == "Contract Summary":
+                if record is not None:
+                    yield record, previous_end
+                record = {}
+                section = None
+                continue
+            if record is None:
+                continue  # stray rows before the first complete block header
+            if title == "Contract Code" and len(row) > 1:
+                record['code'] = row[1]
+            elif title in SECTIONS:
+                section = SECTIONS[title]
+                expect_header = True
+            elif expect_header:
+                expect_header = False  # column header row
+            elif section is not None:
+                record[section] = row
+                section = None
+                if 'price' in record:
+                    yield record, position[0]
+                    record = None
+        if record is not None:
+            yield record, position[0]
+
+
+def iter_logged_contracts(log=None, start=None, end=None):
+    """Yield parsed records from the contract log segments that overlap start..end."""
+    for path in (log or ContractLog(legacy_file=LEGACY_CSV_FILE)).segments(start, end):
+        for record, _ in iter_legacy_contracts(path):
+            yield record
+
+
+def validate_legacy_contract(record):
+    """Turn a parsed block into a contracts table row, raising ValueError if it is unusable."""
+    missing = [key for key in ('code', 'seller', 'buyer', 'device', 'price') if key not in record]
+    if missing:
+        raise ValueError(f"incomplete block, missing {', '.join(missing)}")
+
+    seller = dict(zip(PARTY_COLUMNS, record['seller']))
+    buyer = dict(zip(PARTY_COLUMNS, record['buyer']))
+    device = dict(zip(DEVICE_COLUMNS, record['device']))
+    price = dict(zip(PRICE_COLUMNS, record['price']))
+
+    for role, party in (('seller', seller), ('buyer', buyer)):
+        if not (party.get("First Name") or party.get("Last Name")):
+            raise ValueError(f"{role} has no name")
+    try:
+        amount = float(price.get("Price (EUR)", "").replace(",", "."))
+    except ValueError:
+        raise ValueError(f"price {price.get('Price (EUR)')!r} is not a number")
+    if amount < 0:
+        raise ValueError("price is negative")
+
+    created_at = _legacy_created_at(record['code'], price.get("Delivery Date", ""))
+
+    def address(party):
+        return ", ".join(part for part in (party.get("Street + House No", ""), party.get("PLZ / Ort", "")) if part)
+
+    return (
+        seller.get("First Name", ""), seller.get("Last Name", ""), address(seller),
+        seller.get("Phone", ""), seller.get("Email", ""),
+        buyer.get("First Name", ""), buyer.get("Last Name", ""), address(buyer),
+        buyer.get("Phone", ""), buyer.get("Email", ""),
+        device.get("Manufacturer", ""), device.get("Model", ""), device.get("Serial Number", ""),
+        device.get("Condition", ""), amount, price.get("Contract Terms", ""), created_at,
+    )
+
+
+def legacy_record_date(record):
+    """Creation date of a parsed block as a datetime, or None if it has no usable date."""
+    price = dict(zip(PRICE_COLUMNS, record.get('price', ())))
+    try:
+        return datetime.fromisoformat(_legacy_created_at(record.get('code', ''), price.get("Delivery Date", "")))
+    except ValueError:
+        return None
+
+
+def _legacy_created_at(contract_code, delivery_date):
+    """Best known creation date: the date in the contract code, else the delivery date."""
+    match = _CODE_DATE.search(contract_code)
+    if match:
+        try:
+            return datetime.strptime(match.group(1), '%Y%m%d').isoformat()
+        except ValueError:
+            pass
+    try:
+        return datetime.strptime(delivery_date.split(",")[-1].strip(), '%d.%m.%Y').isoformat()
+    except ValueError:
+        raise ValueError(f"no usable date in {contract_code!r} or {delivery_date!r}")
+
+
+class LegacyImporter:
+    """Bulk-loads the legacy CSV into a ContractModel, resumable after a crash.
+
+    The byte offset of the last imported record is stored in the same
+    transaction as the rows, so a restarted import continues exactly where
+    the last committed batch ended and never inserts a record twice.
+    """
+    def __init__(self, model, file_path=LEGACY_CSV_FILE, batch_size=5000):
+        self.model = model
+        self.file_path = file_path
+        # Compressing a closed log segment renames it to .gz; offsets refer to the
+        # uncompressed bytes, so the checkpoint carries over under the plain name.
+        self.source = file_path[:-3] if file_path.endswith('.gz') else file_path
+        self.batch_size = batch_size
+        self.model.conn.execute('''
+            CREATE TABLE IF NOT EXISTS import_checkpoints (
+                source TEXT PRIMARY KEY,
+                byte_offset INTEGER NOT NULL,
+                imported INTEGER NOT NULL,
+                rejected INTEGER NOT NULL,
+                updated_at TEXT NOT NULL
+            )
+        ''')
+        self.model.conn.commit()
+
+    def checkpoint(self):
+        """Return (byte_offset, imported, rejected) recorded for this file."""
+        row = self.model.conn.execute(
+            'SELECT byte_offset, imported, rejected FROM import_checkpoints WHERE source=?',
+            (self.source,)).fetchone()
+        return row if row else (0, 0, 0)
+
+    def reset(self):
+        """Forget the checkpoint so the next run starts from the beginning of the file."""
+        self.model.conn.execute('DELETE FROM import_checkpoints WHERE source=?', (self.source,))
+        self.model.conn.commit()
+
+    def run(self, errors=sys.stderr):
+        """Import everything after the checkpoint and return a summary dict."""
+        offset, imported, rejected = self.checkpoint()
+        start_offset = offset
+        new_imported = new_rejected = 0
+        batch = []
+        started = time.perf_counter()
+
+        for record, end_offset in iter_legacy_contracts(self.file_path, offset):
+            try:
+                batch.append(validate_legacy_contract(record))
+            except ValueError as e:
+                new_rejected += 1
+                print(f"Skipping contract {record.get('code', '?')!r}: {e}", file=errors)
+            offset = end_offset
+            if len(batch) >= self.batch_size:
+                new_imported += len(batch)
+                self._commit(batch, offset, imported + new_imported, rejected + new_rejected)
+                batch = []
+        new_imported += len(batch)
+        self._commit(batch, offset, imported + new_imported, rejected + new_rejected)
+
+        seconds = time.perf_counter() - started
+        summary = {
+            'imported': new_imported,
+            'rejected': new_rejected,
+            'bytes': offset - start_offset,
+            'seconds': seconds,
+            'records_per_sec': (new_imported + new_rejected) / seconds if seconds else 0.0,
+            'mb_per_sec': (offset - start_offset) / seconds / 1e6 if seconds else 0.0,
+        }
+        print(f"Imported {new_imported} contracts ({new_rejected} rejected) in {seconds:.2f}s, "
+              f"{summary['records_per_sec']:.0f} records/s, {summary['mb_per_sec']:.1f} MB/s")
+        return summary
+
+    def _commit(self, batch, offset, imported, rejected):
+        with self.model.conn:
+            self.model.insert_contract_rows(batch)
+            self.model.conn.execute('''
+                INSERT OR REPLACE INTO import_checkpoints (source, byte_offset, imported, rejected, updated_at)
+                VALUES (?, ?, ?, ?, ?)
+            ''', (self.source, offset, imported, rejected, datetime.now().isoformat()))
+
+
+if __name__ == '__main__':
+    # python legacy_import.py [contracts.csv | contract log directory]
+    source = sys.argv[1] if len(sys.argv) > 1 else CONTRACT_LOG_DIR
+    if source == CONTRACT_LOG_DIR:
+        # The default log takes over the legacy contracts.csv on first use
+        csv_files = ContractLog(source, legacy_file=LEGACY_CSV_FILE).segments()
+    else:
+        csv_files = ContractLog(source).segments() if os.path.isdir(source) else [source]
+    model = ContractModel()
+    for csv_file in csv_files:
+        LegacyImporter(model, csv_file).run()
+    model.close_connection()
@@ -1,7 +1,11 @@
+import os
 import tkinter as tk
 from tkinter import ttk
 from gui import ContractApp  # Import ContractApp from gui.py
 from receipt import ReceiptApp  # Import ReceiptApp from receipt.py
+from analytics import AnalyticsApp  # Import AnalyticsApp from analytics.py
+from backup import schedule_backups
+from replication import SYNC_DIR, schedule_sync
 
 class MainApp:
     def __init__(self, master):
@@ -23,6 +27,18 @@ class MainApp:
         self.notebook.add(self.receipt_tab, text="Receipt")
         self.receipt_app = ReceiptApp(self.receipt_tab)  # Instantiate ReceiptApp in the receipt_tab
 
+        # Set up the Analytics tab
+        self.analytics_tab = ttk.Frame(self.notebook)
+        self.notebook.add(self.analytics_tab, text="Analytics")
+        self.analytics_app = AnalyticsApp(self.analytics_tab)  # Instantiate AnalyticsApp in the analytics_tab
+
+        # Back up the contracts database in the background while the app is open
+        schedule_backups(self.master)
+
+        # Exchange contracts with the other terminals if a shared sync folder is set up
+        if os.path.isdir(SYNC_DIR):
+            schedule_sync(self.master)
+
 # Main application execution
 if __name__ == "__main__":
     root = tk.Tk()
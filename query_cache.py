@@ -0,0 +1,83 @@
+# query_cache.py
+# In-process cache of ContractModel reads, bounded by an estimate of the
+# memory its entries hold.
+import sys
+from collections import OrderedDict
+
+
+def estimate_size(value):
+    """Rough number of bytes held by a cached result (rows, lists of them)."""
+    if isinstance(value, (list, tuple)):
+        if len(value) > 1000:
+            # Extrapolate from a sample; measuring every record of a large result costs too much
+            step = len(value) // 100
+            return sys.getsizeof(value) + sum(estimate_size(item) for item in value[::step]) * len(value) // len(value[::step])
+        return sys.getsizeof(value) + sum(estimate_size(item) for item in value)
+    return sys.getsizeof(value)
+
+
+class QueryCache:
+    """LRU cache of single contracts and query results, limited to max_bytes.
+
+    Keys are ('contract', id) for get_contract_by_id and ('query', name, args)
+    for whole-table queries, so a write can drop exactly the entries it affects.
+    """
+    def __init__(self, max_bytes=64 * 1024 * 1024):
+        self.max_bytes = max_bytes
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.invalidations = 0
+        self._entries = OrderedDict()  # key -> (value, size), least recently used first
+        self._total_bytes = 0
+
+    def get(self, key):
+        """Return (True, value) for a cached key, else (False, None)."""
+        entry = self._entries.get(key)
+        if entry is None:
+            self.misses += 1
+            return False, None
+        self._entries.move_to_end(key)
+        self.hits += 1
+        return True, entry[0]
+
+    def put(self, key, value):
+        size = estimate_size(value)
+        self.discard(key, count=False)
+        if size > self.max_bytes:
+            return
+        self._entries[key] = (value, size)
+        self._total_bytes += size
+        while self._total_bytes > self.max_bytes:
+            _, (_, evicted) = self._entries.popitem(last=False)
+            self._total_bytes -= evicted
+            self.evictions += 1
+
+    def discard(self, key, count=True):
+        entry = self._entries.pop(key, None)
+        if entry is not None:
+            self._total_bytes -= entry[1]
+            if count:
+                self.invalidations += 1
+
+    def discard_where(self, predicate):
+        """Drop every entry whose (key, value) matches predicate."""
+        for key in [key for key, (value, _) in self._entries.items() if predicate(key, value)]:
+            self.discard(key)
+
+    def clear(self):
+        self.invalidations += len(self._entries)
+        self._entries.clear()
+        self._total_bytes = 0
+
+    def stats(self):
+        lookups = self.hits + self.misses
+        return {
+            'hits': self.hits,
+            'misses': self.misses,
+            'hit_rate': self.hits / lookups if lookups else 0.0,
+            'evictions': self.evictions,
+            'invalidations': self.invalidations,
+            'entries': len(self._entries),
+            'bytes': self._total_bytes,
+        }
@@ -1,78 +1,105 @@
 import tkinter as tk
-from tkinter import ttk, messagebox
-from fpdf import FPDF
+from tkinter import ttk, messagebox, filedialog
+from fpdf import FPDF, FPDF_VERSION
+import numpy as np
+import pandas as pd
+import csv
 import datetime
+import io
 import random
 import os
 import win32api
+from render_cache import RenderCache, RENDER_CACHE_DIR, write_document
+from company_profiles import get_company_profile, resolve_tenant
+from e_invoice import create_e_invoice, line_amounts, seller_vat_id, vat_breakdown
+from thermal_printer import ThermalReceipt, print_receipt
+from validation import RECEIPT_ITEMS, parse_number
+
+# Rendered receipts by content, so a reprint returns the original document and number
+RECEIPT_RENDER_CACHE = RenderCache(os.path.join(RENDER_CACHE_DIR, "receipts"))
+
+# Paper width of the counter's thermal printer in mm (58 or 80)
+THERMAL_PAPER_MM = 80
+
+# Company header of a receipt
+def draw_receipt_header(pdf, profile):
+    pdf.set_font('Arial', 'B', 12)
+    pdf.cell(0, 10, profile['name'], ln=True)
+    pdf.set_font('Arial', '', 10)
+    pdf.cell(0, 5, f"{profile['street']}, {profile['zip']}", ln=True)
+    if profile.get('vat_id'):
+        pdf.cell(0, 5, f"{profile['website']} | USt-IdNr.: {profile['vat_id']}", ln=True)
+    else:
+        pdf.cell(0, 5, profile['website'], ln=True)
+    pdf.cell(0, 5, profile['email'], ln=True)
+    pdf.ln(10)
 
 # Class to handle PDF creation
 class ReceiptPDF(FPDF):
+    def __init__(self, issued_at=None, tenant=None):
+        super().__init__()
+        # Company profile of the shop location issuing the receipt
+        self.tenant = resolve_tenant(tenant)
+        self.profile = get_company_profile(self.tenant)
+        # Date printed on the receipt and stored as the PDF creation date;
+        # fixing it makes the rendered bytes reproducible.
+        self.issued_at = issued_at or datetime.datetime.now()
+
+    def _putinfo(self):
+        # FPDF would stamp the current time; use the issue date so output is deterministic
+        self._out('/Producer ' + self._textstring('PyFPDF ' + FPDF_VERSION + ' http://pyfpdf.googlecode.com/'))
+        self._out('/CreationDate ' + self._textstring('D:' + self.issued_at.strftime('%Y%m%d%H%M%S')))
+
     def header(self):
-        self.set_font('Arial', 'B', 12)
-        self.cell(0, 10, 'Myers International GmbH', ln=True)
-        self.set_font('Arial', '', 10)
-        self.cell(0, 5, 'Karl-Marx-str 62, 12043 Berlin', ln=True)
-        self.cell(0, 5, 'www.myers-international.com', ln=True)
-        self.cell(0, 5, 'handyzentrum62@gmail.com', ln=True)
-        self.ln(10)
+        draw_receipt_header(self, self.profile)
 
     def customer_info(self, customer_name):
-        current_date = datetime.datetime.now().strftime("%d.%m.%Y")
+        current_date = self.issued_at.strftime("%d.%m.%Y")
         self.cell(200, 5, txt=f"Kunde: {customer_name}", ln=True, align="L")
-        self.cell(190, 5, txt=f"Erstellungsdatum: Berlin, {current_date}", ln=True, align="R")
+        self.cell(190, 5, txt=f"Erstellungsdatum: {self.profile['city']}, {current_date}", ln=True, align="R")
         self.ln(10)
 
-    def body(self, customer_name, items):
+    def body(self, customer_name, items, receipt_number=None):
         # Move customer_info to the beginning
         self.customer_info(customer_name)
 
-        receipt_number = generate_receipt_number()
+        receipt_number = receipt_number or generate_receipt_number()
         self.set_font("Arial", 'B', 12)
         self.cell(0, 10, txt=f"Rechnung: {receipt_number}", ln=True)
         self.ln(5)
 
-        # Table header
-        self.set_font('Arial', 'B', 10)
-        self.cell(80, 10, 'Beschreibung', border=1)
-        self.cell(20, 10, 'Menge', border=1)
-        self.cell(30, 10, 'Einzelpreis', border=1)
-        self.cell(20, 10, 'USt', border=1)
-        self.cell(30, 10, 'Gesamtpreis', border=1, ln=True)
+        self.table_header()
 
-        total_price = 0
-        total_netto_19 = 0
-        total_netto_0 = 0
-        total_tax_19 = 0
-        total_tax_0 = 0
+        # Amounts in cents, computed like the e-invoice so both show the same totals
+        basis = {}
+        carried = 0
 
         # Adding each item
         for item in items:
             description, quantity, unit_price, tax_included = item
-            netto_price = unit_price * quantity
-            tax_rate = 19 if tax_included else 0
-            tax_amount = netto_price * (tax_rate / 100)
+            price, netto_price, tax_rate, tax_amount = line_amounts(quantity, unit_price, tax_included)
             total_item_price = netto_price + tax_amount
+            basis[tax_rate] = basis.get(tax_rate, 0) + netto_price
 
-            total_price += total_item_price
-
-            if tax_rate == 19:
-                total_netto_19 += netto_price
-                total_tax_19 += tax_amount
-            else:
-                total_netto_0 += netto_price
-                total_tax_0 += tax_amount
+            # Continue the table on a new page, carrying the subtotal over
+            if self.y + 10 > self.page_break_trigger - 10:
+                self.carry_over(carried / 100)
+            carried += total_item_price
 
             # Add item row to table
             self.cell(80, 10, description, border=1)
             self.cell(20, 10, str(quantity), border=1)
-            self.cell(30, 10, f"{unit_price:.2f} EUR", border=1)
+            self.cell(30, 10, f"{price / 100:.2f} EUR", border=1)
             self.cell(20, 10, f"{tax_rate}%", border=1)
-            self.cell(30, 10, f"{total_item_price:.2f} EUR", border=1, ln=True)
+            self.cell(30, 10, f"{total_item_price / 100:.2f} EUR", border=1, ln=True)
+
+        # VAT per rate on the summed net amounts, as declared in the e-invoice
+        breakdown = vat_breakdown(basis)
+        total_price = sum(netto + tax for netto, tax in breakdown.values())
 
         # Total price section
         self.ln(10)
-        self.cell(0, 10, f'Gesamt: {total_price:.2f} EUR', ln=True)
+        self.cell(0, 10, f'Gesamt: {total_price / 100:.2f} EUR', ln=True)
 
         # Tax breakdown below the table in the requested format
         self.ln(5)
@@ -82,21 +109,13 @@ class ReceiptPDF(FPDF):
         self.cell(40, 10, 'Steuerbetrag', border=1)
         self.cell(40, 10, 'Brutto', border=1, ln=True)
 
-        # For 0% USt
-        if total_netto_0 > 0:
-            brutto_0 = total_netto_0 + total_tax_0
-            self.cell(40, 10, '0% USt', border=1)
-            self.cell(40, 10, f'{total_netto_0:.2f} EUR', border=1)
-            self.cell(40, 10, f'{total_tax_0:.2f} EUR', border=1)
-            self.cell(40, 10, f'{brutto_0:.2f} EUR', border=1, ln=True)
-
-        # For 19% USt
-        if total_netto_19 > 0:
-            brutto_19 = total_netto_19 + total_tax_19
-            self.cell(40, 10, '19% USt', border=1)
-            self.cell(40, 10, f'{total_netto_19:.2f} EUR', border=1)
-            self.cell(40, 10, f'{total_tax_19:.2f} EUR', border=1)
-            self.cell(40, 10, f'{brutto_19:.2f} EUR', border=1, ln=True)
+        for tax_rate in (0, 19):
+            netto, tax = breakdown.get(tax_rate, (0, 0))
+            if netto > 0:
+                self.cell(40, 10, f'{tax_rate}% USt', border=1)
+                self.cell(40, 10, f'{netto / 100:.2f} EUR', border=1)
+                self.cell(40, 10, f'{tax / 100:.2f} EUR', border=1)
+                self.cell(40, 10, f'{(netto + tax) / 100:.2f} EUR', border=1, ln=True)
 
         self.ln(10)
         self.cell(0, 5, 'Hinweis: Bei Angabe "0%" unterliegt der Artikel als Gebrauchtwarenkauf', ln=True)
@@ -104,22 +123,141 @@ class ReceiptPDF(FPDF):
 
         self.ln(10)
         self.cell(0, 5, 'Mit freundlichen Grüßen', ln=True)
-        self.cell(0, 5, 'Ihr Myers International-Team', ln=True)
+        self.cell(0, 5, f"Ihr {self.profile['team']}-Team", ln=True)
         return receipt_number
 
+    def table_header(self):
+        self.set_font('Arial', 'B', 10)
+        self.cell(80, 10, 'Beschreibung', border=1)
+        self.cell(20, 10, 'Menge', border=1)
+        self.cell(30, 10, 'Einzelpreis', border=1)
+        self.cell(20, 10, 'USt', border=1)
+        self.cell(30, 10, 'Gesamtpreis', border=1, ln=True)
+
+    def carry_over(self, subtotal):
+        """Close the item table with a subtotal and reopen it on the next page."""
+        self.cell(150, 10, 'Zwischensumme (Übertrag)', border=1)
+        self.cell(30, 10, f"{subtotal:.2f} EUR", border=1, ln=True)
+        self.add_page()
+        self.table_header()
+        self.cell(150, 10, 'Übertrag', border=1)
+        self.cell(30, 10, f"{subtotal:.2f} EUR", border=1, ln=True)
+
 # Generate unique receipt number
 def generate_receipt_number():
     return f"RG{datetime.datetime.now().strftime('%Y%m%d')}-{random.randint(100, 999)}"
 
+# Parse pasted text or a CSV export of line items
+# Column names that mark the first line as a header rather than an item
+LINE_ITEM_HEADER = {0: {'beschreibung', 'bezeichnung', 'artikel', 'position', 'description', 'item'},
+                    1: {'menge', 'anzahl', 'stück', 'stk', 'quantity', 'qty'}}
+
+def parse_line_items(text):
+    """
+    Parse line items, one per line: Beschreibung; Menge; Einzelpreis[; USt].
+    Fields may be separated by semicolons, tabs or commas, prices may use a
+    decimal comma, and the USt column is 19/ja/x for 19% (anything else is 0%).
+    A first line naming the columns (Beschreibung; Menge; ...) is skipped; any
+    other line, the first included, must be a valid item. All rows are
+    converted column-wise in one pass.
+
+    Returns:
+    - list: Items as (description, quantity, unit_price, tax_included) tuples.
+
+    Raises:
+    - ValueError: Listing every line with an invalid quantity, price or
+      description, or with more than four fields.
+    """
+    if not text.strip():
+        return []
+    sample = text[:4096]
+    sep = ';' if ';' in sample else '\t' if '\t' in sample else ','
+    reader = csv.reader(io.StringIO(text), delimiter=sep, skipinitialspace=True)
+    rows, line_numbers = [], []
+    for row in reader:
+        if any(field.strip() for field in row):
+            rows.append(row)
+            line_numbers.append(reader.line_num)
+    df = pd.DataFrame(rows, dtype=object)
+    df = df.reindex(columns=range(max(4, df.shape[1]))).fillna('')
+    line_numbers = np.array(line_numbers)
+
+    first = [str(field).strip().lower() for field in df.iloc[0, :2]]
+    if first[0] in LINE_ITEM_HEADER[0] or first[1] in LINE_ITEM_HEADER[1]:
+        df, line_numbers = df.iloc[1:], line_numbers[1:]
+        if df.empty:
+            return []
+
+    # A trailing separator is harmless, anything after the USt column is not
+    extra = (df.iloc[:, 4:].apply(lambda column: column.str.strip()) != '').any(axis=1).to_numpy()
+    quantity = pd.to_numeric(df[1].str.strip(), errors='coerce')
+    price_text = df[2].str.strip().str.replace('EUR', '', regex=False).str.replace('€', '', regex=False).str.strip()
+    decimal_comma = price_text.str.contains(',', regex=False)
+    price_text = price_text.where(~decimal_comma,
+                                  price_text.str.replace('.', '', regex=False).str.replace(',', '.', regex=False))
+    unit_price = pd.to_numeric(price_text, errors='coerce')
+    tax_included = df[3].str.strip().str.lower().str.rstrip('%').isin(['19', 'ja', 'j', 'yes', 'x', '1', 'true'])
+
+    invalid = (quantity.isna() | (quantity != quantity.round()) | (quantity <= 0) | unit_price.isna()
+               | (unit_price < 0) | (df[0].str.strip() == '')).to_numpy()
+    if invalid.any() or extra.any():
+        problems = []
+        if invalid.any():
+            lines = ", ".join(str(n) for n in line_numbers[invalid][:20])
+            problems.append(f"Ungültige Zeilen (Menge, Preis oder Beschreibung): {lines}")
+        if extra.any():
+            lines = ", ".join(str(n) for n in line_numbers[extra][:20])
+            problems.append(f"Zeilen mit mehr als 4 Spalten: {lines}")
+        raise ValueError("\n".join(problems))
+
+    return list(zip(df[0].str.strip().tolist(), quantity.astype(int).tolist(),
+                    unit_price.astype(float).tolist(), tax_included.tolist()))
+
 # Create and save PDF
-def create_pdf(customer_name, items):
-    pdf = ReceiptPDF()
+def create_pdf(customer_name, items, render_cache=RECEIPT_RENDER_CACHE, tenant=None, e_invoice=False,
+               receipt_number=None, issued_at=None):
+    """
+    Render a receipt and return its file name. Without a receipt_number the
+    receipt is for a new sale and gets a new number. With the receipt_number
+    and issued_at of a sale, the receipt cached for that sale is written out
+    again unchanged, or rendered with that number and date if it is not in
+    the cache or the company profile changed since; the number is part of the cache key, so a new sale never gets
+    an earlier sale's receipt. Pass render_cache=None to bypass the cache.
+    `tenant` selects the company profile, None meaning the default location.
+    With e_invoice=True the XML e-invoice of the receipt is written next to
+    the PDF, with the same name and number; if the location has no VAT ID
+    this raises ValueError before anything is written.
+    """
+    tenant = resolve_tenant(tenant)
+    if e_invoice:
+        seller_vat_id(tenant)
+    receipt_number = receipt_number or generate_receipt_number()
+    issued_at = (issued_at or datetime.datetime.now()).replace(microsecond=0)
+    if render_cache is not None:
+        key = render_cache.key('receipt', [tenant, get_company_profile(tenant), receipt_number, customer_name, items])
+        cached = render_cache.get(key)
+        if cached is not None:
+            data, meta = cached
+            write_document(meta['file_name'], data)
+            if e_invoice:
+                create_e_invoice(os.path.splitext(meta['file_name'])[0] + ".xml", customer_name, items,
+                                 meta['receipt_number'], datetime.datetime.fromisoformat(meta['issued_at']), tenant)
+            return meta['file_name']
+
+    pdf = ReceiptPDF(issued_at=issued_at, tenant=tenant)
     pdf.add_page()
 
-    receipt_number = pdf.body(customer_name, items)  # Store the receipt number returned from the body
+    pdf.body(customer_name, items, receipt_number)
 
     pdf_file_name = f"receipt_{customer_name}_{receipt_number}.pdf"  # Correctly use receipt_number in file name
-    pdf.output(pdf_file_name)
+    data = pdf.output(dest='S').encode('latin1')
+    write_document(pdf_file_name, data)
+    if e_invoice:
+        create_e_invoice(os.path.splitext(pdf_file_name)[0] + ".xml", customer_name, items,
+                         receipt_number, pdf.issued_at, tenant)
+    if render_cache is not None:
+        render_cache.put(key, data, {'file_name': pdf_file_name, 'receipt_number': receipt_number,
+                                     'issued_at': pdf.issued_at.isoformat()})
     
     return pdf_file_name
 
@@ -134,6 +272,8 @@ class ReceiptApp:
         self.master = master
 
         self.items = []
+        self.sale = None  # receipt number and date of the sale being entered, once a receipt was issued
+        self.thermal_receipt = None  # created on first use; holds the glyph and header caches
 
         # Create the main layout
         self.create_widgets()
@@ -160,6 +300,10 @@ class ReceiptApp:
         self.tax_var = tk.IntVar()
         tk.Checkbutton(self.master, text="Mehrwertsteuer (19%) hinzufügen", variable=self.tax_var).grid(row=4, column=0, columnspan=2, padx=10, pady=10)
 
+        # Checkbox to write the XML e-invoice next to the PDF
+        self.e_invoice_var = tk.IntVar()
+        tk.Checkbutton(self.master, text="E-Rechnung (XML) erzeugen", variable=self.e_invoice_var).grid(row=4, column=2, padx=10, pady=10)
+
         # Buttons to add, remove, and manage items
         btn_add_item = tk.Button(self.master, text="Artikel hinzufügen", command=self.add_item)
         btn_add_item.grid(row=5, column=0, padx=10, pady=10)
@@ -167,6 +311,9 @@ class ReceiptApp:
         btn_remove_item = tk.Button(self.master, text="Artikel entfernen", command=self.remove_item)
         btn_remove_item.grid(row=5, column=1, padx=10, pady=10)
 
+        btn_import_items = tk.Button(self.master, text="Artikel importieren", command=self.open_import_dialog)
+        btn_import_items.grid(row=5, column=2, padx=10, pady=10)
+
         # Table to display added items
         self.item_table = ttk.Treeview(self.master, columns=("Beschreibung", "Menge", "Einzelpreis", "USt", "Gesamtpreis"), show="headings")
         self.item_table.heading("Beschreibung", text="Beschreibung")
@@ -180,27 +327,24 @@ class ReceiptApp:
         btn_save = tk.Button(self.master, text="Speichern und Anzeigen", command=self.save_and_view_receipt)
         btn_save.grid(row=7, column=0, columnspan=2, padx=10, pady=10)
 
+        btn_thermal = tk.Button(self.master, text="Bon drucken", command=self.print_thermal_receipt)
+        btn_thermal.grid(row=7, column=2, padx=10, pady=10)
+
     def add_item(self):
-        description = self.entry_device.get()
-        quantity = int(self.entry_quantity.get())
-        unit_price_str = self.entry_price.get().replace(",", ".")  # Replace comma with dot for float conversion
-        try:
-            unit_price = float(unit_price_str)
-        except ValueError:
-            messagebox.showerror("Fehler", "Bitte geben Sie einen gültigen Preis ein (z.B., 1,00 oder 9.99)")
+        description = self.entry_device.get().strip()
+        errors = RECEIPT_ITEMS.validate({'description': description, 'quantity': self.entry_quantity.get(),
+                                         'unit_price': self.entry_price.get()})
+        if errors:
+            labels = {'description': "Gerät", 'quantity': "Menge", 'unit_price': "Einzelpreis"}
+            messagebox.showerror("Fehler", "\n".join(f"{labels[field]}: {message}" for field, message in errors.items()))
             return
+        quantity = int(parse_number(self.entry_quantity.get()))
+        unit_price = parse_number(self.entry_price.get())
 
         tax_included = self.tax_var.get() == 1
 
-        # Calculate total item price including tax
-        netto_price = quantity * unit_price
-        tax_rate = 19 if tax_included else 0
-        tax_amount = netto_price * (tax_rate / 100)
-        total_item_price = netto_price + tax_amount
-
         # Add to item list and table
-        self.items.append((description, quantity, unit_price, tax_included))
-        self.item_table.insert("", "end", values=(description, quantity, f"{unit_price:.2f} EUR", "19%" if tax_included else "0%", f"{total_item_price:.2f} EUR"))
+        self.insert_items([(description, quantity, unit_price, tax_included)])
 
         # Clear the input fields
         self.entry_device.delete(0, tk.END)
@@ -208,6 +352,46 @@ class ReceiptApp:
         self.entry_price.delete(0, tk.END)
         self.tax_var.set(0)
 
+    def insert_items(self, items):
+        """Append items to the item list and the table."""
+        for description, quantity, unit_price, tax_included in items:
+            # Calculate total item price including tax
+            netto_price = quantity * unit_price
+            tax_rate = 19 if tax_included else 0
+            tax_amount = netto_price * (tax_rate / 100)
+            total_item_price = netto_price + tax_amount
+            self.item_table.insert("", "end", values=(description, quantity, f"{unit_price:.2f} EUR", "19%" if tax_included else "0%", f"{total_item_price:.2f} EUR"))
+        self.items.extend(items)
+
+    def open_import_dialog(self):
+        """Let the user paste line items or load them from a CSV file."""
+        dialog = tk.Toplevel(self.master)
+        dialog.title("Artikel importieren")
+        tk.Label(dialog, text="Eine Zeile pro Artikel: Beschreibung; Menge; Einzelpreis; USt (19 oder 0)").pack(padx=10, pady=5)
+        text_items = tk.Text(dialog, height=15, width=70)
+        text_items.pack(padx=10, pady=5)
+
+        def load_file():
+            file_name = filedialog.askopenfilename(parent=dialog, filetypes=[("CSV", "*.csv"), ("Text", "*.txt"), ("Alle Dateien", "*.*")])
+            if file_name:
+                with open(file_name, encoding='utf-8-sig') as f:
+                    text_items.delete("1.0", tk.END)
+                    text_items.insert("1.0", f.read())
+
+        def import_items():
+            try:
+                items = parse_line_items(text_items.get("1.0", tk.END))
+            except ValueError as e:
+                messagebox.showerror("Fehler", str(e), parent=dialog)
+                return
+            self.insert_items(items)
+            dialog.destroy()
+
+        buttons = tk.Frame(dialog)
+        buttons.pack(padx=10, pady=10)
+        tk.Button(buttons, text="CSV-Datei laden", command=load_file).pack(side=tk.LEFT, padx=5)
+        tk.Button(buttons, text="Importieren", command=import_items).pack(side=tk.LEFT, padx=5)
+
     def remove_item(self):
         selected_item = self.item_table.selection()
         if selected_item:
@@ -217,15 +401,59 @@ class ReceiptApp:
         else:
             messagebox.showwarning("Fehler", "Bitte wählen Sie einen Artikel aus, um ihn zu entfernen.")
 
+    def current_sale(self, customer_name):
+        """Receipt number and date of the sale being entered; a changed customer or item list is a new sale."""
+        if self.sale is None or self.sale['customer_name'] != customer_name or self.sale['items'] != self.items:
+            self.sale = {'customer_name': customer_name, 'items': list(self.items),
+                         'receipt_number': generate_receipt_number(),
+                         'issued_at': datetime.datetime.now().replace(microsecond=0), 'pdf_file': None,
+                         'thermal_file': None}
+        return self.sale
+
     def save_and_view_receipt(self):
         customer_name = self.entry_customer.get()
         if customer_name and self.items:
-            pdf_file_name = create_pdf(customer_name, self.items)
+            sale = self.current_sale(customer_name)
+            reprint = sale['pdf_file'] is not None
+            try:
+                pdf_file_name = create_pdf(customer_name, self.items, e_invoice=self.e_invoice_var.get() == 1,
+                                           receipt_number=sale['receipt_number'], issued_at=sale['issued_at'])
+            except ValueError as e:
+                messagebox.showerror("Fehler", f"Quittung nicht erstellt: {e}")
+                return
+            sale['pdf_file'] = pdf_file_name
             open_pdf_and_print(pdf_file_name)
-            messagebox.showinfo("Erfolg", f"Quittung gespeichert und angezeigt: {pdf_file_name}")
+            if reprint:
+                messagebox.showinfo("Nachdruck", f"Quittung {sale['receipt_number']} erneut angezeigt: {pdf_file_name}")
+            else:
+                messagebox.showinfo("Erfolg", f"Quittung gespeichert und angezeigt: {pdf_file_name}")
         else:
             messagebox.showwarning("Eingabefehler", "Bitte alle Felder ausfüllen und mindestens einen Artikel hinzufügen!")
 
+    def print_thermal_receipt(self):
+        customer_name = self.entry_customer.get()
+        if not (customer_name and self.items):
+            messagebox.showwarning("Eingabefehler", "Bitte alle Felder ausfüllen und mindestens einen Artikel hinzufügen!")
+            return
+        if self.thermal_receipt is None:
+            self.thermal_receipt = ThermalReceipt(THERMAL_PAPER_MM)
+        # Same number and date as the PDF of this sale; the printed bytes are kept next to the PDFs
+        sale = self.current_sale(customer_name)
+        reprint = sale['thermal_file'] is not None
+        data = self.thermal_receipt.render(customer_name, self.items, sale['receipt_number'], sale['issued_at'])
+        thermal_file = f"receipt_{customer_name}_{sale['receipt_number']}.prn"
+        write_document(thermal_file, data)
+        sale['thermal_file'] = thermal_file
+        try:
+            print_receipt(data)
+        except OSError as e:
+            messagebox.showerror("Fehler", f"Bondrucker nicht erreichbar: {e}")
+            return
+        if reprint:
+            messagebox.showinfo("Nachdruck", f"Bon {sale['receipt_number']} erneut gedruckt")
+        else:
+            messagebox.showinfo("Erfolg", f"Bon gedruckt: {sale['receipt_number']}")
+
 # Main GUI loop
 if __name__ == "__main__":
     root = tk.Tk()
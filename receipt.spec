@@ -5,8 +5,8 @@ a = Analysis(
     ['receipt.py'],
     pathex=[],
     binaries=[],
-    datas=[],
-    hiddenimports=[],
+    datas=[('schemas', 'schemas')],
+    hiddenimports=['lxml.etree', 'lxml._elementpath'],
     hookspath=[],
     hooksconfig={},
     runtime_hooks=[],
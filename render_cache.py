@@ -0,0 +1,129 @@
+# render_cache.py
+# Disk cache of rendered documents, keyed by a hash of their normalized input,
+# so reprints return the original bytes instead of rendering a new document.
+import hashlib
+import json
+import os
+from collections import OrderedDict
+
+RENDER_CACHE_DIR = "render_cache"
+
+
+def normalize_input(value):
+    """Canonical form of document input: trimmed text, two-decimal floats, plain containers."""
+    if isinstance(value, str):
+        return value.replace("\r\n", "\n").strip()
+    if isinstance(value, bool) or value is None or isinstance(value, int):
+        return value
+    if isinstance(value, float):
+        return round(value, 2)
+    if isinstance(value, dict):
+        return {str(key): normalize_input(item) for key, item in value.items()}
+    if isinstance(value, (list, tuple)):
+        return [normalize_input(item) for item in value]
+    return normalize_input(str(value))
+
+
+class RenderCache:
+    """Size-bounded LRU cache of rendered documents on disk.
+
+    Each entry is a <key>.pdf file with a <key>.json file holding the
+    metadata needed to hand the document out again (file name, number, date).
+    File modification times carry the LRU order across processes.
+    """
+    def __init__(self, directory, max_bytes=256 * 1024 * 1024):
+        self.directory = directory
+        self.max_bytes = max_bytes
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self._entries = None  # key -> size in bytes, least recently used first
+        self._total_bytes = 0
+
+    def key(self, kind, document_input):
+        """Hash of the document kind and its normalized input."""
+        payload = json.dumps([kind, normalize_input(document_input)], sort_keys=True, ensure_ascii=False)
+        return hashlib.sha256(payload.encode('utf-8')).hexdigest()
+
+    def _path(self, key, extension):
+        return os.path.join(self.directory, key + extension)
+
+    def _load_entries(self):
+        if self._entries is not None:
+            return
+        entries = []
+        if os.path.isdir(self.directory):
+            for name in os.listdir(self.directory):
+                if name.endswith('.pdf'):
+                    stat = os.stat(os.path.join(self.directory, name))
+                    entries.append((stat.st_mtime, name[:-4], stat.st_size))
+        self._entries = OrderedDict((key, size) for _, key, size in sorted(entries))
+        self._total_bytes = sum(self._entries.values())
+
+    def get(self, key):
+        """Return (document bytes, metadata) for a cached render, or None."""
+        self._load_entries()
+        if key not in self._entries:
+            self.misses += 1
+            return None
+        try:
+            with open(self._path(key, '.pdf'), 'rb') as f:
+                data = f.read()
+            with open(self._path(key, '.json'), 'r', encoding='utf-8') as f:
+                meta = json.load(f)
+        except (OSError, ValueError):
+            self._remove(key)
+            self.misses += 1
+            return None
+        os.utime(self._path(key, '.pdf'))
+        self._entries.move_to_end(key)
+        self.hits += 1
+        return data, meta
+
+    def put(self, key, data, meta):
+        """Store a rendered document and evict least recently used entries beyond max_bytes."""
+        self._load_entries()
+        os.makedirs(self.directory, exist_ok=True)
+        with open(self._path(key, '.json'), 'w', encoding='utf-8') as f:
+            json.dump(meta, f)
+        tmp_path = self._path(key, '.pdf.tmp')
+        with open(tmp_path, 'wb') as f:
+            f.write(data)
+        os.replace(tmp_path, self._path(key, '.pdf'))
+
+        self._total_bytes += len(data) - self._entries.pop(key, 0)
+        self._entries[key] = len(data)
+        while self._total_bytes > self.max_bytes and len(self._entries) > 1:
+            self._remove(next(iter(self._entries)))
+            self.evictions += 1
+
+    def _remove(self, key):
+        self._total_bytes -= self._entries.pop(key, 0)
+        for extension in ('.pdf', '.json'):
+            try:
+                os.remove(self._path(key, extension))
+            except FileNotFoundError:
+                pass
+
+    def stats(self):
+        """Hit/miss counters of this process and the current cache size."""
+        self._load_entries()
+        lookups = self.hits + self.misses
+        return {
+            'hits': self.hits,
+            'misses': self.misses,
+            'hit_rate': self.hits / lookups if lookups else 0.0,
+            'evictions': self.evictions,
+            'entries': len(self._entries),
+            'bytes': self._total_bytes,
+        }
+
+
+def write_document(path, data):
+    """Write document bytes to path unless an identical file is already there."""
+    if os.path.exists(path) and os.path.getsize(path) == len(data):
+        with open(path, 'rb') as f:
+            if f.read() == data:
+                return
+    with open(path, 'wb') as f:
+        f.write(data)
@@ -0,0 +1,482 @@
+# replication.py
+# Replication of the contracts database between terminals (the counter PCs),
+# each with its own contracts.db. Triggers record every change of
+# contract_records in a change log, and terminals exchange only the contracts
+# changed since their last sync, through a shared folder or a local socket.
+import gzip
+import hashlib
+import json
+import os
+import socket
+import socketserver
+import sqlite3
+import sys
+import threading
+import time
+
+from data import CONTRACT_COLUMNS, DB_FILE, ContractModel
+
+# Shared folder the terminals publish their changes to, one outbox per terminal
+SYNC_DIR = os.path.join(os.path.dirname(__file__), '..', 'data', 'sync')
+SYNC_INTERVAL_MS = 60 * 1000
+SYNC_PORT = 8765
+
+# Columns a change carries, in order; the local contract id is not replicated
+ROW_COLUMNS = CONTRACT_COLUMNS[1:]
+
+# Every contract gets a globally unique uid (terminal name and local id) and
+# the (version, origin) of its last change: version is a Lamport clock that
+# each terminal advances past every version it has seen, origin the terminal
+# that made the change. Deleted contracts leave a tombstone with the version
+# of the delete. The triggers stay quiet while remote changes are applied.
+REPLICATION_SQL = '''
+    CREATE UNIQUE INDEX IF NOT EXISTS idx_contract_records_uid ON contract_records (uid);
+
+    CREATE TABLE IF NOT EXISTS replication_state (
+        id INTEGER PRIMARY KEY CHECK (id = 1),
+        terminal TEXT NOT NULL,
+        clock INTEGER NOT NULL DEFAULT 0,
+        applying INTEGER NOT NULL DEFAULT 0,
+        published_seq INTEGER NOT NULL DEFAULT 0
+    );
+
+    CREATE TABLE IF NOT EXISTS change_log (
+        seq INTEGER PRIMARY KEY AUTOINCREMENT,
+        uid TEXT NOT NULL,
+        op TEXT NOT NULL CHECK (op IN ('upsert', 'delete')),
+        version INTEGER NOT NULL,
+        origin TEXT NOT NULL
+    );
+
+    CREATE TABLE IF NOT EXISTS replication_tombstones (
+        uid TEXT PRIMARY KEY,
+        version INTEGER NOT NULL,
+        origin TEXT NOT NULL
+    ) WITHOUT ROWID;
+
+    CREATE TABLE IF NOT EXISTS replication_peers (
+        peer TEXT PRIMARY KEY,
+        received_seq INTEGER NOT NULL
+    ) WITHOUT ROWID;
+
+    CREATE TRIGGER IF NOT EXISTS contract_records_log_insert AFTER INSERT ON contract_records
+    WHEN (SELECT applying FROM replication_state) = 0
+    BEGIN
+        UPDATE replication_state SET clock = clock + 1;
+        UPDATE contract_records
+        SET uid = COALESCE(NEW.uid, (SELECT terminal || '-' || NEW.id FROM replication_state)),
+            version = (SELECT clock FROM replication_state),
+            origin = (SELECT terminal FROM replication_state)
+        WHERE id = NEW.id;
+        INSERT INTO change_log (uid, op, version, origin)
+        SELECT uid, 'upsert', version, origin FROM contract_records WHERE id = NEW.id;
+    END;
+
+    CREATE TRIGGER IF NOT EXISTS contract_records_log_update
+    AFTER UPDATE OF seller_id, buyer_id, device_id, imei_number, condition, price, terms, created_at
+    ON contract_records
+    WHEN (SELECT applying FROM replication_state) = 0
+    BEGIN
+        UPDATE replication_state SET clock = clock + 1;
+        UPDATE contract_records
+        SET version = (SELECT clock FROM replication_state), origin = (SELECT terminal FROM replication_state)
+        WHERE id = NEW.id;
+        INSERT INTO change_log (uid, op, version, origin)
+        SELECT uid, 'upsert', version, origin FROM contract_records WHERE id = NEW.id;
+    END;
+
+    CREATE TRIGGER IF NOT EXISTS contract_records_log_delete AFTER DELETE ON contract_records
+    WHEN (SELECT applying FROM replication_state) = 0 AND OLD.uid IS NOT NULL
+    BEGIN
+        UPDATE replication_state SET clock = clock + 1;
+        INSERT OR REPLACE INTO replication_tombstones (uid, version, origin)
+        SELECT OLD.uid, clock, terminal FROM replication_state;
+        INSERT INTO change_log (uid, op, version, origin)
+        SELECT OLD.uid, 'delete', clock, terminal FROM replication_state;
+    END;
+'''
+
+# The state of every contract changed in a range of the change log: its
+# current row, or its tombstone if it has been deleted since. The row is
+# joined from the normalized tables, as a LEFT JOIN on the contracts view
+# would make SQLite materialize the whole view.
+_CHANGES_SQL = '''
+    WITH changed AS (
+        SELECT uid, MAX(seq) AS seq FROM change_log WHERE seq > ? AND seq <= ? {origin} GROUP BY uid
+    )
+    SELECT changed.uid, COALESCE(r.version, t.version), COALESCE(r.origin, t.origin), r.id,
+           s.first_name, s.last_name, s.address, s.phone, s.email,
+           b.first_name, b.last_name, b.address, b.phone, b.email,
+           d.device_type, d.device_model,
+           r.imei_number, r.condition, r.price, r.terms, r.created_at
+    FROM changed
+    LEFT JOIN contract_records r ON r.uid = changed.uid
+    LEFT JOIN parties s ON s.id = r.seller_id
+    LEFT JOIN parties b ON b.id = r.buyer_id
+    LEFT JOIN devices d ON d.id = r.device_id
+    LEFT JOIN replication_tombstones t ON t.uid = changed.uid AND r.id IS NULL
+    ORDER BY changed.seq
+'''
+
+_UPDATE_SQL = f'''
+    UPDATE contracts SET {', '.join(column + '=?' for column in ROW_COLUMNS)} WHERE id=?
+'''
+
+
+def _encode(changes):
+    """Changes as gzip-compressed JSON lines of [uid, version, origin, row or null]."""
+    lines = "".join(json.dumps(change, ensure_ascii=False, separators=(',', ':')) + "\n" for change in changes)
+    return gzip.compress(lines.encode('utf-8'), compresslevel=6)
+
+
+def _decode(payload):
+    return [json.loads(line) for line in gzip.decompress(payload).decode('utf-8').splitlines() if line]
+
+
+def _content_uid(row):
+    """uid of a contract that existed before replication: a hash of its content.
+
+    Terminals holding copies of the same contract (from an export_to_sqlite
+    file, say) give them the same uid, so the copies merge instead of being
+    replicated as duplicates.
+    """
+    return hashlib.sha1(json.dumps(row, ensure_ascii=False).encode('utf-8')).hexdigest()[:32]
+
+
+class Replicator:
+    """Change log and incremental sync of one terminal's contracts database.
+
+    Creating it installs the replication tables and triggers in the
+    database of `model` (a ContractModel) and gives every existing contract a
+    uid. `terminal` names this terminal and must be unique among the terminals
+    that sync with each other; it defaults to the host name and is kept in the
+    database once set.
+
+    Conflicts are settled by last writer wins: of two changes to the same
+    contract, the one with the higher version wins, and on equal versions the
+    one from the terminal whose name sorts last. Every terminal decides the
+    same way in any order of syncing, so all of them end up with the same
+    contracts.
+    """
+    def __init__(self, model, terminal=None):
+        self.model = model
+        self.conn = model.conn
+        self.terminal = self._enable(terminal)
+
+    def _enable(self, terminal):
+        conn = self.conn
+        columns = [row[1] for row in conn.execute('PRAGMA table_info(contract_records)')]
+        for column, kind in (('uid', 'TEXT'), ('version', 'INTEGER'), ('origin', 'TEXT')):
+            if column not in columns:
+                conn.execute(f'ALTER TABLE contract_records ADD COLUMN {column} {kind}')
+        conn.executescript(REPLICATION_SQL)
+
+        row = conn.execute('SELECT terminal FROM replication_state WHERE id = 1').fetchone()
+        if row is not None:
+            if terminal is not None and terminal != row[0]:
+                raise ValueError(f"This database replicates as terminal {row[0]!r}, not {terminal!r}.")
+            terminal = row[0]
+        else:
+            terminal = terminal or socket.gethostname()
+            if not terminal or os.sep in terminal or terminal != terminal.strip():
+                raise ValueError(f"Invalid terminal name {terminal!r}.")
+            with conn:
+                conn.execute('INSERT INTO replication_state (id, terminal) VALUES (1, ?)', (terminal,))
+        self._backfill(terminal)
+        return terminal
+
+    def _backfill(self, terminal):
+        """Give contracts without a uid (made before replication) a content uid and log them."""
+        conn = self.conn
+        rows = conn.execute(f'''
+            SELECT v.id, {', '.join('v.' + column for column in ROW_COLUMNS)}
+            FROM contract_records r JOIN contracts v ON v.id = r.id
+            WHERE r.uid IS NULL ORDER BY r.id
+        ''').fetchall()
+        if not rows:
+            return
+        taken = {uid for (uid,) in conn.execute('SELECT uid FROM contract_records WHERE uid IS NOT NULL')}
+        updates = []
+        for row in rows:
+            base = uid = _content_uid(list(row[1:]))
+            copy = 1
+            while uid in taken:  # identical contracts within this database
+                copy += 1
+                uid = f"{base}-{copy}"
+            taken.add(uid)
+            updates.append((uid, terminal, row[0]))
+        with conn:
+            conn.execute('UPDATE replication_state SET clock = MAX(clock, 1)')
+            conn.executemany('UPDATE contract_records SET uid = ?, version = 1, origin = ? WHERE id = ?', updates)
+            conn.executemany("INSERT INTO change_log (uid, op, version, origin) VALUES (?, 'upsert', 1, ?)",
+                             [(uid, origin) for uid, origin, _ in updates])
+        print(f"Prepared {len(updates)} existing contracts for replication.")
+
+    def changes_since(self, seq, exclude_origin=None, origin=None):
+        """Changes of the contracts logged after position seq of the change log.
+
+        Returns (last_seq, changes): the log position the changes go up to, and
+        one [uid, version, origin, row] per changed contract with its current
+        values in ROW_COLUMNS order, or None for the row if it was deleted.
+        Changes made by `exclude_origin` are left out, as that terminal has
+        them; with `origin`, only the changes made by that terminal are returned.
+        """
+        conn = self.conn
+        snapshot = not conn.in_transaction
+        if snapshot:
+            conn.execute('BEGIN')  # one read snapshot for the log position and the rows
+        try:
+            last_seq = conn.execute('SELECT COALESCE(MAX(seq), 0) FROM change_log').fetchone()[0]
+            if origin is None:
+                rows = conn.execute(_CHANGES_SQL.format(origin=""), (seq, last_seq))
+            else:
+                rows = conn.execute(_CHANGES_SQL.format(origin="AND origin = ?"), (seq, last_seq, origin))
+            changes = []
+            for uid, version, changed_by, local_id, *row in rows:
+                if version is None or changed_by == exclude_origin or origin not in (None, changed_by):
+                    continue  # logged as changed by `origin`, but changed by another terminal since
+                changes.append([uid, version, changed_by, row if local_id is not None else None])
+        finally:
+            if snapshot:
+                conn.execute('COMMIT')
+        return max(last_seq, seq), changes
+
+    def _received(self, peer):
+        row = self.conn.execute('SELECT received_seq FROM replication_peers WHERE peer = ?', (peer,)).fetchone()
+        return row[0] if row else 0
+
+    def apply_changes(self, changes, peer=None, received_seq=None):
+        """Apply changes from another terminal in one transaction and return (applied, skipped).
+
+        A change is skipped when this database already holds the same or a
+        newer version of the contract. Applied changes are logged with their
+        original version and origin, so they travel on to further terminals.
+        With `peer`, its log position received_seq is recorded in the same
+        transaction.
+        """
+        conn = self.conn
+        applied = skipped = 0
+        clock = 0
+        with conn:
+            conn.execute('UPDATE replication_state SET applying = 1')
+            for uid, version, origin, row in changes:
+                local = conn.execute('SELECT id, version, origin FROM contract_records WHERE uid = ?',
+                                     (uid,)).fetchone()
+                current = local[1:] if local else conn.execute(
+                    'SELECT version, origin FROM replication_tombstones WHERE uid = ?', (uid,)).fetchone()
+                if current is not None and (version, origin) <= tuple(current):
+                    skipped += 1
+                    continue
+                if row is None:
+                    if local:
+                        conn.execute('DELETE FROM contracts WHERE id = ?', (local[0],))
+                    conn.execute('INSERT OR REPLACE INTO replication_tombstones (uid, version, origin) '
+                                 'VALUES (?, ?, ?)', (uid, version, origin))
+                elif local:
+                    conn.execute(_UPDATE_SQL, row + [local[0]])
+                    conn.execute('UPDATE contract_records SET version = ?, origin = ? WHERE id = ?',
+                                 (version, origin, local[0]))
+                else:
+                    _, contract_id = self.model.insert_contract_rows([row])
+                    conn.execute('UPDATE contract_records SET uid = ?, version = ?, origin = ? WHERE id = ?',
+                                 (uid, version, origin, contract_id))
+                    conn.execute('DELETE FROM replication_tombstones WHERE uid = ?', (uid,))
+                conn.execute('INSERT INTO change_log (uid, op, version, origin) VALUES (?, ?, ?, ?)',
+                             (uid, 'upsert' if row is not None else 'delete', version, origin))
+                clock = max(clock, version)
+                applied += 1
+            conn.execute('UPDATE replication_state SET applying = 0, clock = MAX(clock, ?)', (clock,))
+            if peer is not None:
+                conn.execute('INSERT INTO replication_peers (peer, received_seq) VALUES (?, ?) '
+                             'ON CONFLICT (peer) DO UPDATE SET received_seq = excluded.received_seq',
+                             (peer, received_seq))
+        return applied, skipped
+
+    def publish(self, directory=SYNC_DIR):
+        """Write the changes logged since the last publish to this terminal's outbox in `directory`.
+
+        Each batch is one <first seq>-<last seq>.jsonl.gz file, written under a
+        temporary name and renamed, so readers never see part of a batch. Only
+        the changes made on this terminal are published: every terminal reads
+        all outboxes, so changes received from others need not be passed on.
+        Returns (changes, bytes) written.
+        """
+        published = self.conn.execute('SELECT published_seq FROM replication_state').fetchone()[0]
+        last_seq, changes = self.changes_since(published, origin=self.terminal)
+        size = 0
+        if changes:
+            outbox = os.path.join(directory, self.terminal)
+            os.makedirs(outbox, exist_ok=True)
+            payload = _encode(changes)
+            path = os.path.join(outbox, f"{published + 1:012}-{last_seq:012}.jsonl.gz")
+            with open(path + ".tmp", 'wb') as f:
+                f.write(payload)
+            os.replace(path + ".tmp", path)
+            size = len(payload)
+        if last_seq != published:
+            with self.conn:
+                self.conn.execute('UPDATE replication_state SET published_seq = ?', (last_seq,))
+        return len(changes), size
+
+    def pull(self, directory=SYNC_DIR):
+        """Apply the batches other terminals published to `directory` that this terminal has not seen yet.
+
+        Returns a dict with the changes received, applied and skipped, the
+        bytes read and lag_seconds, the age of the oldest batch applied.
+        """
+        report = {'received': 0, 'applied': 0, 'skipped': 0, 'bytes': 0, 'lag_seconds': 0.0}
+        if not os.path.isdir(directory):
+            return report
+        for peer in sorted(os.listdir(directory)):
+            outbox = os.path.join(directory, peer)
+            if peer == self.terminal or not os.path.isdir(outbox):
+                continue
+            received = self._received(peer)
+            for name in sorted(os.listdir(outbox)):
+                if not name.endswith(".jsonl.gz"):
+                    continue
+                last_seq = int(name.split('.', 1)[0].split('-')[1])
+                if last_seq <= received:
+                    continue
+                path = os.path.join(outbox, name)
+                with open(path, 'rb') as f:
+                    payload = f.read()
+                changes = _decode(payload)
+                applied, skipped = self.apply_changes(changes, peer, last_seq)
+                report['received'] += len(changes)
+                report['applied'] += applied
+                report['skipped'] += skipped
+                report['bytes'] += len(payload)
+                report['lag_seconds'] = max(report['lag_seconds'], time.time() - os.path.getmtime(path))
+                received = last_seq
+        return report
+
+    def sync_folder(self, directory=SYNC_DIR):
+        """Publish this terminal's changes to the shared folder and apply everyone else's.
+
+        Returns a report dict: changes sent and received, bytes moved, changes
+        applied and skipped as older than what this terminal holds, bytes per
+        change, lag_seconds of the oldest batch applied and the sync seconds.
+        """
+        started = time.perf_counter()
+        sent, sent_bytes = self.publish(directory)
+        pulled = self.pull(directory)
+        return self._report(sent, sent_bytes, pulled, time.perf_counter() - started)
+
+    def sync_socket(self, address):
+        """Fetch and apply the changes of the terminal serving a ChangeServer at address (host, port).
+
+        Only changes this terminal has not received from that peer are sent.
+        Returns the same report as sync_folder.
+        """
+        started = time.perf_counter()
+        with socket.create_connection(address, timeout=30) as sock, sock.makefile('rwb') as stream:
+            peer = json.loads(stream.readline())['terminal']
+            stream.write(json.dumps({'terminal': self.terminal, 'after': self._received(peer)}).encode() + b"\n")
+            stream.flush()
+            header = json.loads(stream.readline())
+            payload = stream.read(header['bytes'])
+        changes = _decode(payload)
+        applied, skipped = self.apply_changes(changes, peer, header['last_seq'])
+        seconds = time.perf_counter() - started
+        pulled = {'received': len(changes), 'applied': applied, 'skipped': skipped,
+                  'bytes': len(payload), 'lag_seconds': seconds}
+        return self._report(0, 0, pulled, seconds)
+
+    def _report(self, sent, sent_bytes, pulled, seconds):
+        changes = sent + pulled['received']
+        moved = sent_bytes + pulled['bytes']
+        report = {
+            'sent': sent,
+            'received': pulled['received'],
+            'applied': pulled['applied'],
+            'skipped': pulled['skipped'],
+            'bytes': moved,
+            'bytes_per_change': moved / changes if changes else 0.0,
+            'lag_seconds': pulled['lag_seconds'],
+            'seconds': seconds,
+        }
+        if changes:
+            print(f"Synced terminal {self.terminal}: sent {sent}, received {pulled['received']} "
+                  f"({pulled['applied']} applied, {pulled['skipped']} skipped), {moved} bytes "
+                  f"({report['bytes_per_change']:.0f} bytes/change) in {seconds * 1000:.0f} ms")
+        return report
+
+
+class _ChangeRequestHandler(socketserver.StreamRequestHandler):
+    def handle(self):
+        replicator = self.server.replicator
+        self.wfile.write(json.dumps({'terminal': replicator.terminal}).encode() + b"\n")
+        self.wfile.flush()
+        request = json.loads(self.rfile.readline())
+        last_seq, changes = replicator.changes_since(request['after'], exclude_origin=request['terminal'])
+        payload = _encode(changes)
+        self.wfile.write(json.dumps({'last_seq': last_seq, 'bytes': len(payload)}).encode() + b"\n")
+        self.wfile.write(payload)
+
+
+class ChangeServer(socketserver.TCPServer):
+    """Serves a terminal's changes to other terminals' Replicator.sync_socket on a local TCP port.
+
+    Requests are handled one at a time on a background thread that has its
+    own connection to the database.
+    """
+    allow_reuse_address = True
+
+    def __init__(self, db_file=DB_FILE, terminal=None, address=('127.0.0.1', SYNC_PORT)):
+        super().__init__(address, _ChangeRequestHandler)
+        self.db_file = db_file
+        self.terminal = terminal
+        self.replicator = None
+        self._ready = threading.Event()
+        self._thread = None
+
+    def start(self):
+        """Start serving on a background thread; returns the (host, port) being served."""
+        self._thread = threading.Thread(target=self._serve, daemon=True)
+        self._thread.start()
+        self._ready.wait()
+        return self.server_address
+
+    def _serve(self):
+        model = ContractModel(self.db_file)
+        try:
+            self.replicator = Replicator(model, self.terminal)
+            self._ready.set()
+            self.serve_forever()
+        finally:
+            self._ready.set()
+            model.close_connection()
+
+    def stop(self):
+        self.shutdown()
+        self.server_close()
+        self._thread.join()
+
+
+def schedule_sync(widget, directory=SYNC_DIR, db_file=DB_FILE, interval_ms=SYNC_INTERVAL_MS):
+    """Sync through the shared folder every interval_ms on a worker thread, driven by the Tk event loop of `widget`."""
+    def worker():
+        try:
+            model = ContractModel(db_file)
+            try:
+                Replicator(model).sync_folder(directory)
+            finally:
+                model.close_connection()
+        except (sqlite3.Error, OSError, ValueError) as e:
+            print(f"Error syncing contracts: {e}")
+
+    def tick():
+        threading.Thread(target=worker, daemon=True).start()
+        widget.after(interval_ms, tick)
+
+    widget.after(interval_ms, tick)
+
+
+if __name__ == '__main__':
+    # python replication.py [shared folder] [database]
+    model = ContractModel(*sys.argv[2:3])
+    try:
+        Replicator(model).sync_folder(*sys.argv[1:2])
+    finally:
+        model.close_connection()
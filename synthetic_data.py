@@ -0,0 +1,261 @@
+# synthetic_data.py
+# Plausible fake contracts and receipts for scale testing, and a soak test that
+# renders documents continuously while watching memory, file handles and speed.
+# All text stays within Latin-1, which is what the PDF core fonts can encode.
+#
+#   python synthetic_data.py contracts 1000000 [database]
+#   python synthetic_data.py receipts 500
+#   python synthetic_data.py soak 3600 [sample interval in seconds]
+import os
+import random
+import sys
+import tempfile
+import time
+from datetime import datetime, timedelta
+
+from validation import luhn_check_digit
+
+FIRST_NAMES = [
+    "Lukas", "Leon", "Finn", "Jonas", "Paul", "Felix", "Maximilian", "Elias", "Ben", "Noah", "Emil", "Anton",
+    "Mehmet", "Ali", "Can", "Piotr", "Thomas", "Michael", "Andreas", "Stefan", "Emma", "Mia", "Hannah",
+    "Sofia", "Lea", "Marie", "Lina", "Anna", "Leonie", "Clara", "Aylin", "Elif", "Fatma", "Katarzyna",
+    "Sabine", "Petra", "Julia", "Jana", "Sarah", "Laura",
+]
+LAST_NAMES = [
+    "Müller", "Schmidt", "Schneider", "Fischer", "Weber", "Meyer", "Wagner", "Becker", "Schulz", "Hoffmann",
+    "Schäfer", "Koch", "Bauer", "Richter", "Klein", "Wolf", "Schröder", "Neumann", "Schwarz", "Zimmermann",
+    "Braun", "Krüger", "Hofmann", "Hartmann", "Lange", "Schmitt", "Werner", "Krause", "Meier", "Lehmann",
+    "Yildiz", "Kaya", "Demir", "Sahin", "Nowak", "Kowalski", "Nguyen", "Popescu",
+]
+STREETS = [
+    "Sonnenallee", "Karl-Marx-Straße", "Hermannstraße", "Kottbusser Damm", "Hauptstraße", "Bahnhofstraße",
+    "Schillerstraße", "Goethestraße", "Friedrichstraße", "Lindenstraße", "Berliner Straße", "Gartenstraße",
+    "Kantstraße", "Turmstraße", "Müllerstraße", "Frankfurter Allee", "Schönhauser Allee", "Torstraße",
+]
+# (PLZ range, city)
+CITIES = [
+    ((10115, 14199), "Berlin"), ((20095, 22769), "Hamburg"), ((80331, 81929), "München"),
+    ((50667, 51149), "Köln"), ((60306, 60599), "Frankfurt am Main"), ((70173, 70629), "Stuttgart"),
+    ((40210, 40629), "Düsseldorf"), ((4103, 4357), "Leipzig"), ((1067, 1326), "Dresden"),
+    ((30159, 30669), "Hannover"), ((14467, 14482), "Potsdam"),
+]
+MAIL_DOMAINS = ["gmail.com", "web.de", "gmx.de", "t-online.de", "outlook.de", "yahoo.de"]
+
+# (manufacturer, model, type allocation code, typical used price in EUR)
+DEVICES = [
+    ("Apple", "iPhone 11", "35391510", 180), ("Apple", "iPhone 12", "35305611", 260),
+    ("Apple", "iPhone 13", "35267812", 360), ("Apple", "iPhone 14", "35332214", 480),
+    ("Apple", "iPhone 15 Pro", "35075417", 820), ("Samsung", "Galaxy S21", "35223611", 220),
+    ("Samsung", "Galaxy S23", "35109632", 450), ("Samsung", "Galaxy A52", "35489212", 140),
+    ("Samsung", "Galaxy A14", "35085674", 90), ("Xiaomi", "Redmi Note 11", "86775305", 80),
+    ("Google", "Pixel 7", "35557174", 260), ("Huawei", "P30", "86823404", 90),
+]
+DEVICE_WEIGHTS = [6, 9, 12, 8, 3, 5, 4, 7, 6, 5, 3, 2]
+# condition -> share of the typical price
+CONDITIONS = {"Neu": 1.35, "Wie neu": 1.15, "Gut": 1.0, "Gebraucht": 0.8, "Defekt": 0.3}
+CONDITION_WEIGHTS = [1, 3, 5, 4, 1]
+FEATURES = ["64 GB", "128 GB", "256 GB", "512 GB"]
+COLORS = ["Schwarz", "Weiß", "Blau", "Rot", "Grün", "Violett", "Silber"]
+ACCESSORIES = ["", "Ladekabel", "Originalverpackung", "Ladekabel, Hülle", "Originalverpackung, Ladekabel"]
+
+# (description, unit price in EUR, 19% USt included)
+RECEIPT_ARTICLES = [
+    ("Displayreparatur", 129.0, True), ("Akkutausch", 69.0, True), ("Ladebuchse tauschen", 59.0, True),
+    ("Panzerglas", 14.99, True), ("Silikonhülle", 12.99, True), ("Ladekabel USB-C", 9.99, True),
+    ("Netzteil 20W", 24.99, True), ("Diagnose", 19.0, True), ("Datenübertragung", 29.0, True),
+    ("Gebrauchtgerät Ankauf", 180.0, False), ("Kopfhörer", 19.99, True), ("Powerbank 10000 mAh", 29.99, True),
+]
+
+CONTRACT_TERMS = ("Der Verkäufer versichert, dass das Gerät sein Eigentum ist, frei von Rechten Dritter ist "
+                  "und nicht als gestohlen gemeldet wurde. Die Ware wird wie besichtigt unter Ausschluss "
+                  "jeglicher Gewährleistung verkauft.")
+
+
+class SyntheticData:
+    """Deterministic generator of parties, devices, contracts and receipts for a seed."""
+    def __init__(self, seed=1, start=datetime(2020, 1, 1), end=datetime(2024, 12, 31)):
+        self.rng = random.Random(seed)
+        self.start = start
+        self.span = int((end - start).total_seconds())
+
+    def imei(self, tac):
+        body = tac + f"{self.rng.randrange(10 ** 6):06}"
+        return body + luhn_check_digit(body)
+
+    def party(self):
+        """A person as the contract form's field dict."""
+        rng = self.rng
+        first, last = rng.choice(FIRST_NAMES), rng.choice(LAST_NAMES)
+        (low, high), city = rng.choice(CITIES)
+        local = f"{first}.{last}".lower().translate(str.maketrans({'ä': 'ae', 'ö': 'oe', 'ü': 'ue', 'ß': 'ss'}))
+        return {
+            'Vorname': first, 'Nachname': last,
+            'Straße': f"{rng.choice(STREETS)} {rng.randint(1, 180)}{rng.choice(['', '', '', 'a', 'b'])}",
+            'PLZ / Ort': f"{rng.randint(low, high):05} {city}",
+            'Telefon': f"01{rng.choice(['51', '52', '57', '60', '62', '70', '76', '79'])} {rng.randrange(10 ** 7):07}",
+            'E-Mail': f"{local}{rng.randint(1, 99)}@{rng.choice(MAIL_DOMAINS)}",
+            'Ausweis-Nr': "".join(rng.choices("CFGHJKLMNPRTVWXYZ0123456789", k=9)),
+        }
+
+    def device(self):
+        """A device as the contract form's field dict plus its price."""
+        rng = self.rng
+        manufacturer, model, tac, typical = rng.choices(DEVICES, DEVICE_WEIGHTS)[0]
+        condition = rng.choices(list(CONDITIONS), CONDITION_WEIGHTS)[0]
+        # Prices spread log-normally around the typical price for the condition
+        price = round(typical * CONDITIONS[condition] * rng.lognormvariate(0, 0.25) / 5) * 5
+        device = {
+            'Hersteller': manufacturer, 'Modell': model, 'Seriennummer': self.imei(tac),
+            'Besonderheiten': f"{rng.choice(FEATURES)}, {rng.choice(COLORS)}", 'Zustand': condition,
+            'Sonstiges/Zubehör': rng.choice(ACCESSORIES),
+        }
+        return device, float(max(price, 5))
+
+    def created_at(self):
+        return self.start + timedelta(seconds=self.rng.randrange(self.span))
+
+    def contract_row(self):
+        """A contracts table row (ContractModel.add_contracts order)."""
+        seller, buyer = self.party(), self.party()
+        device, price = self.device()
+        return (
+            seller['Vorname'], seller['Nachname'], f"{seller['Straße']}, {seller['PLZ / Ort']}",
+            seller['Telefon'], seller['E-Mail'],
+            buyer['Vorname'], buyer['Nachname'], f"{buyer['Straße']}, {buyer['PLZ / Ort']}",
+            buyer['Telefon'], buyer['E-Mail'],
+            device['Hersteller'], device['Modell'], device['Seriennummer'], device['Zustand'],
+            price, CONTRACT_TERMS, self.created_at().isoformat(timespec='seconds'),
+        )
+
+    def contract_documents(self):
+        """Arguments for contract.create_contract_pdf: seller, buyer, device, terms, price info."""
+        from num2words import num2words
+
+        seller, buyer = self.party(), self.party()
+        device, price = self.device()
+        price_info = {
+            'price': price,
+            'price_in_words': num2words(int(price), lang='de').upper(),
+            'delivery_date': f"{buyer['PLZ / Ort'].split(' ', 1)[1]}, {self.created_at():%d.%m.%Y}",
+        }
+        return seller, buyer, device, CONTRACT_TERMS, price_info
+
+    def receipt(self, max_items=40):
+        """(customer name, items) for receipt.create_pdf; most receipts are short, a few are long."""
+        rng = self.rng
+        party = self.party()
+        count = min(max(1, int(rng.expovariate(1 / 3))), max_items)
+        items = []
+        for _ in range(count):
+            description, unit_price, tax_included = rng.choice(RECEIPT_ARTICLES)
+            quantity = rng.choices([1, 2, 3, 5], [80, 12, 5, 3])[0]
+            items.append((description, quantity, round(unit_price * rng.uniform(0.9, 1.1), 2), tax_included))
+        return f"{party['Vorname']} {party['Nachname']}", items
+
+
+def populate_contracts(model, count, seed=1, batch_size=10000):
+    """Insert `count` synthetic contracts into a ContractModel and return contracts per second."""
+    generator = SyntheticData(seed)
+    started = time.perf_counter()
+    inserted = 0
+    while inserted < count:
+        batch = [generator.contract_row() for _ in range(min(batch_size, count - inserted))]
+        if not model.add_contracts(batch):
+            break
+        inserted += len(batch)
+    seconds = time.perf_counter() - started
+    rate = inserted / seconds if seconds else 0.0
+    print(f"Inserted {inserted} synthetic contracts in {seconds:.1f}s ({rate:.0f}/s)")
+    return rate
+
+
+def generate_receipts(count, seed=1):
+    """Render `count` synthetic receipts through receipt.create_pdf and return their file names."""
+    import receipt
+
+    generator = SyntheticData(seed)
+    return [receipt.create_pdf(*generator.receipt(), render_cache=None) for _ in range(count)]
+
+
+def _process_usage():
+    """(resident memory in bytes, open file descriptors) of this process, None where unknown."""
+    try:
+        import psutil
+    except ImportError:
+        psutil = None
+    if psutil is not None:
+        process = psutil.Process()
+        fds = process.num_fds() if hasattr(process, 'num_fds') else process.num_handles()
+        return process.memory_info().rss, fds
+    try:
+        with open('/proc/self/statm') as f:
+            rss = int(f.read().split()[1]) * os.sysconf('SC_PAGE_SIZE')
+        return rss, len(os.listdir('/proc/self/fd'))
+    except OSError:
+        return None, None
+
+
+def soak_test(duration=3600, interval=30, seed=1, out=sys.stdout):
+    """Render receipts and contracts back to back for `duration` seconds.
+
+    Every `interval` seconds a line with resident memory, open file descriptors
+    and documents per second is printed. Documents are rendered without the
+    render cache in a temporary working directory and deleted right away, so
+    any growth in memory or descriptors comes from the rendering code itself.
+    Returns the list of samples (elapsed seconds, rss, fds, docs per second).
+    """
+    import contract
+    import receipt
+
+    generator = SyntheticData(seed)
+    samples = []
+    workdir = os.getcwd()
+    with tempfile.TemporaryDirectory() as tmp:
+        os.chdir(tmp)
+        try:
+            os.makedirs(contract.CONTRACTS_DIR, exist_ok=True)
+            with open(contract.CONTRACT_NUMBER_FILE, 'w') as f:
+                f.write('{"last_number": 0}')
+            started = last = time.perf_counter()
+            rendered = 0
+            print(f"{'elapsed':>8} {'rss MB':>8} {'fds':>5} {'docs/s':>8}", file=out)
+            while last - started < duration:
+                if rendered % 2:
+                    path, _ = contract.create_contract_pdf(*generator.contract_documents(), render_cache=None)
+                else:
+                    path = receipt.create_pdf(*generator.receipt(), render_cache=None)
+                os.remove(path)
+                rendered += 1
+                now = time.perf_counter()
+                if now - last >= interval:
+                    rss, fds = _process_usage()
+                    samples.append((now - started, rss, fds, rendered / (now - last)))
+                    print(f"{now - started:8.0f} {(rss or 0) / 1e6:8.1f} {fds if fds is not None else '-':>5} "
+                          f"{rendered / (now - last):8.1f}", file=out)
+                    rendered, last = 0, now
+        finally:
+            os.chdir(workdir)
+
+    if len(samples) >= 4 and samples[0][1]:
+        # Compare the second half against the first to ignore warm-up allocations
+        half = len(samples) // 2
+        growth = samples[-1][1] - samples[half][1]
+        print(f"RSS change over the second half: {growth / 1e6:+.1f} MB, "
+              f"descriptors {samples[half][2]} -> {samples[-1][2]}", file=out)
+    return samples
+
+
+if __name__ == '__main__':
+    command = sys.argv[1] if len(sys.argv) > 1 else 'soak'
+    if command == 'contracts':
+        from data import ContractModel
+        model = ContractModel(*sys.argv[3:4])
+        populate_contracts(model, int(sys.argv[2]) if len(sys.argv) > 2 else 1000000)
+        model.close_connection()
+    elif command == 'receipts':
+        print("\n".join(generate_receipts(int(sys.argv[2]) if len(sys.argv) > 2 else 100)))
+    elif command == 'soak':
+        soak_test(float(sys.argv[2]) if len(sys.argv) > 2 else 3600,
+                  float(sys.argv[3]) if len(sys.argv) > 3 else 30)
+    else:
+        print(f"Unknown command {command!r}, use contracts, receipts or soak.")
@@ -0,0 +1,110 @@
+# text_layout.py
+# Cached line breaking for FPDF.multi_cell: the same text in the same font and
+# width always wraps the same way, so the breaks are computed once and replayed.
+from collections import OrderedDict
+
+
+class TextLayout:
+    """Precomputed multi_cell output: one (word spacing, Tw operator, text) entry per line."""
+    __slots__ = ('lines', 'height')
+
+    def __init__(self, lines, height):
+        self.lines = lines
+        self.height = height
+
+
+def layout_text(pdf, w, h, text, align='J'):
+    """Break text into lines exactly like FPDF.multi_cell (without borders) would, without drawing."""
+    cw = pdf.current_font['cw']
+    wmax = (w - 2 * pdf.c_margin) * 1000.0 / pdf.font_size
+    s = text.replace("\r", '')
+    nb = len(s)
+    if nb > 0 and s[nb - 1] == "\n":
+        nb -= 1
+    lines = []
+    ws = 0
+    sep = -1
+    i = j = l = ns = ls = 0
+
+    def line(text, new_ws, tw):
+        lines.append((new_ws, tw, text))
+
+    while i < nb:
+        c = s[i]
+        if c == "\n":
+            line(s[j:i], 0, '0 Tw' if ws > 0 else None)
+            ws = 0
+            i += 1
+            sep = -1
+            j = i
+            l = ns = 0
+            continue
+        if c == ' ':
+            sep = i
+            ls = l
+            ns += 1
+        l += cw.get(c, 0)
+        if l > wmax:
+            if sep == -1:
+                if i == j:
+                    i += 1
+                line(s[j:i], 0, '0 Tw' if ws > 0 else None)
+                ws = 0
+            else:
+                tw = None
+                if align == 'J':
+                    ws = (wmax - ls) / 1000.0 * pdf.font_size / (ns - 1) if ns > 1 else 0
+                    tw = '%.3f Tw' % (ws * pdf.k)
+                line(s[j:sep], ws, tw)
+                i = sep + 1
+            sep = -1
+            j = i
+            l = ns = 0
+        else:
+            i += 1
+    line(s[j:i], 0, '0 Tw' if ws > 0 else None)
+    return TextLayout(lines, len(lines) * h)
+
+
+class TextLayoutCache:
+    """LRU cache of TextLayouts keyed by text, font and cell width."""
+    def __init__(self, max_entries=128):
+        self.max_entries = max_entries
+        self.hits = 0
+        self.misses = 0
+        self._layouts = OrderedDict()
+
+    def multi_cell(self, pdf, w, h, text, align='J'):
+        """Drop-in for pdf.multi_cell(w, h, text, align=align) that reuses cached line breaks."""
+        if pdf.unifontsubset or pdf.ws > 0:
+            # Unicode fonts measure differently and a pending word spacing changes the output
+            pdf.multi_cell(w, h, text, align=align)
+            return
+        if w == 0:
+            w = pdf.w - pdf.r_margin - pdf.x
+        key = (text, pdf.font_family, pdf.font_style, pdf.font_size_pt, w, h, align, pdf.c_margin)
+        layout = self._layouts.get(key)
+        if layout is None:
+            self.misses += 1
+            layout = self._layouts[key] = layout_text(pdf, w, h, text, align)
+            if len(self._layouts) > self.max_entries:
+                self._layouts.popitem(last=False)
+        else:
+            self.hits += 1
+            self._layouts.move_to_end(key)
+
+        for ws, tw, line in layout.lines:
+            pdf.ws = ws
+            if tw is not None:
+                pdf._out(tw)
+            pdf.cell(w, h, line, 0, 2, align, 0)
+        pdf.x = pdf.l_margin
+
+    def stats(self):
+        lookups = self.hits + self.misses
+        return {
+            'hits': self.hits,
+            'misses': self.misses,
+            'hit_rate': self.hits / lookups if lookups else 0.0,
+            'entries': len(self._layouts),
+        }
@@ -0,0 +1,215 @@
+# thermal_printer.py
+# Receipts as ESC/POS raster images for 58 and 80 mm thermal printers, sent
+# straight to the printer device (or a stand-in file) instead of going
+# through a PDF and a desktop viewer. Text is composed from cached glyph
+# bitmaps and the company header is rasterized once per location.
+import datetime
+import os
+import struct
+
+import numpy as np
+from PIL import Image, ImageDraw, ImageFont
+
+from company_profiles import get_company_profile, resolve_tenant
+from e_invoice import line_amounts, vat_breakdown
+
+# Printable width in dots (203 dpi print heads) and font sizes in pixels per paper width in mm
+PAPER_WIDTHS = {58: 384, 80: 576}
+FONT_SIZES = {58: 20, 80: 24}
+
+# Regular and bold fonts tried in order: Windows, then most Linux systems,
+# then the copy matplotlib ships
+FONT_FILES = [("arial.ttf", "arialbd.ttf"), ("DejaVuSans.ttf", "DejaVuSans-Bold.ttf")]
+
+# Where print_receipt writes by default: a file standing in for the printer,
+# in the data directory next to the database. Point it at the device, e.g.
+# /dev/usb/lp0 or a shared printer such as \\localhost\Bondrucker on Windows.
+THERMAL_PRINTER_DEVICE = os.path.join(os.path.dirname(__file__), '..', 'data', 'thermal_printer.prn')
+
+ESC_INIT = b'\x1b@'
+ESC_CUT = b'\x1dVB\x00'  # feed to the cutter and cut, leaving a small hinge
+RASTER_BAND_ROWS = 256  # rows per GS v 0 command; many printers cannot buffer more
+
+
+def _load_fonts(size):
+    candidates = list(FONT_FILES)
+    try:
+        import matplotlib
+        fonts_dir = os.path.join(matplotlib.get_data_path(), 'fonts', 'ttf')
+        candidates.append(tuple(os.path.join(fonts_dir, name) for name in FONT_FILES[1]))
+    except ImportError:
+        pass
+    for regular, bold in candidates:
+        try:
+            return ImageFont.truetype(regular, size), ImageFont.truetype(bold, size)
+        except OSError:
+            continue
+    font = ImageFont.load_default(size)
+    return font, font
+
+
+class GlyphCache:
+    """One-bit bitmaps of single characters, rendered on first use.
+
+    All glyphs of a font share the line height, so a line of text is the
+    horizontal concatenation of its glyphs.
+    """
+    def __init__(self, size):
+        self.fonts = _load_fonts(size)
+        ascent, descent = self.fonts[0].getmetrics()
+        self.height = ascent + descent
+        self._glyphs = {}
+
+    def glyph(self, char, bold=False):
+        key = (char, bold)
+        bitmap = self._glyphs.get(key)
+        if bitmap is None:
+            font = self.fonts[bold]
+            width = max(1, round(font.getlength(char)))
+            image = Image.new('L', (width, self.height), 0)
+            ImageDraw.Draw(image).text((0, 0), char, font=font, fill=255)
+            bitmap = self._glyphs[key] = np.asarray(image) > 127
+        return bitmap
+
+    def width(self, text, bold=False):
+        return sum(self.glyph(char, bold).shape[1] for char in text)
+
+    def __len__(self):
+        return len(self._glyphs)
+
+
+class ThermalReceipt:
+    """Renders receipts for one paper width into ESC/POS bytes.
+
+    Keep one instance around: the glyph bitmaps and the raster commands of
+    each location's company header are cached on it, so printing a receipt
+    only composes its own lines.
+    """
+    def __init__(self, paper_mm=80):
+        if paper_mm not in PAPER_WIDTHS:
+            raise ValueError(f"Unsupported paper width {paper_mm} mm, use one of {', '.join(map(str, PAPER_WIDTHS))}.")
+        self.paper_mm = paper_mm
+        self.width = PAPER_WIDTHS[paper_mm]
+        self.glyphs = GlyphCache(FONT_SIZES[paper_mm])
+        self._headers = {}
+
+    def line(self, text, align='L', bold=False):
+        """A line of text as a (height, width) bool array; text wider than the paper is cut off."""
+        row = np.zeros((self.glyphs.height, self.width), dtype=bool)
+        if not text:
+            return row
+        bitmap = np.hstack([self.glyphs.glyph(char, bold) for char in text])[:, :self.width]
+        x = {'L': 0, 'C': (self.width - bitmap.shape[1]) // 2, 'R': self.width - bitmap.shape[1]}[align]
+        row[:, x:x + bitmap.shape[1]] = bitmap
+        return row
+
+    def columns(self, left, right, bold=False):
+        """Text on the left and an amount flush right on the same line."""
+        row = self.line(left, 'L', bold)
+        amount = np.hstack([self.glyphs.glyph(char, bold) for char in right])
+        row[:, self.width - amount.shape[1]:] |= amount
+        return row
+
+    def wrap(self, text, bold=False):
+        """Lines of text broken at spaces to fit the paper width."""
+        lines, current = [], ""
+        for word in text.split():
+            candidate = f"{current} {word}" if current else word
+            if current and self.glyphs.width(candidate, bold) > self.width:
+                lines.append(self.line(current, bold=bold))
+                candidate = word
+            current = candidate
+        lines.append(self.line(current, bold=bold))
+        return lines
+
+    def rule(self):
+        row = np.zeros((self.glyphs.height // 2, self.width), dtype=bool)
+        row[row.shape[0] // 2, :] = True
+        return row
+
+    def header(self, tenant=None):
+        """Raster commands of the company header of a location, rendered once."""
+        tenant = resolve_tenant(tenant)
+        profile = get_company_profile(tenant)
+        key = (tenant, tuple(profile.values()))
+        data = self._headers.get(key)
+        if data is None:
+            rows = [self.line(profile['name'], 'C', bold=True),
+                    self.line(f"{profile['street']}, {profile['zip']}", 'C'),
+                    self.line(profile['website'], 'C'),
+                    self.line(profile['email'], 'C')]
+            if profile.get('vat_id'):
+                rows.append(self.line(f"USt-IdNr.: {profile['vat_id']}", 'C'))
+            rows.append(self.rule())
+            data = self._headers[key] = raster_commands(np.vstack(rows))
+        return data
+
+    def render(self, customer_name, items, receipt_number, issued_at=None, tenant=None):
+        """ESC/POS bytes of a receipt with the content of ReceiptPDF.body, ending in a cut."""
+        issued_at = issued_at or datetime.datetime.now()
+        profile = get_company_profile(resolve_tenant(tenant))
+        rows = [self.line(f"Kunde: {customer_name}"),
+                self.line(f"{profile['city']}, {issued_at:%d.%m.%Y}"),
+                self.line(f"Rechnung: {receipt_number}", bold=True),
+                self.rule()]
+
+        # Amounts in cents, computed like the e-invoice so both show the same totals
+        basis = {}
+        for description, quantity, unit_price, tax_included in items:
+            price, netto_price, tax_rate, tax_amount = line_amounts(quantity, unit_price, tax_included)
+            basis[tax_rate] = basis.get(tax_rate, 0) + netto_price
+            rows.extend(self.wrap(description))
+            rows.append(self.columns(f"  {quantity} x {price / 100:.2f}  USt {tax_rate}%",
+                                     f"{(netto_price + tax_amount) / 100:.2f} EUR"))
+
+        breakdown = vat_breakdown(basis)
+        total_price = sum(netto + tax for netto, tax in breakdown.values())
+        rows.append(self.rule())
+        rows.append(self.columns("Gesamt", f"{total_price / 100:.2f} EUR", bold=True))
+        for tax_rate in (0, 19):
+            netto, tax = breakdown.get(tax_rate, (0, 0))
+            if netto > 0:
+                rows.append(self.columns(f"{tax_rate}% USt auf {netto / 100:.2f}", f"{tax / 100:.2f} EUR"))
+        rows.append(self.rule())
+        rows.extend(self.wrap('Hinweis: Bei Angabe "0%" unterliegt der Artikel als Gebrauchtwarenkauf '
+                              'der Differenzbesteuerung nach §25a UStG.'))
+        rows.append(self.line(""))
+        rows.append(self.line("Mit freundlichen Grüßen", 'C'))
+        rows.append(self.line(f"Ihr {profile['team']}-Team", 'C'))
+        rows.append(self.line(""))
+        return ESC_INIT + self.header(tenant) + raster_commands(np.vstack(rows)) + ESC_CUT
+
+
+def raster_commands(bitmap):
+    """GS v 0 raster image commands for a (rows, width) bool array, in bands of RASTER_BAND_ROWS."""
+    packed = np.packbits(bitmap, axis=1)
+    data = bytearray()
+    for start in range(0, packed.shape[0], RASTER_BAND_ROWS):
+        band = packed[start:start + RASTER_BAND_ROWS]
+        data += b'\x1dv0\x00' + struct.pack('<HH', band.shape[1], band.shape[0]) + band.tobytes()
+    return bytes(data)
+
+
+def preview_image(data):
+    """Decode the raster commands of printer output into a PIL image of the printed paper."""
+    bands, position = [], 0
+    while True:
+        position = data.find(b'\x1dv0', position)
+        if position < 0:
+            break
+        width_bytes, rows = struct.unpack('<HH', data[position + 4:position + 8])
+        size = width_bytes * rows
+        band = np.frombuffer(data[position + 8:position + 8 + size], dtype=np.uint8).reshape(rows, width_bytes)
+        bands.append(np.unpackbits(band, axis=1))
+        position += 8 + size
+    if not bands:
+        return Image.new('1', (1, 1), 1)
+    return Image.fromarray(((1 - np.vstack(bands)) * 255).astype(np.uint8)).convert('1')
+
+
+def print_receipt(data, device=THERMAL_PRINTER_DEVICE):
+    """Send printer output to the printer device, or append it to the stand-in file."""
+    if device == THERMAL_PRINTER_DEVICE:
+        os.makedirs(os.path.dirname(device), exist_ok=True)
+    with open(device, 'ab') as printer:
+        printer.write(data)
@@ -0,0 +1,278 @@
+# validation.py
+# Input rules for contracts and receipts: IMEI check digits, phone numbers,
+# e-mail addresses, German postcodes and price/quantity ranges. The same
+# rules check a single form submission or whole CSV/JSONL imports, where
+# each field is checked column by column over chunks of records.
+import csv
+import itertools
+import json
+import math
+import re
+import time
+
+import numpy as np
+
+REQUIRED_MESSAGE = "Pflichtfeld"
+
+
+def luhn_check_digit(digits):
+    """Check digit that makes `digits` + digit pass the Luhn check."""
+    total = 0
+    for i, digit in enumerate(reversed(digits)):
+        value = int(digit) * (2 if i % 2 == 0 else 1)
+        total += value - 9 if value > 9 else value
+    return str((10 - total % 10) % 10)
+
+
+def luhn_valid(number):
+    return number.isascii() and number.isdigit() and luhn_check_digit(number[:-1]) == number[-1]
+
+
+def _luhn_valid_imeis(numbers):
+    """Luhn check of many 15-digit strings at once, as a bool array."""
+    if not numbers:
+        return np.zeros(0, dtype=bool)
+    digits = np.frombuffer("".join(numbers).encode('ascii'), dtype=np.uint8).reshape(-1, 15) - 48
+    doubled = digits[:, 1:14:2] * 2
+    doubled = np.where(doubled > 9, doubled - 9, doubled)
+    return (digits[:, ::2].sum(axis=1, dtype=np.int64) + doubled.sum(axis=1, dtype=np.int64)) % 10 == 0
+
+
+def parse_number(value):
+    """Float of a number typed with a decimal point or comma and an optional EUR/€ suffix; raises ValueError."""
+    if isinstance(value, str):
+        value = value.strip().removesuffix('EUR').removesuffix('€').strip()
+        if ',' in value:
+            value = value.replace('.', '').replace(',', '.')
+    return float(value)
+
+
+class Rule:
+    """A check of one non-empty field value with the message reported when it fails."""
+    def __init__(self, message):
+        self.message = message
+
+    def valid(self, value):
+        raise NotImplementedError
+
+    def invalid(self, values):
+        """Bool array marking the values of a column that fail the check."""
+        valid = self.valid
+        return np.fromiter((not valid(value) for value in values), dtype=bool, count=len(values))
+
+
+class Pattern(Rule):
+    """The whole value matches a regular expression, compiled once; with search=True it only has to occur in it."""
+    def __init__(self, pattern, message, flags=0, search=False):
+        super().__init__(message)
+        compiled = re.compile(pattern, flags)
+        self.match = compiled.search if search else compiled.fullmatch
+
+    def valid(self, value):
+        return self.match(value) is not None
+
+    def invalid(self, values):
+        match = self.match
+        return np.fromiter((match(value) is None for value in values), dtype=bool, count=len(values))
+
+
+class Imei(Rule):
+    """15 digits with a valid Luhn check digit; other serial numbers only need a plausible format.
+
+    The device serial field holds IMEIs for phones and manufacturer serial
+    numbers for everything else, so a value made of digits only must be an IMEI.
+    """
+    _SERIAL = re.compile(r'[A-Za-z0-9][A-Za-z0-9 /-]{3,29}').fullmatch
+
+    def valid(self, value):
+        if value.isascii() and value.isdigit():
+            return len(value) == 15 and luhn_valid(value)
+        return self._SERIAL(value) is not None
+
+    def invalid(self, values):
+        invalid = np.zeros(len(values), dtype=bool)
+        imeis, positions = [], []
+        serial = self._SERIAL
+        for position, value in enumerate(values):
+            if value.isascii() and value.isdigit():
+                if len(value) == 15:
+                    imeis.append(value)
+                    positions.append(position)
+                else:
+                    invalid[position] = True
+            elif serial(value) is None:
+                invalid[position] = True
+        invalid[positions] = ~_luhn_valid_imeis(imeis)
+        return invalid
+
+
+class Number(Rule):
+    """A finite number between minimum and maximum (inclusive), with a decimal point or comma."""
+    def __init__(self, minimum, maximum, message, integer=False):
+        super().__init__(message)
+        self.minimum = minimum
+        self.maximum = maximum
+        self.integer = integer
+
+    def valid(self, value):
+        try:
+            number = parse_number(value)
+        except (TypeError, ValueError):
+            return False
+        if not math.isfinite(number):
+            return False
+        if self.integer and number != int(number):
+            return False
+        return self.minimum <= number <= self.maximum
+
+
+# Rules by kind of input, compiled when the module is imported
+IMEI = Imei("Ungültige IMEI (15 Ziffern mit gültiger Prüfziffer) oder Seriennummer")
+PHONE = Pattern(r'(?:\+|00)?[0-9][0-9 ()/-]{5,20}', "Ungültige Telefonnummer")
+EMAIL = Pattern(r'[A-Za-z0-9._%+-]+@[A-Za-z0-9-]+(?:\.[A-Za-z0-9-]+)*\.[A-Za-z]{2,}', "Ungültige E-Mail-Adresse")
+PLZ_ORT = Pattern(r'[0-9]{5}\s+\S.*', "Postleitzahl (5 Ziffern) und Ort erwartet")
+ADDRESS_WITH_PLZ = Pattern(r'\S.*\b[0-9]{5}\s+\S', "Adresse ohne gültige Postleitzahl", search=True)
+PRICE = Number(0.01, 100000, "Preis muss zwischen 0,01 und 100.000 EUR liegen")
+UNIT_PRICE = Number(0, 100000, "Einzelpreis muss zwischen 0 und 100.000 EUR liegen")
+QUANTITY = Number(1, 9999, "Menge muss eine ganze Zahl zwischen 1 und 9999 sein", integer=True)
+
+
+class Validator:
+    """Rules per field of a record; fields listed in `required` must not be empty.
+
+    Only the first failing rule of a field is reported. Fields without rules
+    are not checked.
+    """
+    def __init__(self, rules, required=()):
+        self.required = frozenset(required)
+        self.rules = {field: tuple(field_rules) for field, field_rules in rules.items()}
+        for field in self.required:
+            self.rules.setdefault(field, ())
+
+    def validate(self, record):
+        """Return {field: message} for the invalid fields of one record, empty if it is valid."""
+        errors = {}
+        for field, rules in self.rules.items():
+            value = record.get(field)
+            value = "" if value is None else str(value).strip()
+            if not value:
+                if field in self.required:
+                    errors[field] = REQUIRED_MESSAGE
+                continue
+            for rule in rules:
+                if not rule.valid(value):
+                    errors[field] = rule.message
+                    break
+        return errors
+
+    def validate_batch(self, records):
+        """Check a list of records column by column.
+
+        Returns (valid, errors): a bool array with one entry per record, and
+        (record index, field, value, message) tuples ordered by record.
+        """
+        count = len(records)
+        valid = np.ones(count, dtype=bool)
+        errors = []
+        for field, rules in self.rules.items():
+            values = ["" if value is None else str(value).strip()
+                      for value in [record.get(field) for record in records]]
+            empty = np.fromiter((not value for value in values), dtype=bool, count=count)
+            if field in self.required:
+                for index in np.flatnonzero(empty):
+                    errors.append((int(index), field, "", REQUIRED_MESSAGE))
+                valid &= ~empty
+            # Each rule sees only the values that passed the rules before it
+            remaining = np.flatnonzero(~empty)
+            for rule in rules:
+                if not len(remaining):
+                    break
+                invalid = rule.invalid([values[index] for index in remaining])
+                for index in remaining[invalid]:
+                    errors.append((int(index), field, values[index], rule.message))
+                valid[remaining[invalid]] = False
+                remaining = remaining[~invalid]
+        errors.sort(key=lambda error: error[0])
+        return valid, errors
+
+
+# Parties of the contract form (seller_info / buyer_info)
+PARTY_FORM = Validator({'PLZ / Ort': [PLZ_ORT], 'Telefon': [PHONE], 'E-Mail': [EMAIL]},
+                       required=('Vorname', 'Straße', 'PLZ / Ort'))
+# Device of the contract form (device_info)
+DEVICE_FORM = Validator({'Seriennummer': [IMEI]}, required=('Hersteller', 'Modell', 'Seriennummer'))
+# Rows of the contracts table, as in contract CSV/JSONL imports and exports
+CONTRACT_RECORDS = Validator({
+    'seller_address': [ADDRESS_WITH_PLZ], 'seller_phone': [PHONE], 'seller_email': [EMAIL],
+    'buyer_address': [ADDRESS_WITH_PLZ], 'buyer_phone': [PHONE], 'buyer_email': [EMAIL],
+    'imei_number': [IMEI], 'price': [PRICE],
+}, required=('seller_first_name', 'seller_address', 'buyer_first_name', 'buyer_address',
+             'device_type', 'device_model', 'imei_number', 'condition', 'price'))
+# Receipt line items, from the item form or an item import
+RECEIPT_ITEMS = Validator({'quantity': [QUANTITY], 'unit_price': [UNIT_PRICE]},
+                          required=('description', 'quantity', 'unit_price'))
+
+
+def validate_contract_form(seller_info, buyer_info, device_info, price):
+    """Errors of a contract form submission as {'Section: field': message}, empty if it is valid."""
+    errors = {}
+    for section, validator, record in (("Verkäufer", PARTY_FORM, seller_info), ("Käufer", PARTY_FORM, buyer_info),
+                                       ("Gerät", DEVICE_FORM, device_info)):
+        errors.update({f"{section}: {field}": message for field, message in validator.validate(record).items()})
+    if not str(price).strip():
+        errors["Preis"] = REQUIRED_MESSAGE
+    elif not PRICE.valid(str(price)):
+        errors["Preis"] = PRICE.message
+    return errors
+
+
+def iter_records(file_path):
+    """Records of a CSV file with a header row, or of a JSONL file with one object per line."""
+    if file_path.endswith(('.jsonl', '.ndjson')):
+        with open(file_path, 'r', encoding='utf-8') as f:
+            for line in f:
+                if line.strip():
+                    yield json.loads(line)
+    else:
+        with open(file_path, 'r', newline='', encoding='utf-8-sig') as f:
+            yield from csv.DictReader(f)
+
+
+def validate_file(file_path, validator=CONTRACT_RECORDS, chunk_size=50000, max_errors=1000):
+    """Validate every record of a CSV or JSONL file in chunks of chunk_size records.
+
+    Returns a report dict: records, valid and invalid counts, the first
+    max_errors errors as (record number, field, value, message) with records
+    numbered from 1, error counts per field and message, seconds and records/s.
+    """
+    started = time.perf_counter()
+    records = invalid = 0
+    errors = []
+    counts = {}
+    stream = iter_records(file_path)
+    while True:
+        chunk = list(itertools.islice(stream, chunk_size))
+        if not chunk:
+            break
+        valid, chunk_errors = validator.validate_batch(chunk)
+        invalid += int(len(chunk) - valid.sum())
+        for index, field, value, message in chunk_errors:
+            counts.setdefault(field, {})
+            counts[field][message] = counts[field].get(message, 0) + 1
+            if len(errors) < max_errors:
+                errors.append((records + index + 1, field, value, message))
+        records += len(chunk)
+
+    seconds = time.perf_counter() - started
+    report = {
+        'records': records,
+        'valid': records - invalid,
+        'invalid': invalid,
+        'errors': errors,
+        'error_counts': counts,
+        'seconds': seconds,
+        'records_per_sec': records / seconds if seconds else 0.0,
+    }
+    print(f"Validated {records} records in {seconds:.2f}s ({report['records_per_sec']:.0f} records/s), "
+          f"{invalid} invalid")
+    return report